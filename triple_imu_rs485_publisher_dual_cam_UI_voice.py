@@ -64,19 +64,23 @@ ZeroMQ通信模式（与B_reverse_whole.py兼容）：
     按键 '2' - 夹爪慢慢闭合 (gripper值减少0.01，范围0.0-1.0)
     按键 'q' - 退出程序
 """
+import io
 import time
+import math
 import json
 import argparse
 import numpy as np
 import zmq
 import threading
-from collections import deque
 from scipy.spatial.transform import Rotation
+import os
 import sys
 import select
 import termios
 import tty
 import pickle
+import struct
+import unicodedata
 import cv2
 
 import device_model
@@ -95,6 +99,8 @@ except ImportError:
 
 try:
     import opuslib
+    import opuslib.api
+    import opuslib.api.decoder
     OPUS_AVAILABLE = True
 except ImportError:
     print("⚠️ opuslib 未安装，音频解码功能将被禁用")
@@ -102,6 +108,34 @@ except ImportError:
     OPUS_AVAILABLE = False
     opuslib = None
 
+# === 可选：orjson（LeRobot消息的JSON编码，C实现，直接输出bytes） ===
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+# === 可选：wcwidth（终端显示宽度计算，未安装时用unicodedata近似） ===
+try:
+    from wcwidth import wcswidth
+    WCWIDTH_AVAILABLE = True
+except ImportError:
+    WCWIDTH_AVAILABLE = False
+
+# === 可选：Numba JIT（发布循环的标量坐标映射） ===
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """numba未安装时的空装饰器，函数按普通Python执行"""
+        def decorator(func):
+            return func
+        return decorator
+
 # === 机械臂参数配置 ===
 L1 = 0.25  # 杆1长度（米）
 L2 = 0.27  # 杆2长度（米）
@@ -136,6 +170,7 @@ DEFAULT_AUDIO_PORT = 5561  # 从B端接收音频流（独立）
 
 DEFAULT_PUBLISH_INTERVAL = 0.05  # 20Hz
 ENABLE_VIDEO_DISPLAY = True  # 是否显示视频窗口（默认关闭，避免阻塞）
+VIDEO_DISPLAY_FPS = 30  # OpenCV窗口刷新上限（与接收帧率无关）
 
 # === 音频配置 ===
 AUDIO_SAMPLE_RATE = 48000      # 48kHz 采样率（设备支持）
@@ -144,6 +179,9 @@ AUDIO_BUFFER_SIZE = 5           # 音频缓冲队列大小（帧数），用于
 OPUS_FRAME_SIZE = 2880         # Opus 帧大小（60ms @ 48kHz）
 AUDIO_ENABLED = AUDIO_AVAILABLE and OPUS_AVAILABLE  # 音频功能是否可用
 
+# === 序列化配置 ===
+PICKLE_PROTOCOL = pickle.HIGHEST_PROTOCOL  # B端消息的pickle协议版本
+
 # === Yaw归零模式 ===
 YAW_NORMALIZATION_MODE = "NORMAL"  # "NORMAL": 首次数据归零, "AUTO": 智能偏置, "SIMPLE": ±180翻转, "OFF": 不归零
 YAW_NORMALIZATION_THRESHOLD = 100.0  # Yaw角超过±100度时判定为边界初始化
@@ -165,18 +203,87 @@ Y_TARGET_MAX = 0.2
 Z_TARGET_MIN = 0.1
 Z_TARGET_MAX = 0.4
 
+# 线性映射预计算：mapped = raw * SCALE + OFFSET（常量只在加载时计算一次）
+X_MAP_SCALE = (X_TARGET_MAX - X_TARGET_MIN) / (X_RAW_MAX - X_RAW_MIN)
+Y_MAP_SCALE = (Y_TARGET_MAX - Y_TARGET_MIN) / (Y_RAW_MAX - Y_RAW_MIN)
+Z_MAP_SCALE = (Z_TARGET_MAX - Z_TARGET_MIN) / (Z_RAW_MAX - Z_RAW_MIN)
+X_MAP_OFFSET = X_TARGET_MIN - X_RAW_MIN * X_MAP_SCALE
+Y_MAP_OFFSET = Y_TARGET_MIN - Y_RAW_MIN * Y_MAP_SCALE
+Z_MAP_OFFSET = Z_TARGET_MIN - Z_RAW_MIN * Z_MAP_SCALE
+
+# === 视频帧头（C_real_video_reverse_ultra.py 两帧格式 [帧头, JPEG]） ===
+# 采集时间戳(float64) + JPEG长度(uint32)，小端
+VIDEO_FRAME_HEADER = struct.Struct("<dI")
+
+# === 终端统计显示（静态边框只构造一次） ===
+STATS_BOX_WIDTH = 68  # 边框内宽（终端列数）
+STATS_BOX_TOP = "┌" + "─"*STATS_BOX_WIDTH + "┐"
+STATS_BOX_SEPARATOR = "├" + "─"*STATS_BOX_WIDTH + "┤"
+STATS_BOX_BOTTOM = "└" + "─"*STATS_BOX_WIDTH + "┘"
+
+
+def display_width(text):
+    """
+    计算字符串在终端中占用的列数（中文/emoji占2列，组合字符/变体选择符占0列）
+    str.ljust按码点计数，含中文和emoji的行会错位，因此边框对齐使用该函数
+    """
+    if WCWIDTH_AVAILABLE:
+        width = wcswidth(text)
+        if width >= 0:
+            return width
+    width = 0
+    for ch in text:
+        if unicodedata.combining(ch) or ch == "\ufe0f":
+            continue
+        width += 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
+    return width
+
+
+def box_line(content):
+    """将一行内容按终端显示宽度补齐到边框内宽：│ content<空格>│"""
+    pad = STATS_BOX_WIDTH - 1 - display_width(content)
+    return "│ " + content + " " * max(pad, 0) + "│"
+
+
+# 统计面板中不随数据变化的行（启动时按显示宽度补齐一次，循环中直接复用）
+STATS_IMU_HEADERS = (
+    box_line(f"IMU 1 (杆1) - 地址: 0x{IMU1_ADDR:02X} ({IMU1_ADDR})"),
+    box_line(f"IMU 2 (杆2) - 地址: 0x{IMU2_ADDR:02X} ({IMU2_ADDR})"),
+    box_line(f"IMU 3 (机械爪) - 地址: 0x{IMU3_ADDR:02X} ({IMU3_ADDR})"),
+)
+# 状态行：按在线/离线各预生成一份
+STATS_IMU_STATUS = (
+    {online: box_line(f"状态: {'✅ 在线' if online else '⚠️  离线'}  │  长度: {L1*1000:.0f} mm  │  归零模式: {YAW_NORMALIZATION_MODE}")
+     for online in (True, False)},
+    {online: box_line(f"状态: {'✅ 在线' if online else '⚠️  离线'}  │  长度: {L2*1000:.0f} mm")
+     for online in (True, False)},
+    {online: box_line(f"状态: {'✅ 在线' if online else '⚠️  离线'}")
+     for online in (True, False)},
+)
+STATS_PUBLISH_TITLE = box_line("机械臂末端位置 & ZeroMQ发布状态")
+
+# 标准输出是否为终端：重定向到管道/日志文件时不输出清屏转义码和整屏面板，改为定期单行状态
+IS_TTY = sys.stdout.isatty()
+STATS_INTERVAL_TTY = 0.3   # 终端整屏刷新间隔（秒）
+STATS_INTERVAL_LOG = 5.0   # 非终端单行状态间隔（秒）
+
+# 解释器是否启用GIL（CPython 3.13t自由线程构建返回False，仅用于启动时打印线程模式）
+GIL_ENABLED = getattr(sys, "_is_gil_enabled", lambda: True)()
+
 # === 全局变量存储最新IMU数据 ===
+# 写入端（RS485接收线程中的data_callback）持有；读取端通常不持锁，seqlock重试超限时才回退到持锁读取
 imu_data_lock = threading.Lock()
+SEQLOCK_MAX_RETRIES = 100  # 读取端seqlock最多重试次数，超过后持锁读取，保证读取端不会无限自旋
 
-# IMU欧拉角数据（度）
-imu1_euler = {"roll": 0.0, "pitch": 0.0, "yaw": 0.0}
-imu2_euler = {"roll": 0.0, "pitch": 0.0, "yaw": 0.0}
-imu3_euler = {"roll": 0.0, "pitch": 0.0, "yaw": 0.0}
+# IMU欧拉角数据（度），行: IMU1/IMU2/IMU3，列: roll/pitch/yaw
+# 写入端（data_callback）用序列号标记写入过程，读取端无锁快照（见read_imu_euler_snapshot）
+imu_euler = np.zeros((3, 3), dtype=np.float64)
+imu_euler_seq = 0  # 奇数：写入中；偶数：数据一致
 
-# IMU最后更新时间戳
-imu1_last_update = 0.0
-imu2_last_update = 0.0
-imu3_last_update = 0.0
+# IMU最后更新时间戳（time.time()，0表示从未收到），下标: IMU1/IMU2/IMU3
+# 数组原地写入，读取端一次向量比较得到三个IMU的在线状态
+imu_last_update = np.zeros(3, dtype=np.float64)
+IMU_ONLINE_TIMEOUT = 1.0  # 超过该时间（秒）未更新视为离线
 
 # Yaw归零偏移量
 imu1_yaw_offset = None
@@ -194,8 +301,11 @@ imu2_first_data = None
 imu3_first_data = None
 
 # 轨迹记录
-trajectory_positions = deque(maxlen=1000)
-trajectory_timestamps = deque(maxlen=1000)
+# 轨迹记录（预分配环形缓冲区，保留最近 TRAJECTORY_CAPACITY 个点）
+TRAJECTORY_CAPACITY = 1000
+trajectory_positions = np.empty((TRAJECTORY_CAPACITY, 3), dtype=np.float64)
+trajectory_timestamps = np.empty(TRAJECTORY_CAPACITY, dtype=np.float64)
+trajectory_count = 0  # 累计写入的点数（写入位置 = trajectory_count % TRAJECTORY_CAPACITY）
 
 # === 夹爪控制参数 ===
 gripper_value = 0.0  # 夹爪开合值 (0.0 = 完全闭合, 1.0 = 完全打开)
@@ -214,9 +324,12 @@ KEY_TIMEOUT = 0.1  # 按键超时时间（秒）- 超过此时间视为松开
 video_thread_running = False
 video_frame_count = 0
 video_last_latency = 0.0
-latest_video_left = None    # 最新的左腕摄像头JPEG数据
-latest_video_top = None     # 最新的顶部摄像头JPEG数据
+latest_video_left = None    # 最新的左腕摄像头JPEG数据（bytes或memoryview）
+latest_video_top = None     # 最新的顶部摄像头JPEG数据（bytes或memoryview）
 video_lock = threading.Lock()  # 视频帧访问锁
+video_display_slot = None   # 显示单槽缓冲：(left_jpeg, top_jpeg, frame_idx, latency_ms)
+video_display_lock = threading.Lock()  # 显示槽访问锁
+video_display_event = threading.Event()  # 新帧到达通知
 
 # === 音频接收和播放状态 ===
 audio_thread_running = False
@@ -255,19 +368,27 @@ def keyboard_listener():
     print("  按 'q' - 退出程序")
     print("="*70 + "\n")
     
+    stdin_fd = sys.stdin.fileno()
+    
     try:
         while keyboard_thread_running:
             # 非阻塞检查是否有按键输入
             if select.select([sys.stdin], [], [], 0.001)[0]:  # 1ms超时
-                key = sys.stdin.read(1)
+                # 一次读空终端缓冲（按键连发时多个字节已在缓冲区内）
+                buf = os.read(stdin_fd, 16)
+                if not buf:
+                    continue
                 
-                if key in ['1', '2']:
-                    current_key = key
-                    last_key_time = time.time()
-                elif key == 'q' or key == 'Q':
+                if b'q' in buf or b'Q' in buf:
                     print("\n⚠️  检测到退出键 'q'，程序即将退出...")
                     keyboard_thread_running = False
                     break
+                
+                # 取最后一个有效按键（1/2）
+                key = buf.rstrip(b'\r\n')[-1:].decode('ascii', 'ignore')
+                if key in ['1', '2']:
+                    current_key = key
+                    last_key_time = time.time()
             
             time.sleep(0.001)  # 1ms循环
     
@@ -341,8 +462,8 @@ def ui_command_receiver_thread(command_port=5562):
     print(f"\n🎮 启动UI命令接收线程: tcp://*:{command_port}")
     
     try:
-        # 创建独立的ZMQ上下文
-        command_context = zmq.Context()
+        # 使用进程级共享ZMQ上下文（与视频/音频/调试线程共用一个I/O线程）
+        command_context = zmq.Context.instance()
         command_socket = command_context.socket(zmq.PULL)
         command_socket.bind(f"tcp://*:{command_port}")
         
@@ -372,7 +493,7 @@ def ui_command_receiver_thread(command_port=5562):
                 
                 elif msg_type == "gripper_value":
                     # 处理精确值设置
-                    value = msg.get("value", 0.0)
+                    value = float(msg.get("value", 0.0))  # 写入时统一为float，发布循环直接使用
                     with gripper_lock:
                         gripper_value = max(0.0, min(1.0, value))
                         print(f"🎮 [UI命令] 设置夹爪值: {gripper_value:.3f}")
@@ -387,142 +508,245 @@ def ui_command_receiver_thread(command_port=5562):
         print(f"❌ UI命令接收线程异常: {e}")
     finally:
         try:
-            command_socket.close()
-            command_context.term()
+            command_socket.close()  # 共享上下文不在此term
         except:
             pass
         print("✓ UI命令接收线程已退出")
 
 
+def video_display_thread():
+    """
+    视频显示线程 - 从单槽缓冲读取最新JPEG，解码、叠加信息并显示
+    
+    与接收线程解耦：putText/imshow/waitKey 不再阻塞下一次ZMQ recv，
+    显示跟不上时直接覆盖旧帧（只显示最新一帧）。
+    """
+    global video_thread_running
+    
+    # OpenCV HighGUI 只在本线程调用（窗口创建与显示必须在同一线程）
+    try:
+        cv2.namedWindow('Left Wrist Camera', cv2.WINDOW_NORMAL)
+        cv2.resizeWindow('Left Wrist Camera', 640, 480)
+        cv2.namedWindow('Top Camera', cv2.WINDOW_NORMAL)
+        cv2.resizeWindow('Top Camera', 640, 480)
+        print("✓ OpenCV双摄像头窗口已创建（Left Wrist + Top）")
+    except Exception as e:
+        print(f"⚠️  OpenCV窗口创建失败（可能无显示环境）: {e}")
+    
+    display_interval = 1.0 / VIDEO_DISPLAY_FPS
+    last_show_ts = 0.0
+    
+    try:
+        while video_thread_running:
+            # 等待接收线程放入新帧（超时用于检查退出标志）
+            if not video_display_event.wait(timeout=0.5):
+                continue
+            
+            # 限制刷新频率：未到下一个显示时刻则先等待，之后取槽中最新帧
+            remaining = last_show_ts + display_interval - time.time()
+            if remaining > 0:
+                time.sleep(remaining)
+            last_show_ts = time.time()
+            
+            with video_display_lock:
+                slot = video_display_slot
+                video_display_event.clear()
+            
+            if slot is None:
+                continue
+            
+            encoded_data_left, encoded_data_top, frame_idx, latency = slot
+            show_latency = latency > 0
+            if show_latency:
+                latency_text = f"Latency: {latency:.1f}ms"
+            
+            try:
+                # 处理左腕摄像头
+                if encoded_data_left is not None:
+                    nparr_left = np.frombuffer(encoded_data_left, np.uint8)
+                    frame_left = cv2.imdecode(nparr_left, cv2.IMREAD_COLOR)
+                    
+                    if frame_left is not None:
+                        # 叠加信息
+                        cv2.putText(frame_left, f"Left Wrist - Frame: {frame_idx}", 
+                                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
+                                   0.6, (0, 255, 255), 2)
+                        if show_latency:
+                            cv2.putText(frame_left, latency_text, 
+                                       (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 
+                                       0.6, (0, 255, 0), 2)
+                        
+                        cv2.imshow('Left Wrist Camera', frame_left)
+                
+                # 处理顶部摄像头
+                if encoded_data_top is not None:
+                    nparr_top = np.frombuffer(encoded_data_top, np.uint8)
+                    frame_top = cv2.imdecode(nparr_top, cv2.IMREAD_COLOR)
+                    
+                    if frame_top is not None:
+                        # 叠加信息
+                        cv2.putText(frame_top, f"Top - Frame: {frame_idx}", 
+                                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
+                                   0.6, (0, 255, 255), 2)
+                        if show_latency:
+                            cv2.putText(frame_top, latency_text, 
+                                       (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 
+                                       0.6, (0, 255, 0), 2)
+                        
+                        cv2.imshow('Top Camera', frame_top)
+                
+                # 按 'q' 退出
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    print("\n⚠️  视频窗口按下'q'，退出...")
+                    video_thread_running = False
+                    break
+            
+            except Exception as e:
+                if frame_idx % 30 == 0:
+                    print(f"⚠️  视频解码失败: {e}")
+    
+    finally:
+        try:
+            cv2.destroyAllWindows()
+        except:
+            pass
+        print("✓ 视频显示线程已退出")
+
+
 def video_receiver_thread(video_host="localhost", video_port=5557):
     """
     视频接收线程 - 从B端接收视频流（支持双摄像头：left_wrist + top）
+    
+    只负责接收和保存最新JPEG；解码和OpenCV显示交给 video_display_thread。
     """
     global video_thread_running, video_frame_count, video_last_latency
     global latest_video_left, latest_video_top, video_lock
+    global video_display_slot
     
     print(f"\n📹 启动视频接收线程（双摄像头模式）: {video_host}:{video_port}")
     
+    display_thread = None
+    
     try:
-        # 创建独立的ZMQ上下文（避免与发布端冲突）
-        video_context = zmq.Context()
+        # 使用进程级共享ZMQ上下文（与音频/调试线程共用一个I/O线程）
+        video_context = zmq.Context.instance()
         video_socket = video_context.socket(zmq.SUB)
         video_socket.setsockopt(zmq.RCVHWM, 1)  # 接收缓冲区只保留1帧
-        video_socket.setsockopt(zmq.CONFLATE, 1)  # 只保留最新消息，丢弃旧帧
+        # 注意：不能使用CONFLATE——它不支持多帧消息（只保留其中一帧），
+        # 视频为多帧格式，改为接收后清空队列只取最新一条
         video_socket.connect(f"tcp://{video_host}:{video_port}")
         video_socket.setsockopt_string(zmq.SUBSCRIBE, "")  # 订阅所有消息
         
         print(f"✓ 视频接收已连接到 {video_host}:{video_port}")
         
-        # 创建双摄像头窗口（如果启用显示）
+        # 启动显示线程（如果启用）
         if ENABLE_VIDEO_DISPLAY:
-            try:
-                cv2.namedWindow('Left Wrist Camera', cv2.WINDOW_NORMAL)
-                cv2.resizeWindow('Left Wrist Camera', 640, 480)
-                cv2.namedWindow('Top Camera', cv2.WINDOW_NORMAL)
-                cv2.resizeWindow('Top Camera', 640, 480)
-                print("✓ OpenCV双摄像头窗口已创建（Left Wrist + Top）")
-            except Exception as e:
-                print(f"⚠️  OpenCV窗口创建失败（可能无显示环境）: {e}")
+            display_thread = threading.Thread(
+                target=video_display_thread,
+                daemon=True,
+                name="VideoDisplay"
+            )
+            display_thread.start()
         
         while video_thread_running:
             try:
                 # 非阻塞接收（1秒超时）
                 if video_socket.poll(1000):
                     recv_time = time.time()
-                    video_data = video_socket.recv()
+                    # copy=False：JPEG帧直接以zmq.Frame交付，避免每帧一次拷贝
+                    video_parts = video_socket.recv_multipart(copy=False)
+                    # 丢弃积压的旧帧，只处理最新一条完整消息
+                    while video_socket.poll(0):
+                        video_parts = video_socket.recv_multipart(copy=False)
                     
-                    # 尝试反序列化（支持pickle和JSON）
-                    try:
-                        # 优先尝试pickle（A_real_video.py使用pickle）
-                        frame_dict = pickle.loads(video_data)
-                    except:
+                    if len(video_parts) == 3:
+                        # 多帧格式（B_reverse_whole_voice.py）：[JSON头, 左腕JPEG, 顶部JPEG]
                         try:
-                            # 回退到JSON
-                            frame_dict = json.loads(video_data.decode('utf-8'))
-                        except:
-                            print("⚠️  视频数据反序列化失败")
+                            frame_dict = json.loads(video_parts[0].bytes)
+                        except ValueError:
+                            print("⚠️  视频帧头解析失败")
+                            continue
+                        # memoryview零拷贝引用（持有底层zmq.Frame）
+                        frame_dict['image.left_wrist'] = video_parts[1].buffer
+                        frame_dict['image.top'] = video_parts[2].buffer
+                    elif len(video_parts) == 2 and len(video_parts[0].buffer) == VIDEO_FRAME_HEADER.size:
+                        # 单摄像头固定帧头格式：[帧头, JPEG]（whole3_2/C_real_video_reverse_ultra.py 发出，B_for_triple.py 按消息原样转发；
+                        # whole3/C_real_video_reverse_ultra.py 仍发送单帧pickle，走下面的旧格式分支）
+                        capture_time, _ = VIDEO_FRAME_HEADER.unpack(video_parts[0].buffer)
+                        frame_dict = {
+                            'encoding': 'jpeg',
+                            'timestamp': capture_time,
+                            'image.top': video_parts[1].buffer,
+                        }
+                    elif len(video_parts) == 2 and video_parts[0].buffer[:1] == b'{':
+                        # 单摄像头别名格式（B_reverse_whole_voice.py）：[JSON头, JPEG]，同一JPEG用于 aliases 中的各字段
+                        try:
+                            frame_dict = json.loads(video_parts[0].bytes)
+                        except ValueError:
+                            print("⚠️  视频帧头解析失败")
                             continue
+                        image = video_parts[1].buffer
+                        for key in frame_dict.pop('aliases', ['image.left_wrist', 'image.top']):
+                            frame_dict[key] = image
+                    else:
+                        # 旧格式：单帧pickle/JSON字典
+                        video_data = video_parts[0].bytes
+                        try:
+                            # 优先尝试pickle（A_real_video.py使用pickle）
+                            frame_dict = pickle.loads(video_data)
+                        except:
+                            try:
+                                # 回退到JSON
+                                frame_dict = json.loads(video_data.decode('utf-8'))
+                            except:
+                                print("⚠️  视频数据反序列化失败")
+                                continue
                     
                     video_frame_count += 1
                     
+                    # 每帧只查一次字典/计数器，后续统一使用局部变量
+                    has_left = 'image.left_wrist' in frame_dict
+                    has_top = 'image.top' in frame_dict
+                    log_this = (video_frame_count % 30 == 0)
+                    
                     # 计算延迟
-                    if 'timestamp' in frame_dict:
-                        video_last_latency = (recv_time - frame_dict['timestamp']) * 1000  # ms
+                    timestamp = frame_dict.get('timestamp')
+                    if timestamp is not None:
+                        video_last_latency = (recv_time - timestamp) * 1000  # ms
+                    latency = video_last_latency
                     
-                    # 保存和解码双摄像头视频帧
+                    # 保存双摄像头视频帧（JPEG原始数据）
                     if frame_dict.get('encoding') == 'jpeg':
-                        try:
-                            # 处理左腕摄像头
-                            if 'image.left_wrist' in frame_dict:
-                                encoded_data_left = frame_dict['image.left_wrist']
-                                if isinstance(encoded_data_left, bytes):
-                                    # 保存到全局变量供PyQt5 UI使用
-                                    with video_lock:
-                                        latest_video_left = encoded_data_left
-                                    
-                                    # OpenCV显示（如果启用）
-                                    if ENABLE_VIDEO_DISPLAY:
-                                        nparr_left = np.frombuffer(encoded_data_left, np.uint8)
-                                        frame_left = cv2.imdecode(nparr_left, cv2.IMREAD_COLOR)
-                                        
-                                        if frame_left is not None:
-                                            # 叠加信息
-                                            cv2.putText(frame_left, f"Left Wrist - Frame: {video_frame_count}", 
-                                                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
-                                                       0.6, (0, 255, 255), 2)
-                                            if video_last_latency > 0:
-                                                cv2.putText(frame_left, f"Latency: {video_last_latency:.1f}ms", 
-                                                           (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 
-                                                           0.6, (0, 255, 0), 2)
-                                            
-                                            cv2.imshow('Left Wrist Camera', frame_left)
-                            
-                            # 处理顶部摄像头
-                            if 'image.top' in frame_dict:
-                                encoded_data_top = frame_dict['image.top']
-                                if isinstance(encoded_data_top, bytes):
-                                    # 保存到全局变量供PyQt5 UI使用
-                                    with video_lock:
-                                        latest_video_top = encoded_data_top
-                                    
-                                    # OpenCV显示（如果启用）
-                                    if ENABLE_VIDEO_DISPLAY:
-                                        nparr_top = np.frombuffer(encoded_data_top, np.uint8)
-                                        frame_top = cv2.imdecode(nparr_top, cv2.IMREAD_COLOR)
-                                        
-                                        if frame_top is not None:
-                                            # 叠加信息
-                                            cv2.putText(frame_top, f"Top - Frame: {video_frame_count}", 
-                                                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
-                                                       0.6, (0, 255, 255), 2)
-                                            if video_last_latency > 0:
-                                                cv2.putText(frame_top, f"Latency: {video_last_latency:.1f}ms", 
-                                                           (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 
-                                                           0.6, (0, 255, 0), 2)
-                                            
-                                            cv2.imshow('Top Camera', frame_top)
-                            
-                            # 按 'q' 退出（仅在OpenCV显示模式）
-                            if ENABLE_VIDEO_DISPLAY:
-                                if cv2.waitKey(1) & 0xFF == ord('q'):
-                                    print("\n⚠️  视频窗口按下'q'，退出...")
-                                    video_thread_running = False
-                                    break
-                                
-                        except Exception as e:
-                            if video_frame_count % 30 == 0:
-                                print(f"⚠️  视频解码失败: {e}")
+                        encoded_data_left = frame_dict['image.left_wrist'] if has_left else None
+                        if not isinstance(encoded_data_left, (bytes, memoryview)):
+                            encoded_data_left = None
+                        encoded_data_top = frame_dict['image.top'] if has_top else None
+                        if not isinstance(encoded_data_top, (bytes, memoryview)):
+                            encoded_data_top = None
+                        
+                        # 保存到全局变量供PyQt5 UI使用
+                        with video_lock:
+                            if encoded_data_left is not None:
+                                latest_video_left = encoded_data_left
+                            if encoded_data_top is not None:
+                                latest_video_top = encoded_data_top
+                        
+                        # 交给显示线程（单槽覆盖，只保留最新一帧）
+                        if ENABLE_VIDEO_DISPLAY:
+                            with video_display_lock:
+                                video_display_slot = (encoded_data_left, encoded_data_top,
+                                                      video_frame_count, latency)
+                                video_display_event.set()
                     
                     # 音频已由独立线程处理，这里只处理视频
                     
                     # 每30帧打印一次日志
-                    if video_frame_count % 30 == 0:
-                        latency_str = f"{video_last_latency:.1f}ms" if video_last_latency > 0 else "N/A"
+                    if log_this:
+                        latency_str = f"{latency:.1f}ms" if latency > 0 else "N/A"
                         cameras_info = []
-                        if 'image.left_wrist' in frame_dict:
+                        if has_left:
                             cameras_info.append("left_wrist")
-                        if 'image.top' in frame_dict:
+                        if has_top:
                             cameras_info.append("top")
                         cameras_str = "+".join(cameras_info) if cameras_info else "N/A"
                         print(f"📹 [视频] 接收帧 #{video_frame_count}, 摄像头: [{cameras_str}], 延迟: {latency_str}")
@@ -537,14 +761,11 @@ def video_receiver_thread(video_host="localhost", video_port=5557):
     except Exception as e:
         print(f"❌ 视频接收线程异常: {e}")
     finally:
-        if ENABLE_VIDEO_DISPLAY:
-            try:
-                cv2.destroyAllWindows()
-            except:
-                pass
+        if display_thread is not None:
+            video_display_event.set()  # 唤醒显示线程以便退出
+            display_thread.join(timeout=1.0)
         try:
-            video_socket.close()
-            video_context.term()
+            video_socket.close()  # 共享上下文不在此term
         except:
             pass
         print("✓ 视频接收线程已退出")
@@ -571,7 +792,8 @@ def audio_receiver_thread(audio_host="localhost", audio_port=5561):
     
     print(f"\n🔊 启动音频接收线程: {audio_host}:{audio_port}")
     
-    context = zmq.Context()
+    # 使用进程级共享ZMQ上下文（与视频/调试线程共用一个I/O线程）
+    context = zmq.Context.instance()
     audio_socket = None
     
     try:
@@ -585,15 +807,31 @@ def audio_receiver_thread(audio_host="localhost", audio_port=5561):
         print(f"✓ 音频接收已连接到 {audio_host}:{audio_port}")
         print(f"   接收模式: 独立音频流 (Opus 编码)")
         
+        # 使用Poller作为唯一等待原语（100ms超时，便于检查退出标志）
+        poller = zmq.Poller()
+        poller.register(audio_socket, zmq.POLLIN)
+        
         while audio_thread_running:
             try:
-                # 接收音频数据
-                audio_packet = audio_socket.recv()
+                socks = dict(poller.poll(100))
+                if audio_socket not in socks:
+                    continue
                 
-                # 反序列化
-                audio_data = pickle.loads(audio_packet)
+                # 接收音频数据（poll已确认可读，非阻塞）
+                audio_parts = audio_socket.recv_multipart(zmq.NOBLOCK)
+                
+                if len(audio_parts) >= 2 and len(audio_parts) % 2 == 0:
+                    # 原始帧格式：[编码名, Opus数据]，C端合并发送时为多组 [编码名0, 音频0, 编码名1, 音频1, ...]，无需反序列化
+                    frames = [{'codec': audio_parts[i].decode('ascii', 'ignore'), 'data': audio_parts[i + 1]}
+                              for i in range(0, len(audio_parts), 2)]
+                else:
+                    # 旧格式：pickle字典 {'codec', 'data', ...}
+                    frames = [pickle.loads(audio_parts[0])]
                 
-                if isinstance(audio_data, dict) and 'data' in audio_data:
+                for audio_data in frames:
+                    if not (isinstance(audio_data, dict) and 'data' in audio_data):
+                        continue
+                    
                     # 提取 Opus 编码数据
                     opus_bytes = audio_data['data']
                     
@@ -613,7 +851,7 @@ def audio_receiver_thread(audio_host="localhost", audio_port=5561):
                                 print("⚠️  音频缓冲队列已满，丢弃旧帧")
                             
             except zmq.Again:
-                time.sleep(0.001)
+                continue
             except Exception as e:
                 if audio_frame_count % 100 == 0:
                     print(f"⚠️  音频接收错误: {e}")
@@ -626,16 +864,37 @@ def audio_receiver_thread(audio_host="localhost", audio_port=5561):
     finally:
         if audio_socket:
             try:
-                audio_socket.close()
+                audio_socket.close()  # 共享上下文不在此term
             except:
                 pass
-        try:
-            context.term()
-        except:
-            pass
         print("✓ 音频接收线程已退出")
 
 
+def opus_decode_into(decoder, opus_bytes, pcm_buf):
+    """
+    将Opus数据直接解码到预分配的int16缓冲区（不产生新的bytes/ndarray）
+    
+    参数：
+        decoder: opuslib.Decoder 实例
+        opus_bytes: Opus编码数据
+        pcm_buf: 预分配的 np.int16 缓冲区，长度 >= OPUS_FRAME_SIZE * AUDIO_CHANNELS
+    
+    返回：
+        pcm_buf 中有效样本的视图
+    """
+    samples = opuslib.api.decoder.libopus_decode(
+        decoder._state,
+        opus_bytes,
+        len(opus_bytes),
+        pcm_buf.ctypes.data_as(opuslib.api.c_int16_pointer),
+        OPUS_FRAME_SIZE,
+        0
+    )
+    if samples < 0:
+        raise opuslib.OpusError(samples)
+    return pcm_buf[:samples * AUDIO_CHANNELS]
+
+
 def audio_player_thread():
     """
     音频播放线程 - Opus 解码并通过扬声器播放
@@ -683,18 +942,18 @@ def audio_player_thread():
         decoded_count = 0
         underrun_count = 0
         
+        # 预分配PCM缓冲区（解码直接写入，循环内零分配）
+        pcm_buf = np.empty(OPUS_FRAME_SIZE * AUDIO_CHANNELS, dtype=np.int16)
+        
         while audio_thread_running:
             try:
                 # 从队列获取 Opus 编码数据（阻塞，1秒超时）
                 opus_bytes = audio_buffer_queue.get(timeout=1.0)
                 
-                # Opus 解码
-                pcm_data = audio_opus_decoder.decode(opus_bytes, OPUS_FRAME_SIZE)
-                
-                # 转换为 numpy array
-                audio_array = np.frombuffer(pcm_data, dtype=np.int16)
+                # Opus 解码（直接写入预分配缓冲区）
+                audio_array = opus_decode_into(audio_opus_decoder, opus_bytes, pcm_buf)
                 
-                # 播放音频
+                # 播放音频（write会拷贝到流缓冲区，pcm_buf可立即复用）
                 audio_stream.write(audio_array)
                 
                 decoded_count += 1
@@ -703,7 +962,8 @@ def audio_player_thread():
                 try:
                     # 采样：每个Opus帧通常480或960样本，我们需要256个显示
                     sample_step = max(1, len(audio_array) // 256)
-                    waveform_samples = audio_array[::sample_step][:256]
+                    # 拷贝出来：audio_array 是 pcm_buf 的视图，下一帧会被覆盖
+                    waveform_samples = audio_array[::sample_step][:256].copy()
                     
                     # 计算RMS音量
                     rms = np.sqrt(np.mean(audio_array.astype(np.float32) ** 2))
@@ -771,15 +1031,14 @@ def debug_publisher_thread(debug_port=5560):
         "video_top": <JPEG bytes or None>
     }
     """
-    global imu1_euler, imu2_euler, imu3_euler, gripper_value
-    global imu1_last_update, imu2_last_update, imu3_last_update
+    global gripper_value
     global latest_video_left, latest_video_top, video_lock
     
     print(f"\n🔧 启动调试数据发布线程: tcp://*:{debug_port}")
     
     try:
-        # 创建独立的ZMQ上下文（避免与主线程冲突）
-        debug_context = zmq.Context()
+        # 使用进程级共享ZMQ上下文（与视频/音频线程共用一个I/O线程）
+        debug_context = zmq.Context.instance()
         debug_socket = debug_context.socket(zmq.PUB)
         debug_socket.bind(f"tcp://*:{debug_port}")
         
@@ -797,29 +1056,26 @@ def debug_publisher_thread(debug_port=5560):
             try:
                 current_time = time.time()
                 
-                # === 读取最新IMU数据 ===
-                with imu_data_lock:
-                    euler1 = imu1_euler.copy()
-                    euler2 = imu2_euler.copy()
-                    euler3 = imu3_euler.copy()
-                    
-                    # 在线状态检查
-                    imu1_online = (current_time - imu1_last_update) < 1.0 if imu1_last_update > 0 else False
-                    imu2_online = (current_time - imu2_last_update) < 1.0 if imu2_last_update > 0 else False
-                    imu3_online = (current_time - imu3_last_update) < 1.0 if imu3_last_update > 0 else False
+                # === 读取最新IMU数据（无锁快照） ===
+                euler1, euler2, euler3 = read_imu_euler_snapshot()
+                
+                # 在线状态检查
+                imu1_online, imu2_online, imu3_online = (
+                    (current_time - imu_last_update) < IMU_ONLINE_TIMEOUT).tolist()
                 
                 # === 计算末端位置 ===
                 try:
                     end_pos, link1_pos, link2_pos = calculate_end_effector_position(euler1, euler2)
                     
-                    # 坐标映射
-                    x_raw = float(np.clip(end_pos[0], X_RAW_MIN, X_RAW_MAX))
-                    y_raw = float(np.clip(end_pos[1], Y_RAW_MIN, Y_RAW_MAX))
-                    z_raw = float(np.clip(end_pos[2], Z_RAW_MIN, Z_RAW_MAX))
+                    # 坐标映射（标量min/max约束，避免np.clip的ufunc分派）
+                    ex, ey, ez = end_pos.tolist()
+                    x_raw = min(max(ex, X_RAW_MIN), X_RAW_MAX)
+                    y_raw = min(max(ey, Y_RAW_MIN), Y_RAW_MAX)
+                    z_raw = min(max(ez, Z_RAW_MIN), Z_RAW_MAX)
                     
-                    x_mapped = float(X_TARGET_MIN + (x_raw - X_RAW_MIN) / (X_RAW_MAX - X_RAW_MIN) * (X_TARGET_MAX - X_TARGET_MIN))
-                    y_mapped = float(Y_TARGET_MIN + (y_raw - Y_RAW_MIN) / (Y_RAW_MAX - Y_RAW_MIN) * (Y_TARGET_MAX - Y_TARGET_MIN))
-                    z_mapped = float(Z_TARGET_MIN + (z_raw - Z_RAW_MIN) / (Z_RAW_MAX - Z_RAW_MIN) * (Z_TARGET_MAX - Z_TARGET_MIN))
+                    x_mapped = x_raw * X_MAP_SCALE + X_MAP_OFFSET
+                    y_mapped = y_raw * Y_MAP_SCALE + Y_MAP_OFFSET
+                    z_mapped = z_raw * Z_MAP_SCALE + Z_MAP_OFFSET
                     
                     last_position_raw = [x_raw, y_raw, z_raw]
                     last_position_mapped = [x_mapped, y_mapped, z_mapped]
@@ -836,6 +1092,12 @@ def debug_publisher_thread(debug_port=5560):
                     current_video_left = latest_video_left
                     current_video_top = latest_video_top
                 
+                # 接收端保存的可能是零拷贝memoryview，发布前转为bytes（pickle需要）
+                if isinstance(current_video_left, memoryview):
+                    current_video_left = current_video_left.tobytes()
+                if isinstance(current_video_top, memoryview):
+                    current_video_top = current_video_top.tobytes()
+                
                 # === 读取最新音频数据 ===
                 with audio_data_lock:
                     current_audio_waveform = latest_audio_waveform
@@ -846,19 +1108,19 @@ def debug_publisher_thread(debug_port=5560):
                 debug_data = {
                     "timestamp": current_time,
                     "imu1": {
-                        "roll": float(euler1["roll"]),
-                        "pitch": float(euler1["pitch"]),
-                        "yaw": float(euler1["yaw"])
+                        "roll": euler1[0],
+                        "pitch": euler1[1],
+                        "yaw": euler1[2]
                     },
                     "imu2": {
-                        "roll": float(euler2["roll"]),
-                        "pitch": float(euler2["pitch"]),
-                        "yaw": float(euler2["yaw"])
+                        "roll": euler2[0],
+                        "pitch": euler2[1],
+                        "yaw": euler2[2]
                     },
                     "imu3": {
-                        "roll": float(euler3["roll"]),
-                        "pitch": float(euler3["pitch"]),
-                        "yaw": float(euler3["yaw"])
+                        "roll": euler3[0],
+                        "pitch": euler3[1],
+                        "yaw": euler3[2]
                     },
                     "position": {
                         "raw": last_position_raw,
@@ -912,8 +1174,7 @@ def debug_publisher_thread(debug_port=5560):
         print(f"❌ 调试数据发布线程异常: {e}")
     finally:
         try:
-            debug_socket.close()
-            debug_context.term()
+            debug_socket.close()  # 共享上下文不在此term
         except:
             pass
         print("✓ 调试数据发布线程已退出")
@@ -943,7 +1204,7 @@ def ui_command_receiver_thread(command_port=5562):
     
     try:
         # 创建ZMQ PULL socket接收UI命令
-        cmd_context = zmq.Context()
+        cmd_context = zmq.Context.instance()  # 进程级共享上下文
         cmd_socket = cmd_context.socket(zmq.PULL)
         cmd_socket.bind(f"tcp://*:{command_port}")
         print(f"✓ UI命令PULL socket已绑定到端口 {command_port}")
@@ -982,7 +1243,7 @@ def ui_command_receiver_thread(command_port=5562):
                 elif cmd_type == "gripper_value":
                     # 夹爪精确值设置
                     value = float(cmd_data.get("value", 0.0))
-                    value = np.clip(value, 0.0, 1.0)
+                    value = min(max(value, 0.0), 1.0)
                     with gripper_lock:
                         gripper_value = value
                     print(f"🎮 [UI命令] 夹爪设置为: {value:.2f}")
@@ -1001,20 +1262,15 @@ def ui_command_receiver_thread(command_port=5562):
         print(f"❌ UI命令接收线程异常: {e}")
     finally:
         try:
-            cmd_socket.close()
-            cmd_context.term()
+            cmd_socket.close()  # 共享上下文不在此term
         except:
             pass
         print("✓ UI命令接收线程已退出")
 
 
 def normalize_angle(angle):
-    """将角度归一化到 [-180, 180] 范围"""
-    while angle > 180:
-        angle -= 360
-    while angle < -180:
-        angle += 360
-    return angle
+    """将角度归一化到 [-180, 180) 范围（取模实现，无循环分支）"""
+    return (angle + 180.0) % 360.0 - 180.0
 
 
 def normalize_yaw_angle(yaw_raw, yaw_offset, imu_name="IMU"):
@@ -1065,11 +1321,8 @@ def normalize_yaw_angle(yaw_raw, yaw_offset, imu_name="IMU"):
         # 后续帧：减去偏置
         yaw_normalized = yaw_raw - yaw_offset
         
-        # 处理跨越±180°边界的情况，保持在[-180°, +180°]
-        if yaw_normalized > 180.0:
-            yaw_normalized -= 360.0
-        elif yaw_normalized < -180.0:
-            yaw_normalized += 360.0
+        # 处理跨越±180°边界的情况，保持在[-180°, +180°)
+        yaw_normalized = normalize_angle(yaw_normalized)
         
         return yaw_normalized, yaw_offset
     
@@ -1092,21 +1345,74 @@ def normalize_yaw_angle(yaw_raw, yaw_offset, imu_name="IMU"):
     yaw_normalized = yaw_raw - yaw_offset
     
     # 处理跨越±180°边界的情况
-    if yaw_normalized > 180.0:
-        yaw_normalized -= 360.0
-    elif yaw_normalized < -180.0:
-        yaw_normalized += 360.0
+    yaw_normalized = normalize_angle(yaw_normalized)
     
     return yaw_normalized, yaw_offset
 
 
+@njit(cache=True)
+def euler_xyz_first_column(roll_rad, pitch_rad, yaw_rad):
+    """
+    计算 Rotation.from_euler('xyz', [roll, pitch, yaw]).as_matrix() 的第一列
+    
+    SciPy小写'xyz'为外旋：R = Rz(yaw) @ Ry(pitch) @ Rx(roll)，
+    Rx 不改变x轴，因此第一列只与 pitch/yaw 有关：
+        [cos(p)cos(y), cos(p)sin(y), -sin(p)]
+    """
+    cp = math.cos(pitch_rad)
+    return (cp * math.cos(yaw_rad), cp * math.sin(yaw_rad), -math.sin(pitch_rad))
+
+
+def verify_euler_xyz_first_column():
+    """启动时用SciPy在网格上校验一次闭式解，返回是否一致"""
+    grid = np.deg2rad(np.arange(-180.0, 181.0, 45.0))
+    for r in grid:
+        for p in grid:
+            for y in grid:
+                expected = Rotation.from_euler('xyz', [r, p, y]).as_matrix()[:, 0]
+                if not np.allclose(euler_xyz_first_column(r, p, y), expected, atol=1e-9):
+                    return False
+    return True
+
+
+@njit(cache=True)
+def end_effector_kernel(angles_deg, out):
+    """
+    两杆运动学内核：结果写入预分配缓冲区，不分配新数组（安装numba时编译为本地代码）
+    
+    参数：
+        angles_deg: 长度6的数组 [roll1, pitch1, yaw1, roll2, pitch2, yaw2]（度）
+        out: (3, 3) 输出缓冲区，行0=杆1末端，行1=杆2末端，行2=机械臂末端（米）
+    """
+    deg2rad = math.pi / 180.0
+    
+    # 旋转矩阵第一列（roll不影响杆方向）
+    c1x, c1y, c1z = euler_xyz_first_column(
+        angles_deg[0] * deg2rad, angles_deg[1] * deg2rad, angles_deg[2] * deg2rad)
+    c2x, c2y, c2z = euler_xyz_first_column(
+        angles_deg[3] * deg2rad, angles_deg[4] * deg2rad, angles_deg[5] * deg2rad)
+    
+    # 转换到世界坐标系
+    out[0, 0] = c1x * L1
+    out[0, 1] = c1y * L1
+    out[0, 2] = c1z * L1
+    out[1, 0] = c2x * L2
+    out[1, 1] = c2y * L2
+    out[1, 2] = c2z * L2
+    
+    # 末端位置 = 杆1末端 + 杆2末端
+    out[2, 0] = out[0, 0] + out[1, 0]
+    out[2, 1] = out[0, 1] + out[1, 1]
+    out[2, 2] = out[0, 2] + out[1, 2]
+
+
 def calculate_end_effector_position(euler1, euler2):
     """
     计算两杆串联机械臂的末端位置（完整3D运动学，借鉴dual_imu_euler.py）
     
     参数：
-        euler1: IMU1的欧拉角字典 {"roll": ..., "pitch": ..., "yaw": ...} (度)
-        euler2: IMU2的欧拉角字典 {"roll": ..., "pitch": ..., "yaw": ...} (度)
+        euler1: IMU1的欧拉角 [roll, pitch, yaw] (度)
+        euler2: IMU2的欧拉角 [roll, pitch, yaw] (度)
     
     返回：
         end_pos: 末端位置 [x, y, z]（米）
@@ -1116,32 +1422,104 @@ def calculate_end_effector_position(euler1, euler2):
     公式:
         末端位置 = R1 @ [L1, 0, 0]^T + R2 @ [L2, 0, 0]^T
         其中 R1, R2 是由欧拉角 (XYZ顺序) 构建的旋转矩阵
+        杆向量沿局部x轴，只需旋转矩阵第一列（见 euler_xyz_first_column）
+    
+    高频调用方（publisher_loop）直接使用 end_effector_kernel 和预分配缓冲区。
+    """
+    angles_deg = np.array([euler1[0], euler1[1], euler1[2],
+                           euler2[0], euler2[1], euler2[2]], dtype=np.float64)
+    out = np.empty((3, 3), dtype=np.float64)
+    end_effector_kernel(angles_deg, out)
+    return out[2], out[0], out[1]
+
+
+@njit(cache=True, fastmath=True)
+def compute_publish_outputs(ex, ey, ez, roll3_deg, pitch3_deg, yaw3_deg):
     """
-    # 将欧拉角从度转换为弧度
-    roll1_rad = np.deg2rad(euler1["roll"])
-    pitch1_rad = np.deg2rad(euler1["pitch"])
-    yaw1_rad = np.deg2rad(euler1["yaw"])
+    发布循环的标量计算：约束 → 线性映射 → shoulder_pan → IMU3角度转弧度
     
-    roll2_rad = np.deg2rad(euler2["roll"])
-    pitch2_rad = np.deg2rad(euler2["pitch"])
-    yaw2_rad = np.deg2rad(euler2["yaw"])
+    全部使用标量运算（无NumPy ufunc分派），安装numba时编译为本地代码。
     
-    # 构建旋转矩阵 (使用XYZ欧拉角顺序，与IMU输出一致)
-    R1 = Rotation.from_euler('xyz', [roll1_rad, pitch1_rad, yaw1_rad]).as_matrix()
-    R2 = Rotation.from_euler('xyz', [roll2_rad, pitch2_rad, yaw2_rad]).as_matrix()
+    参数：
+        ex, ey, ez: 末端原始位置（米）
+        roll3_deg, pitch3_deg, yaw3_deg: IMU3欧拉角（度）
     
-    # 杆1和杆2在各自局部坐标系下的向量 (沿x轴)
-    link1_local = np.array([L1, 0.0, 0.0])
-    link2_local = np.array([L2, 0.0, 0.0])
+    返回：
+        (x_raw, y_raw, z_raw, x_mapped, y_mapped, z_mapped,
+         shoulder_pan, roll3_rad, pitch3_rad, yaw3_rad)
+    """
+    # 约束到原始范围
+    x_raw = min(max(ex, X_RAW_MIN), X_RAW_MAX)
+    y_raw = min(max(ey, Y_RAW_MIN), Y_RAW_MAX)
+    z_raw = min(max(ez, Z_RAW_MIN), Z_RAW_MAX)
     
-    # 转换到世界坐标系
-    link1_world = R1 @ link1_local
-    link2_world = R2 @ link2_local
+    # 线性映射到目标范围
+    x_mapped = x_raw * X_MAP_SCALE + X_MAP_OFFSET
+    y_mapped = y_raw * Y_MAP_SCALE + Y_MAP_OFFSET
+    z_mapped = z_raw * Z_MAP_SCALE + Z_MAP_OFFSET
     
-    # 末端位置 = 杆1末端 + 杆2末端
-    end_pos = link1_world + link2_world
+    # shoulder_pan：末端在xy平面投影相对于x轴的角度（弧度）
+    shoulder_pan = math.atan2(y_raw, x_raw)
+    
+    # IMU3姿态（弧度）
+    deg2rad = math.pi / 180.0
+    return (x_raw, y_raw, z_raw, x_mapped, y_mapped, z_mapped,
+            shoulder_pan, roll3_deg * deg2rad, pitch3_deg * deg2rad, yaw3_deg * deg2rad)
+
+
+def encode_lerobot_message(message):
+    """将LeRobot消息编码为JSON bytes（优先orjson，未安装时回退到标准json）"""
+    if ORJSON_AVAILABLE:
+        # OPT_SERIALIZE_NUMPY：允许消息中直接放numpy标量/数组，无需逐个float()转换
+        return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(message).encode('utf-8')
+
+
+def read_imu_euler_snapshot():
+    """
+    读取三个IMU欧拉角的一致快照：先走seqlock快速路径，重试超限时回退到持锁读取
+    
+    单写入端（RS485接收线程）+ 序列号校验，常见情况下读取端不与写入端争锁。
+    CPython不对纯Python代码之间的内存可见顺序作正式保证，自由线程构建（3.13t）下这只是尽力而为的
+    快速路径；连续 SEQLOCK_MAX_RETRIES 次读到写入中/被改写的数据时持 imu_data_lock 读取。
+    
+    返回：
+        [[roll1, pitch1, yaw1], [roll2, pitch2, yaw2], [roll3, pitch3, yaw3]]（度，Python float）
+    """
+    for _ in range(SEQLOCK_MAX_RETRIES):
+        seq = imu_euler_seq
+        if seq & 1:
+            # 写入进行中，让出CPU等待写入端完成
+            time.sleep(0)
+            continue
+        snapshot = imu_euler.tolist()
+        if imu_euler_seq == seq:
+            return snapshot
+    with imu_data_lock:
+        return imu_euler.tolist()
+
+
+def record_trajectory_point(position, timestamp):
+    """向轨迹环形缓冲区写入一个点（原地写入，不分配新对象）"""
+    global trajectory_count
+    idx = trajectory_count % TRAJECTORY_CAPACITY
+    trajectory_positions[idx] = position
+    trajectory_timestamps[idx] = timestamp
+    trajectory_count += 1
+
+
+def get_trajectory_arrays():
+    """
+    按时间顺序返回轨迹数据
     
-    return end_pos, link1_world, link2_world
+    返回：
+        (positions, timestamps)：未写满时为缓冲区视图，写满回绕后为按时间重排的拷贝
+    """
+    if trajectory_count <= TRAJECTORY_CAPACITY:
+        return trajectory_positions[:trajectory_count], trajectory_timestamps[:trajectory_count]
+    start = trajectory_count % TRAJECTORY_CAPACITY
+    return (np.roll(trajectory_positions, -start, axis=0),
+            np.roll(trajectory_timestamps, -start))
 
 
 def data_callback(DeviceModel):
@@ -1149,8 +1527,7 @@ def data_callback(DeviceModel):
     RS485数据回调函数
     当接收到IMU数据时被调用
     """
-    global imu1_euler, imu2_euler, imu3_euler
-    global imu1_last_update, imu2_last_update, imu3_last_update
+    global imu_euler_seq
     global imu1_yaw_offset, imu2_yaw_offset, imu3_yaw_offset
     global imu1_first_valid_data, imu2_first_valid_data, imu3_first_valid_data
     global imu1_first_data, imu2_first_data, imu3_first_data
@@ -1179,8 +1556,10 @@ def data_callback(DeviceModel):
                 # Yaw归零处理（借鉴dual_imu_euler.py的智能归零）
                 yaw_normalized, imu1_yaw_offset = normalize_yaw_angle(yaw, imu1_yaw_offset, "IMU1")
                 
-                imu1_euler = {"roll": roll, "pitch": pitch, "yaw": yaw_normalized}
-                imu1_last_update = current_time
+                imu_euler_seq += 1  # 开始写入
+                imu_euler[0] = (roll, pitch, yaw_normalized)
+                imu_euler_seq += 1  # 写入完成
+                imu_last_update[0] = current_time
         
         # 处理IMU2 (0x51 = 81)
         if 81 in data:
@@ -1201,8 +1580,10 @@ def data_callback(DeviceModel):
                 # Yaw归零处理（借鉴dual_imu_euler.py的智能归零）
                 yaw_normalized, imu2_yaw_offset = normalize_yaw_angle(yaw, imu2_yaw_offset, "IMU2")
                 
-                imu2_euler = {"roll": roll, "pitch": pitch, "yaw": yaw_normalized}
-                imu2_last_update = current_time
+                imu_euler_seq += 1  # 开始写入
+                imu_euler[1] = (roll, pitch, yaw_normalized)
+                imu_euler_seq += 1  # 写入完成
+                imu_last_update[1] = current_time
         
         # 处理IMU3 (0x52 = 82)
         if 82 in data:
@@ -1223,8 +1604,10 @@ def data_callback(DeviceModel):
                 # Yaw归零处理（借鉴dual_imu_euler.py的智能归零）
                 yaw_normalized, imu3_yaw_offset = normalize_yaw_angle(yaw, imu3_yaw_offset, "IMU3")
                 
-                imu3_euler = {"roll": roll, "pitch": pitch, "yaw": yaw_normalized}
-                imu3_last_update = current_time
+                imu_euler_seq += 1  # 开始写入
+                imu_euler[2] = (roll, pitch, yaw_normalized)
+                imu_euler_seq += 1  # 写入完成
+                imu_last_update[2] = current_time
 
 
 def publisher_loop(socket_to_b, socket_to_lerobot, publish_interval, online_only=False):
@@ -1252,193 +1635,236 @@ def publisher_loop(socket_to_b, socket_to_lerobot, publish_interval, online_only
     
     publish_count = 0
     skip_count = 0
+    dropped_count = 0  # B端队列满/未连接而丢弃的消息数
+    lerobot_dropped_count = 0  # LeRobot队列满/未连接而丢弃的消息数
     last_stat_time = time.time()
+    stats_interval = STATS_INTERVAL_TTY if IS_TTY else STATS_INTERVAL_LOG
+    
+    # 运动学预分配缓冲区：输入6个角度，输出 行0=杆1/行1=杆2/行2=末端
+    kinematics_angles = np.empty(6, dtype=np.float64)
+    kinematics_out = np.empty((3, 3), dtype=np.float64)
+    
+    # B端消息的可复用pickle编码器（每次只清空缓冲区和memo，不重新构造）
+    b_buffer = io.BytesIO()
+    b_pickler = pickle.Pickler(b_buffer, protocol=PICKLE_PROTOCOL)
+    
+    # 发布消息结构只构造一次，循环中只更新字段值（消息发送时即被序列化，不会被其他代码持有）
+    # 为B端准备的消息（使用pickle序列化，匹配B_reverse_whole.py）
+    robot_info = {
+        "shoulder_pan": 0.0,  # 肩部转角（弧度，从raw数据计算）
+        "wrist_roll": 0.0,    # 手腕roll（弧度）
+        "pitch": 0.0,         # pitch（弧度）
+        "x": 0.0,             # 原始x坐标（米）
+        "y": 0.0,             # 原始z坐标映射到y（坐标系转换）
+        "gripper": 0.0        # 夹爪状态 (0.0-1.0)
+    }
+    message_for_b = {
+        "type": "control",  # 标识为控制命令
+        "timestamp": 0.0,
+        "robot_info": robot_info
+    }
+    # 为本地LeRobot准备的消息（JSON格式，保持原有格式）
+    lerobot_position = [0.0, 0.0, 0.0]
+    lerobot_orientation = [0.0, 0.0, 0.0]
+    message_for_lerobot = {
+        "position": lerobot_position,
+        "orientation": lerobot_orientation,
+        "gripper": 0.0,
+        "t": 0.0
+    }
+    
+    # 绝对截止时间调度（单调时钟，不受系统时间调整影响，误差不累积）
+    interval_ns = int(publish_interval * 1e9)
+    deadline_ns = time.monotonic_ns()
+    
+    # 热路径使用的模块级函数/常量绑定为局部变量（LOAD_FAST代替全局字典+属性查找）
+    # 注意：gripper_value / yaw偏移等会被其他线程重新赋值，仍按全局变量读取（imu_last_update为原地写入的数组，可绑定）
+    _time = time.time
+    _sleep = time.sleep
+    _monotonic_ns = time.monotonic_ns
+    _read_snapshot = read_imu_euler_snapshot
+    _kernel = end_effector_kernel
+    _record_point = record_trajectory_point
+    _compute_outputs = compute_publish_outputs
+    _encode_lerobot = encode_lerobot_message
+    _gripper_lock = gripper_lock
+    _NOBLOCK = zmq.NOBLOCK
+    _Again = zmq.Again
+    _send_b = socket_to_b.send
+    _last_update = imu_last_update
     
     try:
         while True:
-            loop_start = time.time()
-            
             # === 步骤1: 检查三个IMU在线状态 ===
-            current_time = time.time()
-            imu1_online = (current_time - imu1_last_update) < 1.0 if imu1_last_update > 0 else False
-            imu2_online = (current_time - imu2_last_update) < 1.0 if imu2_last_update > 0 else False
-            imu3_online = (current_time - imu3_last_update) < 1.0 if imu3_last_update > 0 else False
+            # current_time 为墙上时间：消息时间戳和IMU更新时间（data_callback）均使用time.time()
+            current_time = _time()
+            # 一次向量比较得到三个IMU的在线掩码（从未更新的IMU时间戳为0，自然判为离线）
+            online_mask = (current_time - _last_update) < IMU_ONLINE_TIMEOUT
             
             # 如果启用了online_only模式，检查三个IMU是否都在线
-            if online_only and not (imu1_online and imu2_online and imu3_online):
+            if online_only and not online_mask.all():
+                imu1_online, imu2_online, imu3_online = online_mask.tolist()
                 skip_count += 1
                 if skip_count % 25 == 0:  # 每5秒打印一次状态
                     print(f"⚠️  等待IMU在线... IMU1: {'✓' if imu1_online else '✗'}, "
                           f"IMU2: {'✓' if imu2_online else '✗'}, "
                           f"IMU3: {'✓' if imu3_online else '✗'} (已跳过 {skip_count} 次)")
-                time.sleep(publish_interval)
+                _sleep(publish_interval)
+                deadline_ns = _monotonic_ns()  # 跳过期间重新对齐截止时间
                 continue
             
-            # === 步骤2: 读取最新IMU数据（带线程锁） ===
-            with imu_data_lock:
-                euler1 = imu1_euler.copy()
-                euler2 = imu2_euler.copy()
-                euler3 = imu3_euler.copy()
+            imu1_online, imu2_online, imu3_online = online_mask.tolist()
+            
+            # === 步骤2: 读取最新IMU数据（无锁快照，每行为 [roll, pitch, yaw]） ===
+            euler1, euler2, euler3 = _read_snapshot()
             
             # 计算机械臂末端位置
             try:
-                end_pos, link1_pos, link2_pos = calculate_end_effector_position(euler1, euler2)
+                kinematics_angles[0:3] = euler1
+                kinematics_angles[3:6] = euler2
+                _kernel(kinematics_angles, kinematics_out)
+                end_pos = kinematics_out[2]  # 视图，记录轨迹时写入环形缓冲区
             except Exception as e:
                 print(f"⚠️  运动学计算失败: {e}")
-                end_pos = [0.0, 0.0, 0.0]
-            
-            # 记录轨迹
-            trajectory_positions.append(end_pos.copy())
-            trajectory_timestamps.append(current_time)
+                end_pos = kinematics_out[2]
+                end_pos[:] = 0.0
             
-            # === 步骤3: 坐标映射和约束 ===
-            # 约束到原始范围
-            x_raw = np.clip(end_pos[0], X_RAW_MIN, X_RAW_MAX)
-            y_raw = np.clip(end_pos[1], Y_RAW_MIN, Y_RAW_MAX)
-            z_raw = np.clip(end_pos[2], Z_RAW_MIN, Z_RAW_MAX)
+            # 末端位置转为Python float（一次tolist，后续消息字段无需逐个float()）
+            end_x, end_y, end_z = end_pos.tolist()
             
-            # 保存原始位置数据（用于robot_info）
-            last_position_raw = [x_raw, y_raw, z_raw]
+            # 记录轨迹
+            _record_point(end_pos, current_time)
             
-            # 线性映射到目标范围
-            x_mapped = X_TARGET_MIN + (x_raw - X_RAW_MIN) / (X_RAW_MAX - X_RAW_MIN) * (X_TARGET_MAX - X_TARGET_MIN)
-            y_mapped = Y_TARGET_MIN + (y_raw - Y_RAW_MIN) / (Y_RAW_MAX - Y_RAW_MIN) * (Y_TARGET_MAX - Y_TARGET_MIN)
-            z_mapped = Z_TARGET_MIN + (z_raw - Z_RAW_MIN) / (Z_RAW_MAX - Z_RAW_MIN) * (Z_TARGET_MAX - Z_TARGET_MIN)
+            # === 步骤3: 坐标映射和约束（单次标量计算，见compute_publish_outputs） ===
+            # shoulder_pan使用raw数据，假设基座在原点(0, 0)，末端位置为(x_raw, y_raw)
+            (x_raw, y_raw, z_raw, x_mapped, y_mapped, z_mapped,
+             shoulder_pan, roll3_rad, pitch3_rad, yaw3_rad) = _compute_outputs(
+                end_x, end_y, end_z,
+                euler3[0], euler3[1], euler3[2])
             
-            # 计算shoulder_pan角度（使用raw数据，末端在xy平面投影相对于x轴的角度）
-            # 假设基座在原点(0, 0)，末端位置为(x_raw, y_raw)
-            shoulder_pan = np.arctan2(y_raw, x_raw)  # 弧度
-            shoulder_pan_deg = np.rad2deg(shoulder_pan)     # 度
+            shoulder_pan_deg = math.degrees(shoulder_pan)  # 度
             
             # 读取夹爪值（带线程锁）
-            with gripper_lock:
+            with _gripper_lock:
                 current_gripper = gripper_value
             
-            # === 步骤4: 构造发布消息 ===
-            # 为B端准备的消息（使用pickle序列化，匹配B_reverse_whole.py）
-            message_for_b = {
-                "type": "control",  # 标识为控制命令
-                "timestamp": current_time,
-                # "euler_angles": {
-                #     "roll": float(np.rad2deg(np.deg2rad(euler3["roll"]))),   # 机械爪姿态（度）
-                #     "pitch": float(np.rad2deg(np.deg2rad(euler3["pitch"]))),
-                #     "yaw": float(np.rad2deg(np.deg2rad(euler3["yaw"])))
-                # },
-                # "position": [
-                #     float(x_mapped),  # x (米)
-                #     float(y_mapped),  # y (米)
-                #     float(z_mapped)   # z (米)
-                # ],
-                # "orientation": [
-                #     float(np.deg2rad(euler3["roll"])),   # Roll（弧度）
-                #     float(np.deg2rad(euler3["pitch"])),  # Pitch（弧度）
-                #     float(np.deg2rad(euler3["yaw"]))     # Yaw（弧度）
-                # ],
-                "robot_info": {
-                    "shoulder_pan": float(shoulder_pan),  # 肩部转角（弧度，从raw数据计算）
-                    "wrist_roll": float(np.deg2rad(euler3["roll"])),  # 手腕roll（弧度）
-                    "pitch": float(np.deg2rad(euler3["pitch"])),     # pitch（弧度）
-                    "x": float(end_pos[0]),    # 原始x坐标（米）
-                    "y": float(end_pos[2]),     # 原始z坐标映射到y（坐标系转换）
-                    "gripper": float(current_gripper)  # 夹爪状态 (0.0-1.0)
-                }
-
-            }
+            # === 步骤4: 填充发布消息（原地更新循环外预建的字典/列表） ===
+            # 所有字段已是Python float（tolist/快照/标量计算结果），两条消息共享同一批对象
+            message_for_b["timestamp"] = current_time
+            robot_info["shoulder_pan"] = shoulder_pan
+            robot_info["wrist_roll"] = roll3_rad
+            robot_info["pitch"] = pitch3_rad
+            robot_info["x"] = end_x
+            robot_info["y"] = end_z
+            robot_info["gripper"] = current_gripper
             
-            # 为本地LeRobot准备的消息（JSON格式，保持原有格式）
-            message_for_lerobot = {
-                "position": [
-                    float(x_mapped),
-                    float(y_mapped),
-                    float(z_mapped)
-                ],
-                "orientation": [
-                    float(np.deg2rad(euler3["roll"])),
-                    float(np.deg2rad(euler3["pitch"])),
-                    float(np.deg2rad(euler3["yaw"]))
-                ],
-                "gripper": float(current_gripper),
-                "t": current_time
-            }
+            lerobot_position[0] = x_mapped
+            lerobot_position[1] = y_mapped
+            lerobot_position[2] = z_mapped
+            lerobot_orientation[0] = roll3_rad
+            lerobot_orientation[1] = pitch3_rad
+            lerobot_orientation[2] = yaw3_rad
+            message_for_lerobot["gripper"] = current_gripper
+            message_for_lerobot["t"] = current_time
             
             # === 步骤5: 发送消息到B端和LeRobot（不同格式） ===
+            # 两次send均为NOBLOCK：只把消息放入ZMQ队列，实际TCP写入由libzmq的I/O线程完成，
+            # 与本线程的定时等待天然重叠（无需改为asyncio事件循环）
             try:
-                # 发送到B端（使用pickle序列化，阻塞模式，匹配A_real_video.py）
-                socket_to_b.send(pickle.dumps(message_for_b, protocol=pickle.HIGHEST_PROTOCOL))
+                # 发送到B端（使用pickle序列化，非阻塞：B端跟不上时丢弃本条）
+                b_buffer.seek(0)
+                b_buffer.truncate()
+                b_pickler.clear_memo()
+                b_pickler.dump(message_for_b)
+                try:
+                    _send_b(b_buffer.getvalue(), _NOBLOCK)
+                except _Again:
+                    dropped_count += 1
                 
-                # 发送到本地LeRobot（仅在启用时，使用JSON字符串）
+                # 发送到本地LeRobot（仅在启用时，JSON bytes，接收端格式不变；非阻塞，LeRobot未启动时不拖慢循环）
                 if socket_to_lerobot is not None:
-                    socket_to_lerobot.send_string(json.dumps(message_for_lerobot))
+                    try:
+                        socket_to_lerobot.send(_encode_lerobot(message_for_lerobot), _NOBLOCK)
+                    except _Again:
+                        lerobot_dropped_count += 1
                 
                 publish_count += 1
             except Exception as e:
                 print(f"❌ ZeroMQ发送失败: {e}")
 
-            # === 步骤6: 定期打印统计信息（每0.3秒） ===
-            if current_time - last_stat_time >= 0.3:
+            # === 步骤6: 定期打印统计信息（终端每0.3秒整屏刷新；重定向时每5秒一行） ===
+            if current_time - last_stat_time >= stats_interval:
                 actual_rate = publish_count / (current_time - last_stat_time) if publish_count > 0 else 0.0
                 
-                # 清屏效果（可选）
-                print("\033[H\033[J", end="")  # ANSI转义码清屏
-                
-                # === IMU原始数据显示（借鉴dual_imu_euler.py格式） ===
-                print("┌" + "─"*68 + "┐")
-                print(f"│ IMU 1 (杆1) - 地址: 0x{IMU1_ADDR:02X} ({IMU1_ADDR})".ljust(69) + "│")
-                status1_text = "✅ 在线" if imu1_online else "⚠️  离线"
-                print(f"│ 状态: {status1_text}  │  长度: {L1*1000:.0f} mm  │  归零模式: {YAW_NORMALIZATION_MODE}".ljust(85) + "│")
-                yaw1_offset_str = f"(偏移:{imu1_yaw_offset:.2f}°)" if imu1_yaw_offset is not None else "(未归零)"
-                print(f"│ Roll  = {euler1['roll']:8.2f}°  │  Pitch = {euler1['pitch']:8.2f}°  │  Yaw = {euler1['yaw']:8.2f}° {yaw1_offset_str}".ljust(97) + "│")
-                print("├" + "─"*68 + "┤")
+                if not IS_TTY:
+                    # 非终端：单行状态，无转义码
+                    sys.stdout.write(
+                        f"t={current_time:.1f} rate={actual_rate:.1f}Hz pub={publish_count} "
+                        f"drop={dropped_count} imu={int(imu1_online)}{int(imu2_online)}{int(imu3_online)} "
+                        f"pos=[{x_mapped:.3f},{y_mapped:.3f},{z_mapped:.3f}] gripper={current_gripper:.2f}\n")
+                    sys.stdout.flush()
+                else:
+                    # 整屏内容先拼接，最后一次性写出（清屏 + 全部行只需一次write）
+                    stats_lines = []
                 
-                print(f"│ IMU 2 (杆2) - 地址: 0x{IMU2_ADDR:02X} ({IMU2_ADDR})".ljust(69) + "│")
-                status2_text = "✅ 在线" if imu2_online else "⚠️  离线"
-                print(f"│ 状态: {status2_text}  │  长度: {L2*1000:.0f} mm".ljust(69) + "│")
-                yaw2_offset_str = f"(偏移:{imu2_yaw_offset:.2f}°)" if imu2_yaw_offset is not None else "(未归零)"
-                print(f"│ Roll  = {euler2['roll']:8.2f}°  │  Pitch = {euler2['pitch']:8.2f}°  │  Yaw = {euler2['yaw']:8.2f}° {yaw2_offset_str}".ljust(97) + "│")
-                print("├" + "─"*68 + "┤")
+                    # === IMU原始数据显示（借鉴dual_imu_euler.py格式） ===
+                    # 静态行直接复用；动态行用box_line按终端显示宽度补齐
+                    stats_lines.append(STATS_BOX_TOP)
+                    for imu_index, (euler, online, yaw_offset) in enumerate((
+                            (euler1, imu1_online, imu1_yaw_offset),
+                            (euler2, imu2_online, imu2_yaw_offset),
+                            (euler3, imu3_online, imu3_yaw_offset))):
+                        if imu_index > 0:
+                            stats_lines.append(STATS_BOX_SEPARATOR)
+                        stats_lines.append(STATS_IMU_HEADERS[imu_index])
+                        stats_lines.append(STATS_IMU_STATUS[imu_index][online])
+                        yaw_offset_str = f"(偏移:{yaw_offset:.2f}°)" if yaw_offset is not None else "(未归零)"
+                        stats_lines.append(box_line(
+                            f"Roll  = {euler[0]:8.2f}°  │  Pitch = {euler[1]:8.2f}°  │  Yaw = {euler[2]:8.2f}° {yaw_offset_str}"))
+                    stats_lines.append(STATS_BOX_BOTTOM)
                 
-                print(f"│ IMU 3 (机械爪) - 地址: 0x{IMU3_ADDR:02X} ({IMU3_ADDR})".ljust(69) + "│")
-                status3_text = "✅ 在线" if imu3_online else "⚠️  离线"
-                print(f"│ 状态: {status3_text}".ljust(69) + "│")
-                yaw3_offset_str = f"(偏移:{imu3_yaw_offset:.2f}°)" if imu3_yaw_offset is not None else "(未归零)"
-                print(f"│ Roll  = {euler3['roll']:8.2f}°  │  Pitch = {euler3['pitch']:8.2f}°  │  Yaw = {euler3['yaw']:8.2f}° {yaw3_offset_str}".ljust(97) + "│")
-                print("└" + "─"*68 + "┘")
+                    # === 末端位置和ZeroMQ发布信息 ===
+                    stats_lines.append("\n" + STATS_BOX_TOP)
+                    stats_lines.append(STATS_PUBLISH_TITLE)
+                    stats_lines.append(STATS_BOX_SEPARATOR)
+                    stats_lines.append(box_line(f"原始位置: [{end_x:7.3f}, {end_y:7.3f}, {end_z:7.3f}] m"))
+                    stats_lines.append(box_line(f"映射位置: [{x_mapped:7.3f}, {y_mapped:7.3f}, {z_mapped:7.3f}] m"))
+                    stats_lines.append(box_line(f"Shoulder Pan: {shoulder_pan_deg:7.2f}° ({shoulder_pan:7.4f} rad)"))
                 
-                # === 末端位置和ZeroMQ发布信息 ===
-                print("\n┌" + "─"*68 + "┐")
-                print(f"│ 机械臂末端位置 & ZeroMQ发布状态".ljust(69) + "│")
-                print("├" + "─"*68 + "┤")
-                print(f"│ 原始位置: [{end_pos[0]:7.3f}, {end_pos[1]:7.3f}, {end_pos[2]:7.3f}] m".ljust(69) + "│")
-                print(f"│ 映射位置: [{x_mapped:7.3f}, {y_mapped:7.3f}, {z_mapped:7.3f}] m".ljust(69) + "│")
-                print(f"│ Shoulder Pan: {shoulder_pan_deg:7.2f}° ({shoulder_pan:7.4f} rad)".ljust(69) + "│")
+                    # 发送的orientation值（弧度，复用步骤3的转换结果）
+                    stats_lines.append(box_line(f"发送姿态: Roll={roll3_rad:7.4f} rad, Pitch={pitch3_rad:7.4f} rad, Yaw={yaw3_rad:7.4f} rad"))
                 
-                # 计算发送的orientation值（弧度）
-                sent_roll = float(np.deg2rad(euler3["roll"]))
-                sent_pitch = float(np.deg2rad(euler3["pitch"]))
-                sent_yaw = float(np.deg2rad(euler3["yaw"]))
-                print(f"│ 发送姿态: Roll={sent_roll:7.4f} rad, Pitch={sent_pitch:7.4f} rad, Yaw={sent_yaw:7.4f} rad".ljust(84) + "│")
+                    # 显示夹爪状态
+                    gripper_percent = current_gripper * 100
+                    gripper_bar = "█" * int(current_gripper * 20) + "░" * (20 - int(current_gripper * 20))
+                    stats_lines.append(box_line(f"夹爪开合: [{gripper_bar}] {gripper_percent:5.1f}% ({current_gripper:.2f})"))
                 
-                # 显示夹爪状态
-                gripper_percent = current_gripper * 100
-                gripper_bar = "█" * int(current_gripper * 20) + "░" * (20 - int(current_gripper * 20))
-                print(f"│ 夹爪开合: [{gripper_bar}] {gripper_percent:5.1f}% ({current_gripper:.2f})".ljust(85) + "│")
+                    stats_lines.append(box_line(f"发布频率: {actual_rate:.1f} Hz  │  消息数: {publish_count}  │  B端丢弃: {dropped_count}"))
+                    if socket_to_lerobot is not None:
+                        stats_lines.append(box_line(f"LeRobot丢弃: {lerobot_dropped_count}"))
                 
-                print(f"│ 发布频率: {actual_rate:.1f} Hz  │  消息数: {publish_count}".ljust(69) + "│")
+                    # 显示视频接收状态（如果启用）
+                    if video_thread_running:
+                        latency_str = f"{video_last_latency:.1f}ms" if video_last_latency > 0 else "N/A"
+                        stats_lines.append(box_line(f"📹 视频接收: 帧数={video_frame_count}, 延迟={latency_str}"))
                 
-                # 显示视频接收状态（如果启用）
-                if video_thread_running:
-                    latency_str = f"{video_last_latency:.1f}ms" if video_last_latency > 0 else "N/A"
-                    print(f"│ 📹 视频接收: 帧数={video_frame_count}, 延迟={latency_str}".ljust(69) + "│")
+                    stats_lines.append(STATS_BOX_BOTTOM + "\n")
                 
-                print("└" + "─"*68 + "┘\n")
+                    # ANSI转义码清屏 + 整屏内容，一次写出
+                    sys.stdout.write("\033[H\033[J" + "\n".join(stats_lines) + "\n")
+                    sys.stdout.flush()
                 
                 publish_count = 0
                 last_stat_time = current_time
             
-            # === 步骤7: 精确定时控制 ===
-            elapsed = time.time() - loop_start
-            to_sleep = max(0.0, publish_interval - elapsed)
-            time.sleep(to_sleep)
+            # === 步骤7: 精确定时控制（下一个绝对截止时间） ===
+            deadline_ns += interval_ns
+            now_ns = _monotonic_ns()
+            if now_ns < deadline_ns:
+                _sleep((deadline_ns - now_ns) / 1e9)
+            else:
+                # 已落后于计划，从当前时刻重新对齐，避免连续补发
+                deadline_ns = now_ns
             
     except KeyboardInterrupt:
         print(f"\n📊 发布器已停止 | 总发布: {publish_count} 条消息")
@@ -1454,7 +1880,7 @@ def plot_trajectory(use_agg_backend=False):
     Args:
         use_agg_backend: 是否使用Agg后端（非GUI，避免Qt冲突）
     """
-    if len(trajectory_positions) == 0:
+    if trajectory_count == 0:
         print("没有记录到轨迹数据")
         return
     
@@ -1483,8 +1909,7 @@ def plot_trajectory(use_agg_backend=False):
     
     try:
         # 转换为numpy数组便于处理
-        trajectory_array = np.array(list(trajectory_positions))
-        timestamps_array = np.array(list(trajectory_timestamps))
+        trajectory_array, timestamps_array = get_trajectory_arrays()
         
         # 创建3D图形（2x3布局，与dual_imu_euler.py一致）
         fig = plt.figure(figsize=(18, 10))
@@ -1562,18 +1987,16 @@ def plot_trajectory(use_agg_backend=False):
         
         # === 统计信息（借鉴dual_imu_euler.py） ===
         print(f"\n轨迹统计:")
-        print(f"  总点数: {len(trajectory_positions)}")
+        print(f"  总点数: {len(trajectory_array)}")
         
         if len(timestamps_array) > 1:
             duration = timestamps_array[-1] - timestamps_array[0]
             print(f"  持续时间: {duration:.2f} 秒")
             if duration > 0:
-                print(f"  采样频率: {len(trajectory_positions) / duration:.1f} Hz")
+                print(f"  采样频率: {len(trajectory_array) / duration:.1f} Hz")
         
         # 计算轨迹总长度
-        total_distance = 0
-        for i in range(1, len(trajectory_array)):
-            total_distance += np.linalg.norm(trajectory_array[i] - trajectory_array[i-1])
+        total_distance = float(np.linalg.norm(np.diff(trajectory_array, axis=0), axis=1).sum())
         print(f"  轨迹总长度: {total_distance:.4f} m ({total_distance*1000:.1f} mm)")
         
         # 位置范围
@@ -1714,6 +2137,9 @@ MuJoCo接收端（lerobot_zeroMQ_imu.py）：
     print(f"杆1长度: {L1*1000:.0f} mm")
     print(f"杆2长度: {L2*1000:.0f} mm")
     print(f"Yaw归零模式: {YAW_NORMALIZATION_MODE}")
+    print(f"Python线程模式: {'GIL' if GIL_ENABLED else '自由线程（无GIL）'}")
+    if not verify_euler_xyz_first_column():
+        print("⚠️  运动学闭式解与SciPy Rotation不一致，请检查欧拉角约定")
     print("─"*70)
     print(f"ZMQ发送到B端: tcp://{args.b_host}:{args.b_port} (PUSH模式)")
     if args.enable_lerobot:
@@ -1728,16 +2154,25 @@ MuJoCo接收端（lerobot_zeroMQ_imu.py）：
     print("="*70 + "\n")
     
     # 创建ZeroMQ上下文和socket（参考A_real_video.py双PUSH架构）
-    zmq_context = zmq.Context()
+    # 与各接收线程共用进程级上下文（一个libzmq I/O线程）
+    zmq_context = zmq.Context.instance()
     
     # Socket 1: 发送传感器数据到B端（PUSH模式，匹配B的PULL）
     socket_to_b = zmq_context.socket(zmq.PUSH)
-    # 简单配置，不设置复杂参数（参考A_real_video.py的成功经验）
+    # 控制命令只关心最新值：限制发送队列，B端变慢/断开时丢弃旧命令而不是阻塞发布循环
+    socket_to_b.setsockopt(zmq.SNDHWM, 10)
+    socket_to_b.setsockopt(zmq.LINGER, 0)
+    socket_to_b.setsockopt(zmq.SNDBUF, 1 << 18)
+    socket_to_b.setsockopt(zmq.IMMEDIATE, 1)  # 连接未建立时不排队
     
     # Socket 2: 发送传感器数据到本地LeRobot（PUSH模式，可选）
     socket_to_lerobot = None
     if args.enable_lerobot:
         socket_to_lerobot = zmq_context.socket(zmq.PUSH)
+        # 与B端相同：只保留少量待发消息，退出时不等待未发送数据
+        socket_to_lerobot.setsockopt(zmq.SNDHWM, 10)
+        socket_to_lerobot.setsockopt(zmq.LINGER, 0)
+        socket_to_lerobot.setsockopt(zmq.IMMEDIATE, 1)
     
     # RS485设备对象
     rs485_device = None
@@ -1924,7 +2359,7 @@ MuJoCo接收端（lerobot_zeroMQ_imu.py）：
             socket_to_b.close()
             if socket_to_lerobot is not None:
                 socket_to_lerobot.close()
-            zmq_context.term()
+            # 共享上下文不在此term：其他daemon线程的socket可能仍在使用，随进程退出释放
             print("✓ ZeroMQ连接已关闭")
         except KeyboardInterrupt:
             print("⚠️  ZeroMQ清理被中断，强制关闭")
@@ -1956,7 +2391,7 @@ MuJoCo接收端（lerobot_zeroMQ_imu.py）：
         # 绘制轨迹（添加异常保护，确保即使用户按Ctrl+C也能执行）
         if not args.disable_trajectory_plot:
             try:
-                if len(trajectory_positions) > 0:
+                if trajectory_count > 0:
                     print("\n正在生成轨迹图...")
                     # 使用Agg后端避免Qt冲突（在lerobot环境中opencv-python和PyQt5冲突）
                     plot_trajectory(use_agg_backend=True)
@@ -6,8 +6,34 @@
 import sys
 import os
 
+PROJECT_DIR = '/home/bubble/桌面/WIT_RS485'
+VIEWER_DIR = os.path.join(PROJECT_DIR, 'pyqt5_viewer')
+# VERIFY_FULL=1 时实例化widget做完整检查（会加载Qt插件，较慢）；默认只做类属性检查
+VERIFY_FULL = os.environ.get('VERIFY_FULL') == '1'
+
+# 主程序模块的全局名称集合（首次导入时收集一次，各测试共用）
+_main_prog_names = None
+# QApplication实例（仅VERIFY_FULL时创建）
+_qt_app = None
+
+
+def add_sys_path(path):
+    """添加搜索路径（已存在时不重复添加）"""
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def get_main_prog_names():
+    """导入主程序模块并返回其全局名称集合（只反射一次）"""
+    global _main_prog_names
+    if _main_prog_names is None:
+        import triple_imu_rs485_publisher_dual_cam_UI_voice as main_prog
+        _main_prog_names = set(vars(main_prog))
+    return _main_prog_names
+
+
 # 添加项目路径
-sys.path.insert(0, '/home/bubble/桌面/WIT_RS485')
+add_sys_path(PROJECT_DIR)
 
 def test_imports():
     """测试导入"""
@@ -17,11 +43,11 @@ def test_imports():
     
     try:
         # 测试主程序导入
-        import triple_imu_rs485_publisher_dual_cam_UI_voice as main_prog
+        get_main_prog_names()
         print("✓ 主程序模块导入成功")
         
         # 测试UI导入
-        sys.path.insert(0, '/home/bubble/桌面/WIT_RS485/pyqt5_viewer')
+        add_sys_path(VIEWER_DIR)
         from widgets.gripper_control import GripperControlWidget
         from widgets.audio_waveform import AudioWaveformWidget
         print("✓ 夹爪控制widget导入成功")
@@ -40,21 +66,21 @@ def test_functions():
     print("="*60)
     
     try:
-        import triple_imu_rs485_publisher_dual_cam_UI_voice as main_prog
+        names = get_main_prog_names()
         
         # 检查关键函数
-        assert hasattr(main_prog, 'debug_publisher_thread'), "缺少 debug_publisher_thread"
-        assert hasattr(main_prog, 'ui_command_receiver_thread'), "缺少 ui_command_receiver_thread"
-        assert hasattr(main_prog, 'audio_player_thread'), "缺少 audio_player_thread"
+        assert 'debug_publisher_thread' in names, "缺少 debug_publisher_thread"
+        assert 'ui_command_receiver_thread' in names, "缺少 ui_command_receiver_thread"
+        assert 'audio_player_thread' in names, "缺少 audio_player_thread"
         
         print("✓ debug_publisher_thread 存在")
         print("✓ ui_command_receiver_thread 存在")
         print("✓ audio_player_thread 存在")
         
         # 检查全局变量
-        assert hasattr(main_prog, 'latest_audio_waveform'), "缺少 latest_audio_waveform"
-        assert hasattr(main_prog, 'latest_audio_rms'), "缺少 latest_audio_rms"
-        assert hasattr(main_prog, 'audio_data_lock'), "缺少 audio_data_lock"
+        assert 'latest_audio_waveform' in names, "缺少 latest_audio_waveform"
+        assert 'latest_audio_rms' in names, "缺少 latest_audio_rms"
+        assert 'audio_data_lock' in names, "缺少 audio_data_lock"
         
         print("✓ 音频可视化全局变量存在")
         
@@ -74,10 +100,11 @@ def test_constants():
     
     try:
         import triple_imu_rs485_publisher_dual_cam_UI_voice as main_prog
+        names = get_main_prog_names()
         
         # 检查端口常量
-        assert hasattr(main_prog, 'DEFAULT_DEBUG_PORT'), "缺少 DEFAULT_DEBUG_PORT"
-        assert hasattr(main_prog, 'DEFAULT_UI_COMMAND_PORT'), "缺少 DEFAULT_UI_COMMAND_PORT"
+        assert 'DEFAULT_DEBUG_PORT' in names, "缺少 DEFAULT_DEBUG_PORT"
+        assert 'DEFAULT_UI_COMMAND_PORT' in names, "缺少 DEFAULT_UI_COMMAND_PORT"
         
         print(f"✓ DEFAULT_DEBUG_PORT = {main_prog.DEFAULT_DEBUG_PORT}")
         print(f"✓ DEFAULT_UI_COMMAND_PORT = {main_prog.DEFAULT_UI_COMMAND_PORT}")
@@ -89,45 +116,46 @@ def test_constants():
 
 
 def test_widget_signals():
-    """测试widget信号"""
+    """测试widget信号（默认只检查类属性，不实例化widget；VERIFY_FULL=1时额外创建实例）"""
+    global _qt_app
+    
     print("\n" + "="*60)
     print("4. 测试Widget信号...")
     print("="*60)
     
     try:
-        # 需要QApplication才能创建widget
         try:
-            from PyQt5.QtWidgets import QApplication
-            app = QApplication.instance()
-            if app is None:
-                app = QApplication(sys.argv)
+            import PyQt5  # noqa: F401
         except ImportError:
             print("⚠️  PyQt5未安装，跳过widget测试")
             return True
         
-        sys.path.insert(0, '/home/bubble/桌面/WIT_RS485/pyqt5_viewer')
+        add_sys_path(VIEWER_DIR)
         from widgets.gripper_control import GripperControlWidget
         from widgets.audio_waveform import AudioWaveformWidget
         
-        # 创建widget
-        gripper_widget = GripperControlWidget()
-        audio_widget = AudioWaveformWidget()
-        
-        print("✓ GripperControlWidget 创建成功")
-        print("✓ AudioWaveformWidget 创建成功")
-        
-        # 检查信号
-        assert hasattr(gripper_widget, 'gripper_command'), "缺少 gripper_command 信号"
-        assert hasattr(gripper_widget, 'gripper_value_changed'), "缺少 gripper_value_changed 信号"
+        # 检查信号（pyqtSignal是类属性，无需创建widget、无需加载Qt平台插件）
+        assert hasattr(GripperControlWidget, 'gripper_command'), "缺少 gripper_command 信号"
+        assert hasattr(GripperControlWidget, 'gripper_value_changed'), "缺少 gripper_value_changed 信号"
         
         print("✓ 夹爪控制信号存在")
         
         # 测试方法
-        assert hasattr(gripper_widget, 'update_from_robot'), "缺少 update_from_robot 方法"
-        assert hasattr(audio_widget, 'update_audio_data'), "缺少 update_audio_data 方法"
+        assert hasattr(GripperControlWidget, 'update_from_robot'), "缺少 update_from_robot 方法"
+        assert hasattr(AudioWaveformWidget, 'update_audio_data'), "缺少 update_audio_data 方法"
         
         print("✓ 更新方法存在")
         
+        # 完整检查：实际创建widget（需要QApplication及显示环境）
+        if VERIFY_FULL:
+            from PyQt5.QtWidgets import QApplication
+            if _qt_app is None:
+                _qt_app = QApplication.instance() or QApplication(sys.argv)
+            GripperControlWidget()
+            AudioWaveformWidget()
+            print("✓ GripperControlWidget 创建成功")
+            print("✓ AudioWaveformWidget 创建成功")
+        
         return True
     except Exception as e:
         print(f"❌ Widget检查失败: {e}")
@@ -142,7 +170,7 @@ def test_file_structure():
     print("5. 测试文件结构...")
     print("="*60)
     
-    base_dir = '/home/bubble/桌面/WIT_RS485'
+    base_dir = PROJECT_DIR
     
     files_to_check = [
         'triple_imu_rs485_publisher_dual_cam_UI_voice.py',
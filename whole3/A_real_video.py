@@ -1,12 +1,32 @@
 # A_real_video.py - 真实视频显示客户端
+import os
 import time
 import threading
-from datetime import datetime
+import queue
 from zmq_base import TorchSerializer
 import zmq
 import cv2
 import numpy as np
 import pickle
+import struct
+
+# 可选：libjpeg-turbo（SIMD加速的JPEG解码，直接输出BGR），未安装时回退到cv2.imdecode
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _tj = TurboJPEG()
+    TURBOJPEG_AVAILABLE = True
+except (ImportError, OSError, RuntimeError):
+    _tj = None
+    TURBOJPEG_AVAILABLE = False
+
+# 可选：nvJPEG（pynvjpeg，GPU解码，仅有CUDA的机器可用）；不可用时使用上面的CPU路径
+try:
+    from nvjpeg import NvJpeg
+    _nj = NvJpeg()
+    NVJPEG_AVAILABLE = True
+except Exception:  # 未安装、无CUDA设备或驱动不可用
+    _nj = None
+    NVJPEG_AVAILABLE = False
 
 # --- 配置 ---
 # ⚠️ 重要：使用 SSH 隧道连接跳板机 Docker 容器
@@ -18,203 +38,418 @@ SERVER_B_PORT_VIDEO = 5557    # 接收视频流
 
 # 控制命令配置
 COMMAND_RATE_HZ = 50  # 控制命令发送频率
+# 模拟欧拉角每步增量（度）：roll/pitch/yaw 分别 +0.1/+0.2/+0.15，7200步后三者同时回到起点
+COMMAND_ANGLE_STEPS = (0.1, 0.2, 0.15)
+COMMAND_CYCLE_LENGTH = 7200
 ENABLE_VIDEO_DISPLAY = True  # 是否显示视频窗口
+LATENCY_WINDOW = 100  # 延迟统计窗口（最近N帧）
+# B转发的视频帧头：时间戳(float64) + JPEG长度(uint32)，小端，共12字节；消息为 [帧头, JPEG]
+VIDEO_FRAME_HEADER = struct.Struct("<dI")
+# pickle中float以BINFLOAT操作码'G' + 8字节大端double存储，命令模板按此就地改写
+PICKLE_BINFLOAT = struct.Struct(">d")
+VIDEO_QUEUE_SIZE = 2  # 接收→解码 队列长度（满时丢弃最旧的，只处理最新帧）
+
+# CPU绑定与实时调度（仅Linux生效；核心编号超出本机CPU数量时自动跳过，设为None禁用）
+MAIN_THREAD_CPU = 1         # 主线程（50Hz命令发送 + 显示）
+VIDEO_RECV_THREAD_CPU = 2   # 视频接收线程
+DECODE_THREAD_CPU = 3       # 视频解码线程（与接收线程分开，互不抢占）
+VIDEO_RECV_FIFO_PRIORITY = 10  # 视频接收线程SCHED_FIFO优先级（需要CAP_SYS_NICE/root，无权限时忽略；None禁用）
+USE_NVJPEG = True  # 有CUDA且安装了pynvjpeg时用GPU解码（高分辨率时收益明显；小分辨率下可关闭）
 # ------------
 
-def thread_send_commands():
+# 流水线：接收线程 → 队列 → 解码线程 → 最新帧槽位 → 主线程显示
+# （cv2.imshow/waitKey 必须在主线程调用，macOS上尤其如此）
+latest_frame = None  # 最新一帧已叠加信息的BGR图像
+latest_frame_id = 0  # 每发布一帧加1，主线程据此判断是否有新帧
+frame_lock = threading.Lock()
+stop_event = threading.Event()
+
+
+def decode_jpeg(encoded_data):
+    """解码JPEG为BGR图像，优先级 nvJPEG(GPU) > TurboJPEG > cv2.imdecode；失败时返回None"""
+    if USE_NVJPEG and NVJPEG_AVAILABLE:
+        try:
+            # 结果拷回主机内存供cv2.imshow显示（pynvjpeg只接受bytes）
+            return _nj.decode(bytes(encoded_data))
+        except Exception:
+            pass  # GPU解码失败时回退到CPU路径
+    if TURBOJPEG_AVAILABLE:
+        try:
+            return _tj.decode(encoded_data, pixel_format=TJPF_BGR)
+        except (OSError, ValueError):
+            return None
+    return cv2.imdecode(np.frombuffer(encoded_data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def render_overlay(lines, height: int, width: int):
+    """
+    将若干行文字渲染到黑底小图，返回 (图像, 掩码)，之后每帧只需按掩码拷贝，不再逐帧光栅化文字
+    lines: [(文字, (x, y), 字号, 颜色, 线宽), ...]，坐标相对小图左上角
+    """
+    sprite = np.zeros((height, width, 3), np.uint8)
+    for text, org, scale, color, thickness in lines:
+        cv2.putText(sprite, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness)
+    return sprite, sprite.any(axis=2)
+
+
+def blit_overlay(frame, overlay, x: int, y: int):
+    """将 render_overlay 的结果按掩码贴到frame的(x, y)处，超出画面的部分裁掉"""
+    sprite, mask = overlay
+    x0, y0 = max(x, 0), max(y, 0)
+    x1 = min(x + sprite.shape[1], frame.shape[1])
+    y1 = min(y + sprite.shape[0], frame.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
+    sx, sy = x0 - x, y0 - y
+    region = (slice(sy, sy + y1 - y0), slice(sx, sx + x1 - x0))
+    np.copyto(frame[y0:y1, x0:x1], sprite[region], where=mask[region][:, :, None])
+
+
+def pin_current_thread(cpu, label, fifo_priority=None):
     """
-    线程1：持续发送控制命令（欧拉角等）到 B
+    将当前线程绑定到指定CPU（Linux下os.sched_setaffinity(0)只作用于调用线程），
+    可选设置SCHED_FIFO实时调度；不支持的平台、CPU不存在或权限不足时打印提示并继续
     """
-    context = zmq.Context()
-    socket = context.socket(zmq.PUSH)
-    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+    if cpu is None or not hasattr(os, "sched_setaffinity"):
+        return
+    if cpu >= (os.cpu_count() or 1):
+        print(f"[{label}] CPU {cpu} 不存在，跳过CPU绑定")
+        return
+    try:
+        os.sched_setaffinity(0, {cpu})
+        print(f"[{label}] 已绑定到 CPU {cpu}")
+    except OSError as e:
+        print(f"[{label}] CPU绑定失败: {e}")
+    if fifo_priority is not None and hasattr(os, "sched_setscheduler"):
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(fifo_priority))
+            print(f"[{label}] 已启用 SCHED_FIFO 实时调度（优先级 {fifo_priority}）")
+        except OSError:
+            print(f"[{label}] 无权限设置实时调度（需要root），保持默认")
+
+
+def build_angle_table():
+    """
+    预计算一个完整周期的模拟欧拉角 [(roll, pitch, yaw), ...]（保留2位小数，Python float），
+    发送循环中按环形索引取值，不再逐次做浮点累加/取模/round
+    """
+    steps = np.arange(1, COMMAND_CYCLE_LENGTH + 1)[:, None] * np.array(COMMAND_ANGLE_STEPS)
+    return [tuple(row) for row in np.round(steps % 360, 2).tolist()]
+
+
+class CommandSender:
+    """
+    控制命令发送器（欧拉角等）：由主线程按绝对截止时间调用 poll()，
+    不再单独占用一个线程（省去与显示循环之间的GIL切换）
+    """
+    
+    def __init__(self):
+        context = zmq.Context.instance()  # 进程内共享一个上下文（一个libzmq I/O线程）
+        self.socket = context.socket(zmq.PUSH)
+        self.socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+        print(f"[命令] 连接到 B 的命令端口: {SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+        
+        # 模拟欧拉角控制命令：预计算的角度环
+        self.angle_table = build_angle_table()
+        self.angle_index = 0
+        self.sent_count = 0
+        self.log_every = COMMAND_RATE_HZ  # 约每秒打印一次
+        self.buffer, self.offsets = self.build_command_template()
+        
+        # 绝对截止时间调度：按固定周期发送，循环内耗时不累加到周期上
+        self.period = 1.0 / COMMAND_RATE_HZ
+        self.next_deadline = time.monotonic()
+    
+    @staticmethod
+    def build_command_template():
+        """
+        启动时pickle一次命令字典（各变化字段先填入互不相同的哨兵值），定位各哨兵double在字节中的偏移；
+        之后每条命令只需把新值按 PICKLE_BINFLOAT 写到这些偏移处，线上格式仍是普通pickle（B/C无需改动）
+        返回 (bytearray模板, [timestamp, roll, pitch, yaw 的偏移])
+        """
+        sentinels = (-1.5e300, -2.5e300, -3.5e300, -4.5e300)  # timestamp, roll, pitch, yaw
+        command = {
+            "type": "control",
+            "timestamp": sentinels[0],
+            "euler_angles": {"roll": sentinels[1], "pitch": sentinels[2], "yaw": sentinels[3]},
+            "throttle": 0.5
+        }
+        buffer = bytearray(pickle.dumps(command, protocol=pickle.HIGHEST_PROTOCOL))
+        offsets = []
+        for value in sentinels:
+            marker = b"G" + PICKLE_BINFLOAT.pack(value)
+            if buffer.count(marker) != 1:
+                raise RuntimeError("命令模板中未找到唯一的float字段")
+            offsets.append(buffer.index(marker) + 1)
+        return buffer, offsets
     
-    print(f"[线程1-命令] 连接到 B 的命令端口: {SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+    def poll(self) -> float:
+        """到达截止时间则发送一条命令；返回距下一次发送的秒数（供调用方决定等待多久）"""
+        now = time.monotonic()
+        if now >= self.next_deadline:
+            self.send_next()
+            self.next_deadline += self.period
+            if self.next_deadline <= now:
+                # 落后时从当前时刻重新对齐
+                self.next_deadline = now + self.period
+        return self.next_deadline - now
+    
+    def send_next(self):
+        # 生成控制命令（模拟欧拉角变化）
+        roll, pitch, yaw = self.angle_table[self.angle_index]
+        self.angle_index = (self.angle_index + 1) % COMMAND_CYCLE_LENGTH
+        
+        # 就地改写预先pickle好的模板（格式仍为 pickle，以匹配 B 端），不再逐条构建字典并pickle.dumps
+        buffer = self.buffer
+        for offset, value in zip(self.offsets, (time.time(), roll, pitch, yaw)):
+            PICKLE_BINFLOAT.pack_into(buffer, offset, value)
+        self.socket.send(buffer)  # 默认copy=True，发送时已拷贝，下一条可安全改写
+        
+        # 减少打印频率以避免刷屏（按发送计数，节奏固定）
+        self.sent_count += 1
+        if self.sent_count % self.log_every == 0:
+            print(f"[命令 A→B] 发送命令: 欧拉角({roll:.2f}, {pitch:.2f}, {yaw:.2f})")
+    
+    def close(self):
+        self.socket.close()  # 共享上下文不在此term
+
+
+def thread_receive_video(frame_queue: queue.Queue):
+    """
+    线程2：只负责接收来自 B 的视频消息，连同接收时间放入有界队列
+    队列满时丢弃最旧的一条（与CONFLATE一致，只保留最新帧），不等待解码/显示
+    """
+    pin_current_thread(VIDEO_RECV_THREAD_CPU, "线程2-视频", VIDEO_RECV_FIFO_PRIORITY)
+    context = zmq.Context.instance()  # 进程内共享一个上下文（一个libzmq I/O线程）
+    socket = context.socket(zmq.SUB)
+    socket.setsockopt(zmq.RCVHWM, 1)  # 接收缓冲区只保留1帧（多帧消息不能用CONFLATE，下面接收时丢弃积压的旧帧）
+    socket.setsockopt(zmq.RCVTIMEO, 500)  # 超时返回以检查退出标志
+    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_VIDEO}")
+    socket.setsockopt_string(zmq.SUBSCRIBE, "")  # 订阅所有消息
     
-    # 模拟欧拉角控制命令
-    roll, pitch, yaw = 0.0, 0.0, 0.0
+    print(f"[线程2-视频] 订阅 B 的视频流: {SERVER_B_HOST}:{SERVER_B_PORT_VIDEO}")
     
     try:
-        while True:
-            # 生成控制命令（模拟欧拉角变化）
-            roll = (roll + 0.1) % 360
-            pitch = (pitch + 0.2) % 360
-            yaw = (yaw + 0.15) % 360
-            
-            command = {
-                "type": "control",
-                "timestamp": datetime.now().isoformat(),
-                "euler_angles": {
-                    "roll": round(roll, 2),
-                    "pitch": round(pitch, 2),
-                    "yaw": round(yaw, 2)
-                },
-                "throttle": 0.5
-            }
+        while not stop_event.is_set():
+            try:
+                # copy=False：各帧以zmq.Frame交付，JPEG不拷贝成Python bytes，解码时直接读其缓冲区
+                video_parts = socket.recv_multipart(copy=False)
+            except zmq.Again:
+                continue
+            # 丢弃积压的旧帧，只保留最新一条完整消息
+            while socket.poll(0):
+                video_parts = socket.recv_multipart(copy=False)
+            item = (time.time(), video_parts)
             
-            # 发送命令 - 强制使用 pickle 以匹配 B 端
-            socket.send(pickle.dumps(command, protocol=pickle.HIGHEST_PROTOCOL))
-            
-            # 减少打印频率以避免刷屏
-            if int(roll * 10) % 10 == 0:  # 每度打印一次
-                print(f"[线程1 A→B] 发送命令: 欧拉角({command['euler_angles']['roll']:.2f}, "
-                      f"{command['euler_angles']['pitch']:.2f}, {command['euler_angles']['yaw']:.2f})")
-            
-            # 控制频率
-            time.sleep(1.0 / COMMAND_RATE_HZ)
+            try:
+                frame_queue.put_nowait(item)
+            except queue.Full:
+                # 只有本线程写入，取出一条后必有空位
+                try:
+                    frame_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                frame_queue.put_nowait(item)
             
     except KeyboardInterrupt:
         pass
     finally:
-        socket.close()
-        context.term()
+        socket.close()  # 共享上下文不在线程内term
 
 
-def thread_receive_video():
+def thread_decode_video(frame_queue: queue.Queue):
     """
-    线程2：持续接收来自 B 的视频流并显示
+    线程3：从队列取出视频消息，反序列化、解码（TurboJPEG/cv2解码时释放GIL）、叠加信息，
+    发布到最新帧槽位供主线程显示
     """
-    context = zmq.Context()
-    socket = context.socket(zmq.SUB)
-    socket.setsockopt(zmq.RCVHWM, 1)  # 接收缓冲区只保留1帧
-    socket.setsockopt(zmq.CONFLATE, 1)  # 只保留最新消息，丢弃旧帧
-    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_VIDEO}")
-    socket.setsockopt_string(zmq.SUBSCRIBE, "")  # 订阅所有消息
-    
-    print(f"[线程2-视频] 订阅 B 的视频流: {SERVER_B_HOST}:{SERVER_B_PORT_VIDEO}")
+    pin_current_thread(DECODE_THREAD_CPU, "线程3-解码")
+    global latest_frame, latest_frame_id
     
     frame_count = 0
     last_fps_time = time.time()
     fps_counter = 0
     current_fps = 0
     
-    # 延迟统计
-    latencies = []
+    # 延迟统计：最近 LATENCY_WINDOW 帧存入预分配的float32环形缓冲，逐帧只写一个元素；
+    # 平均/最小/最大/P99每秒随FPS一起用numpy向量化归约计算一次
+    latencies = np.zeros(LATENCY_WINDOW, np.float32)
+    latency_idx = 0
+    latency_filled = 0
+    last_latency = 0.0
+    avg_latency = 0.0
+    p99_latency = 0.0
     max_latency = 0
-    min_latency = float('inf')
+    min_latency = 0
     
-    # 创建窗口（如果启用显示）
-    if ENABLE_VIDEO_DISPLAY:
-        cv2.namedWindow('Remote Video Stream', cv2.WINDOW_NORMAL)
-        cv2.resizeWindow('Remote Video Stream', 800, 600)
+    # 叠加信息缓存：统计每秒才变化一次，只在刷新时重新渲染文字
+    overlay_stats = None     # 左下角：FPS / 帧数
+    overlay_latency = None   # 右上角：延迟
+    overlay_dirty = True
     
+    while not stop_event.is_set():
+        try:
+            recv_time, video_parts = frame_queue.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        
+        if len(video_parts) == 2 and len(video_parts[0]) == VIDEO_FRAME_HEADER.size:
+            # 两帧格式：[固定帧头, JPEG]，JPEG以memoryview零拷贝引用（持有底层zmq.Frame）
+            capture_time, _ = VIDEO_FRAME_HEADER.unpack(video_parts[0].buffer)
+            frame_dict = {'image': video_parts[1].buffer, 'encoding': 'jpeg', 'timestamp': capture_time}
+        else:
+            # 旧格式：单帧pickle字典
+            frame_dict = TorchSerializer.from_bytes(video_parts[0].bytes)
+        
+        # 计算端到端延迟
+        if 'timestamp' in frame_dict:
+            last_latency = (recv_time - frame_dict['timestamp']) * 1000  # 转换为毫秒
+            latencies[latency_idx] = last_latency
+            latency_idx = (latency_idx + 1) % LATENCY_WINDOW
+            latency_filled = min(LATENCY_WINDOW, latency_filled + 1)
+        
+        frame_count += 1
+        fps_counter += 1
+        
+        # 计算 FPS
+        current_time = time.time()
+        if current_time - last_fps_time >= 1.0:
+            current_fps = fps_counter
+            fps_counter = 0
+            last_fps_time = current_time
+            if latency_filled:
+                window = latencies[:latency_filled]
+                avg_latency = float(window.mean())
+                p99_latency = float(np.quantile(window, 0.99))
+                min_latency = float(window.min())
+                max_latency = float(window.max())
+            overlay_dirty = True
+        
+        # 解码视频帧
+        if 'image' in frame_dict and frame_dict.get('encoding') == 'jpeg':
+            # JPEG 压缩的图像
+            encoded_data = frame_dict['image']
+            if isinstance(encoded_data, (bytes, memoryview)):
+                frame = decode_jpeg(encoded_data)
+                
+                if frame is not None:
+                    # 重新渲染叠加信息（每秒一次）
+                    if overlay_dirty:
+                        overlay_stats = render_overlay([
+                            (f"FPS: {current_fps}", (10, 50), 0.6, (0, 255, 255), 2),
+                            (f"Frames: {frame_count}", (10, 20), 0.6, (0, 255, 255), 2),
+                        ], 60, 250)
+                        overlay_latency = render_overlay([
+                            (f"Latency: {last_latency:.1f}ms", (0, 25), 0.6, (0, 255, 0), 2),
+                            (f"Avg/P99: {avg_latency:.1f}/{p99_latency:.1f}ms", (0, 50), 0.5, (255, 255, 0), 1),
+                            (f"Min/Max: {min_latency:.0f}/{max_latency:.0f}ms", (0, 75), 0.5, (255, 255, 0), 1),
+                        ], 85, 250) if latency_filled else None
+                        overlay_dirty = False
+                    
+                    # 在图像上叠加信息：左下角FPS/帧数，右上角延迟
+                    blit_overlay(frame, overlay_stats, 0, frame.shape[0] - 70)
+                    if overlay_latency is not None:
+                        blit_overlay(frame, overlay_latency, frame.shape[1] - 250, 0)
+                    
+                    # 发布到最新帧槽位（主线程显示）
+                    with frame_lock:
+                        latest_frame = frame
+                        latest_frame_id += 1
+                    
+                    # 打印日志（降低频率）
+                    if frame_count % 30 == 0:
+                        print(f"[线程3 B→A] 收到视频帧 #{frame_count}, "
+                              f"大小: {len(encoded_data)/1024:.1f} KB, "
+                              f"分辨率: {frame_dict.get('resolution', 'N/A')}, "
+                              f"FPS: {current_fps}, "
+                              f"延迟: {last_latency:.1f}ms (平均: {avg_latency:.1f}ms, P99: {p99_latency:.1f}ms)")
+                else:
+                    print(f"[线程3-解码] ⚠️ 解码帧 #{frame_count} 失败")
+        else:
+            # 纯数据（测试模式）
+            if frame_count % 30 == 0:
+                print(f"[线程3 B→A] 收到数据帧 #{frame_count}, "
+                      f"大小: {sum(len(part) for part in video_parts)} bytes, "
+                      f"分辨率: {frame_dict.get('resolution', 'N/A')}")
+
+
+def display_loop(sender: CommandSender):
+    """
+    主线程：按截止时间发送控制命令，并显示最新解码帧（cv2.imshow/waitKey 须在主线程调用），按 'q' 退出
+    """
+    cv2.namedWindow('Remote Video Stream', cv2.WINDOW_NORMAL)
+    cv2.resizeWindow('Remote Video Stream', 800, 600)
+    
+    shown_id = 0
     try:
-        while True:
-            # 接收视频帧
-            recv_time = time.time()
-            video_data = socket.recv()
-            frame_dict = TorchSerializer.from_bytes(video_data)
-            
-            # 计算端到端延迟
-            if 'timestamp' in frame_dict:
-                latency = (recv_time - frame_dict['timestamp']) * 1000  # 转换为毫秒
-                latencies.append(latency)
-                max_latency = max(max_latency, latency)
-                min_latency = min(min_latency, latency)
-                # 只保留最近100个延迟数据
-                if len(latencies) > 100:
-                    latencies.pop(0)
+        while not stop_event.is_set():
+            until_next_command = sender.poll()
             
-            frame_count += 1
-            fps_counter += 1
+            with frame_lock:
+                frame, frame_id = latest_frame, latest_frame_id
+            if frame is not None and frame_id != shown_id:
+                cv2.imshow('Remote Video Stream', frame)
+                shown_id = frame_id
             
-            # 计算 FPS
-            current_time = time.time()
-            if current_time - last_fps_time >= 1.0:
-                current_fps = fps_counter
-                fps_counter = 0
-                last_fps_time = current_time
-            
-            # 解码视频帧
-            if 'image' in frame_dict and frame_dict.get('encoding') == 'jpeg':
-                # JPEG 压缩的图像
-                encoded_data = frame_dict['image']
-                if isinstance(encoded_data, bytes):
-                    nparr = np.frombuffer(encoded_data, np.uint8)
-                    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                    
-                    if frame is not None:
-                        # 计算延迟统计
-                        avg_latency = sum(latencies) / len(latencies) if latencies else 0
-                        
-                        # 在图像上叠加信息
-                        cv2.putText(frame, f"FPS: {current_fps}", (10, frame.shape[0] - 20),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-                        cv2.putText(frame, f"Frames: {frame_count}", (10, frame.shape[0] - 50),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-                        
-                        # 延迟信息（右上角）
-                        if latencies:
-                            cv2.putText(frame, f"Latency: {latencies[-1]:.1f}ms", (frame.shape[1] - 250, 25),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                            cv2.putText(frame, f"Avg: {avg_latency:.1f}ms", (frame.shape[1] - 250, 50),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
-                            cv2.putText(frame, f"Min/Max: {min_latency:.0f}/{max_latency:.0f}ms", 
-                                       (frame.shape[1] - 250, 75),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
-                        
-                        # 显示视频
-                        if ENABLE_VIDEO_DISPLAY:
-                            cv2.imshow('Remote Video Stream', frame)
-                            # 按 'q' 退出
-                            if cv2.waitKey(1) & 0xFF == ord('q'):
-                                print("\n[线程2-视频] 用户按下 'q'，退出...")
-                                break
-                        
-                        # 打印日志（降低频率）
-                        if frame_count % 30 == 0:
-                            print(f"[线程2 B→A] 收到视频帧 #{frame_count}, "
-                                  f"大小: {len(encoded_data)/1024:.1f} KB, "
-                                  f"分辨率: {frame_dict.get('resolution', 'N/A')}, "
-                                  f"FPS: {current_fps}, "
-                                  f"延迟: {latencies[-1]:.1f}ms (平均: {avg_latency:.1f}ms)")
-                    else:
-                        print(f"[线程2-视频] ⚠️ 解码帧 #{frame_count} 失败")
-            else:
-                # 纯数据（测试模式）
-                if frame_count % 30 == 0:
-                    print(f"[线程2 B→A] 收到数据帧 #{frame_count}, "
-                          f"大小: {len(video_data)} bytes, "
-                          f"分辨率: {frame_dict.get('resolution', 'N/A')}")
-            
-    except KeyboardInterrupt:
-        pass
+            # waitKey同时驱动窗口事件循环，并作为轮询间隔（不超过5ms，也不越过下一条命令的截止时间）
+            wait_ms = max(1, min(5, int(until_next_command * 1000)))
+            if cv2.waitKey(wait_ms) & 0xFF == ord('q'):
+                print("\n[主线程-显示] 用户按下 'q'，退出...")
+                stop_event.set()
     finally:
-        if ENABLE_VIDEO_DISPLAY:
-            cv2.destroyAllWindows()
-        socket.close()
-        context.term()
-        print("[线程2-视频] 视频窗口已关闭")
+        cv2.destroyAllWindows()
+        print("[主线程-显示] 视频窗口已关闭")
+
+
+def command_loop(sender: CommandSender):
+    """主线程（不显示视频时）：只按截止时间发送控制命令"""
+    while not stop_event.is_set():
+        stop_event.wait(max(0.0, sender.poll()))
 
 
 def run_client_a():
     """
-    主函数：启动双线程客户端
+    主函数：启动客户端（视频接收/解码流水线；主线程负责发送命令和显示）
     """
     print("=" * 60)
     print("客户端 A 启动 - 真实视频显示模式")
     print("=" * 60)
-    print(f"线程1: 发送控制命令 ({COMMAND_RATE_HZ}Hz)")
-    print(f"线程2: 接收并显示视频流")
-    print(f"视频显示: {'启用' if ENABLE_VIDEO_DISPLAY else '禁用'}")
+    print(f"主线程: 发送控制命令 ({COMMAND_RATE_HZ}Hz)")
+    print(f"线程2: 接收视频流")
+    print(f"线程3: 解码视频帧")
+    print(f"视频显示: {'启用（主线程）' if ENABLE_VIDEO_DISPLAY else '禁用'}")
+    decoder = "nvJPEG (GPU)" if USE_NVJPEG and NVJPEG_AVAILABLE else (
+        "TurboJPEG" if TURBOJPEG_AVAILABLE else "cv2.imdecode")
+    print(f"JPEG解码: {decoder}")
     print("=" * 60)
     print("\n💡 提示: 在视频窗口按 'q' 键退出\n")
     
-    # 启动命令发送线程
-    command_thread = threading.Thread(target=thread_send_commands, daemon=True)
-    command_thread.start()
+    frame_queue = queue.Queue(maxsize=VIDEO_QUEUE_SIZE)
     
-    # 启动视频接收线程
-    video_thread = threading.Thread(target=thread_receive_video, daemon=True)
+    # 命令由主线程发送（与显示共用一个循环）
+    # 先创建发送器（首次调用 zmq.Context.instance() 启动libzmq I/O线程）再绑核，
+    # 否则I/O线程会继承主线程的CPU亲和性，与50Hz命令/显示抢同一个核
+    sender = CommandSender()
+    pin_current_thread(MAIN_THREAD_CPU, "主线程")
+    
+    # 启动视频接收线程与解码线程
+    video_thread = threading.Thread(target=thread_receive_video, args=(frame_queue,), daemon=True)
+    decode_thread = threading.Thread(target=thread_decode_video, args=(frame_queue,), daemon=True)
     video_thread.start()
+    decode_thread.start()
     
     print("客户端运行中，按 Ctrl+C 退出\n")
     
     try:
-        command_thread.join()
-        video_thread.join()
+        if ENABLE_VIDEO_DISPLAY:
+            display_loop(sender)
+        else:
+            command_loop(sender)
     except KeyboardInterrupt:
         print("\n\n客户端 A 正在关闭...")
+    finally:
+        stop_event.set()
+        video_thread.join(timeout=1.0)
+        sender.close()
         print("客户端 A 已关闭。")
 
 
@@ -7,6 +7,8 @@
 # 5. 支持LeRobot数据集保存
 
 import json
+import logging
+import os
 import threading
 import time
 import pickle
@@ -17,6 +19,13 @@ from pathlib import Path
 import shutil
 import argparse
 
+# 可选：orjson（C实现的JSON解析，直接接受bytes）
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # LeRobot imports
 try:
     from lerobot.datasets.lerobot_dataset import HF_LEROBOT_HOME, LeRobotDataset
@@ -39,13 +48,51 @@ SERVER_B_PORT_TO_C_DATA = 5556  # PUB发送给C
 # B 从C接收视频数据
 SERVER_B_PORT_FROM_C_VIDEO = 5558  # SUB接收C的视频
 
+# ZMQ端点（可用环境变量覆盖，默认TCP）
+# A与B在同一台机器时可改用ipc://（UNIX域套接字，绕过回环TCP协议栈），两端需设置相同端点，例如：
+#   ZMQ_FROM_A_DATA_EP=ipc:///tmp/wit_triple_data.sock  ZMQ_TO_A_VIDEO_EP=ipc:///tmp/wit_triple_video.sock
+# C通常在NAT后的另一台机器上，C侧端点一般保持TCP
+ENDPOINT_FROM_A_DATA = os.environ.get("ZMQ_FROM_A_DATA_EP", f"tcp://localhost:{SERVER_B_PORT_FROM_A_DATA}")
+ENDPOINT_TO_A_VIDEO = os.environ.get("ZMQ_TO_A_VIDEO_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_TO_A_VIDEO}")
+ENDPOINT_TO_C_DATA = os.environ.get("ZMQ_TO_C_DATA_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_TO_C_DATA}")
+ENDPOINT_FROM_C_VIDEO = os.environ.get("ZMQ_FROM_C_VIDEO_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_FROM_C_VIDEO}")
+
 # LeRobot数据集配置
 DEFAULT_REPO_ID = "triple_robot_data"
 DEFAULT_INSTRUCTION = "Triple IMU teleoperation data"
 DEFAULT_FPS = 5  # Triple默认5Hz
+LEROBOT_BATCH_SIZE = 32  # 累积多少帧后批量写入数据集
 DEFAULT_HF_LEROBOT_HOME = Path("triple_robot_data")
+ERROR_LOG_INTERVAL = 1.0  # 热路径上的同类错误最多每秒记录一次（持续故障时不刷屏）
+
+# 关闭时置位：转发线程退出循环，并在退出前写入LeRobot缓冲区中剩余的帧
+stop_event = threading.Event()
 # ------------
 
+log = logging.getLogger(__name__)
+
+def bind_endpoint(socket, endpoint: str):
+    """
+    绑定ZMQ端点；ipc:// 端点创建的套接字文件仅当前用户可访问（0600）
+    绑定期间临时收紧umask，避免文件先以默认权限创建再chmod的竞争窗口
+    """
+    if endpoint.startswith("ipc://"):
+        old_umask = os.umask(0o077)
+        try:
+            socket.bind(endpoint)
+        finally:
+            os.umask(old_umask)
+    else:
+        socket.bind(endpoint)
+
+
+def json_loads(data):
+    """解析JSON（bytes或str），优先orjson，未安装时回退到标准json"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 class TorchSerializer:
     @staticmethod
     def to_bytes(obj) -> bytes:
@@ -109,6 +156,12 @@ class LeRobotDataHandler:
         )
         print("✅ LeRobot数据集已初始化（Triple IMU格式）")
         self.frame_count = 0
+        
+        # 批量写入缓冲：每行一帧7维状态，攒满后一次性写入数据集
+        self._batch_size = LEROBOT_BATCH_SIZE
+        self._state_buf = np.empty((self._batch_size, 7), dtype=np.float32)
+        self._pending = 0
+        self._last_error_log = 0.0
     
     def add_frame(self, triple_data: dict):
         """
@@ -132,58 +185,96 @@ class LeRobotDataHandler:
             orientation = triple_data.get("orientation", [0, 0, 0])
             gripper = triple_data.get("gripper", 0.0)
             
-            # 构造7维状态向量
-            state = np.array([
-                position[0],      # x
-                position[1],      # y
-                position[2],      # z
-                orientation[0],   # roll (弧度)
-                orientation[1],   # pitch (弧度)
-                orientation[2],   # yaw (弧度)
-                gripper           # gripper
-            ], dtype=np.float32)
+            # 7维状态直接写入批量缓冲区的下一行 [x, y, z, roll, pitch, yaw, gripper]
+            state = self._state_buf[self._pending]
+            state[0:3] = position
+            state[3:6] = orientation
+            state[6] = gripper
+            self._pending += 1
+            self.frame_count += 1
             
-            # 使用state作为action（主遥操作模式）
-            action = state.copy()
+            if self._pending >= self._batch_size:
+                self.flush()
             
-            # 准备帧数据
+            if self.frame_count % 100 == 0:
+                print(f"📊 已收集 {self.frame_count} 帧triple数据...")
+                
+        except Exception:
+            now = time.monotonic()
+            if now - self._last_error_log > ERROR_LOG_INTERVAL:
+                self._last_error_log = now
+                log.exception("❌ 添加triple帧数据时出错")
+    
+    def flush(self):
+        """将缓冲区中尚未写入的帧批量写入数据集（只在转发线程中调用，与 add_frame 不并发）"""
+        if self.dataset is None or self._pending == 0:
+            return
+        
+        # 数据集会持有每帧数组的引用：本批次交给数据集后换用新的缓冲区
+        batch = self._state_buf[:self._pending]
+        self._state_buf = np.empty((self._batch_size, 7), dtype=np.float32)
+        self._pending = 0
+        
+        for state in batch:
+            # 使用state作为action（主遥操作模式）
             frame_data = {
                 "observation.state": state,
-                "action": action,
+                "action": state.copy(),
             }
-            
-            # 添加到数据集
             self.dataset.add_frame(frame_data, self.instruction)
-            self.frame_count += 1
-            
-            if self.frame_count % 100 == 0:
-                print(f"📊 已收集 {self.frame_count} 帧triple数据...")
-                
-        except Exception as e:
-            print(f"❌ 添加triple帧数据时出错: {e}")
-            import traceback
-            traceback.print_exc()
 
 
-def thread_data_from_triple():
+def handle_triple_data(message: bytes, socket_to_c, lerobot_handler: LeRobotDataHandler = None):
+    """处理一条A (triple) 的传感器数据：解析、保存LeRobot，并原样转发给C"""
+    try:
+        triple_data = json_loads(message)
+    except ValueError as e:  # json.JSONDecodeError / orjson.JSONDecodeError 均为ValueError子类
+        print(f"[数据] JSON解析失败: {e}")
+        return
+    
+    # 打印接收到的数据（降低频率）
+    if lerobot_handler is None or lerobot_handler.frame_count % 25 == 0:
+        pos = triple_data.get("position", [0, 0, 0])
+        ori = triple_data.get("orientation", [0, 0, 0])
+        gripper = triple_data.get("gripper", 0.0)
+        print(f"[A→B] 收到triple数据: "
+              f"位置=[{pos[0]:.3f}, {pos[1]:.3f}, {pos[2]:.3f}], "
+              f"姿态=[{ori[0]:.3f}, {ori[1]:.3f}, {ori[2]:.3f}], "
+              f"夹爪={gripper:.3f}")
+    
+    # 保存到LeRobot数据集
+    if lerobot_handler is not None:
+        lerobot_handler.add_frame(triple_data)
+    
+    # 转发给C（原始JSON bytes，无需重新序列化）
+    socket_to_c.send(message)
+
+
+def thread_forwarder(lerobot_handler: LeRobotDataHandler = None):
     """
-    线程1：接收来自A (triple) 的传感器数据
-    并转发给C
+    转发线程：单线程 + zmq.Poller 同时处理两路数据（无需两个线程各自超时轮询）
+      - A (triple) 的传感器数据 → C（同时保存LeRobot）
+      - C 的视频数据 → A (triple)，纯字节中继
+    无论以何种方式退出，都在本线程内写入LeRobot缓冲区中剩余的帧
     """
+    try:
+        _forward_loop(lerobot_handler)
+    finally:
+        if lerobot_handler is not None:
+            lerobot_handler.flush()
+
+
+def _forward_loop(lerobot_handler: LeRobotDataHandler = None):
+    """转发线程主循环，stop_event 置位后（最多1秒内）返回"""
     context = None
     socket_from_a = None
     socket_to_c = None
-    lerobot_handler = None
-    
-    # 初始化LeRobot数据处理器
-    if LeRobotDataset is not None:
-        lerobot_handler = LeRobotDataHandler(
-            repo_id=DEFAULT_REPO_ID,
-            instruction=DEFAULT_INSTRUCTION,
-            fps=DEFAULT_FPS
-        )
+    socket_from_c = None
+    socket_to_a = None
+    poller = None
+    forwarded_count = 0  # 已转发视频帧数（用于抽样打印）
     
-    while True:
+    while not stop_event.is_set():
         try:
             if context is None:
                 context = zmq.Context()
@@ -191,138 +282,79 @@ def thread_data_from_triple():
             # 订阅来自A (triple) 的传感器数据 (SUB socket)
             if socket_from_a is None:
                 socket_from_a = context.socket(zmq.SUB)
-                socket_from_a.setsockopt(zmq.RCVTIMEO, 1000)  # 1秒超时
                 socket_from_a.setsockopt(zmq.CONFLATE, 1)  # 只保留最新消息
                 # Triple使用bind，所以B需要connect
-                socket_from_a.connect(f"tcp://localhost:{SERVER_B_PORT_FROM_A_DATA}")
+                socket_from_a.connect(ENDPOINT_FROM_A_DATA)
                 socket_from_a.setsockopt_string(zmq.SUBSCRIBE, "")  # 订阅所有消息
-                print(f"[线程1-数据] 订阅 A (triple) 的传感器数据: localhost:{SERVER_B_PORT_FROM_A_DATA}")
+                print(f"[数据] 订阅 A (triple) 的传感器数据: {ENDPOINT_FROM_A_DATA}")
+                poller = None
             
             # 向C转发传感器数据 (PUB socket)
             if socket_to_c is None:
                 socket_to_c = context.socket(zmq.PUB)
-                socket_to_c.bind(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_TO_C_DATA}")
-                print(f"[线程1-数据] 向C发布传感器数据: *:{SERVER_B_PORT_TO_C_DATA}")
-            
-            # 接收triple的传感器数据（带超时）
-            try:
-                message = socket_from_a.recv_string()
-                triple_data = json.loads(message)
-                
-                # 打印接收到的数据（降低频率）
-                if lerobot_handler is None or lerobot_handler.frame_count % 25 == 0:
-                    pos = triple_data.get("position", [0, 0, 0])
-                    ori = triple_data.get("orientation", [0, 0, 0])
-                    gripper = triple_data.get("gripper", 0.0)
-                    print(f"[线程1 A→B] 收到triple数据: "
-                          f"位置=[{pos[0]:.3f}, {pos[1]:.3f}, {pos[2]:.3f}], "
-                          f"姿态=[{ori[0]:.3f}, {ori[1]:.3f}, {ori[2]:.3f}], "
-                          f"夹爪={gripper:.3f}")
-                
-                # 保存到LeRobot数据集
-                if lerobot_handler is not None:
-                    lerobot_handler.add_frame(triple_data)
-                
-                # 转发给C（使用JSON字符串）
-                socket_to_c.send_string(message)
-                
-            except zmq.Again:
-                # 超时，继续循环
-                continue
-            except json.JSONDecodeError as e:
-                print(f"[线程1-数据] JSON解析失败: {e}")
-                continue
-                
-        except zmq.ZMQError as e:
-            print(f"[线程1-数据] ZMQ 错误: {e}")
-            if socket_from_a:
-                try:
-                    socket_from_a.close()
-                except:
-                    pass
-                socket_from_a = None
-            time.sleep(1)
-            
-        except Exception as e:
-            print(f"[线程1-数据] 错误: {e}")
-            import traceback
-            traceback.print_exc()
-            time.sleep(1)
-
-
-def thread_video_to_triple():
-    """
-    线程2：接收来自C的视频数据
-    并转发给A (triple)
-    """
-    context = None
-    socket_from_c = None
-    socket_to_a = None
-    
-    while True:
-        try:
-            if context is None:
-                context = zmq.Context()
+                bind_endpoint(socket_to_c, ENDPOINT_TO_C_DATA)
+                print(f"[数据] 向C发布传感器数据: {ENDPOINT_TO_C_DATA}")
             
             # 订阅来自C的视频数据 (SUB socket)
             if socket_from_c is None:
                 socket_from_c = context.socket(zmq.SUB)
-                socket_from_c.setsockopt(zmq.RCVTIMEO, 1000)  # 1秒超时
-                socket_from_c.setsockopt(zmq.CONFLATE, 1)  # 只保留最新消息
-                socket_from_c.bind(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_FROM_C_VIDEO}")
+                socket_from_c.setsockopt(zmq.RCVHWM, 1)  # 只保留最新消息（CONFLATE不支持多帧消息）
+                bind_endpoint(socket_from_c, ENDPOINT_FROM_C_VIDEO)
                 socket_from_c.setsockopt_string(zmq.SUBSCRIBE, "")  # 订阅所有消息
-                print(f"[线程2-视频] 监听 C 的视频数据: *:{SERVER_B_PORT_FROM_C_VIDEO}")
+                print(f"[视频] 监听 C 的视频数据: {ENDPOINT_FROM_C_VIDEO}")
+                poller = None
             
             # 向A (triple) 推送视频流 (PUB socket)
             if socket_to_a is None:
                 socket_to_a = context.socket(zmq.PUB)
                 socket_to_a.setsockopt(zmq.SNDHWM, 1)  # 只保留最新1帧
                 socket_to_a.setsockopt(zmq.LINGER, 0)  # 立即丢弃
-                socket_to_a.bind(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_TO_A_VIDEO}")
-                print(f"[线程2-视频] 向 A (triple) 发布视频: *:{SERVER_B_PORT_TO_A_VIDEO}")
+                bind_endpoint(socket_to_a, ENDPOINT_TO_A_VIDEO)
+                print(f"[视频] 向 A (triple) 发布视频: {ENDPOINT_TO_A_VIDEO}")
             
-            # 接收C的视频数据（带超时）
-            try:
-                video_data = socket_from_c.recv()
-                
-                # 解析视频数据（支持pickle和JSON）
-                try:
-                    frame_dict = pickle.loads(video_data)
-                except:
-                    try:
-                        frame_dict = json.loads(video_data.decode('utf-8'))
-                    except:
-                        print("[线程2-视频] ⚠️ 视频数据解析失败")
-                        continue
-                
-                # 转发给A（保持pickle格式，兼容triple的video_receiver_thread）
-                socket_to_a.send(pickle.dumps(frame_dict))
-                
-                # 每30帧打印一次
-                if isinstance(frame_dict, dict):
-                    frame_count = frame_dict.get("frame_count", 0)
-                    if frame_count % 30 == 0:
-                        data_size = len(video_data) if isinstance(video_data, bytes) else 0
-                        print(f"[线程2 C→A] 转发视频帧 #{frame_count}, 大小: {data_size} bytes")
+            # 接收socket重建后重新注册
+            if poller is None:
+                poller = zmq.Poller()
+                poller.register(socket_from_a, zmq.POLLIN)
+                poller.register(socket_from_c, zmq.POLLIN)
+            
+            # 等待任一路数据（1秒超时）
+            socks = dict(poller.poll(1000))
+            
+            if socket_from_a in socks:
+                # 以bytes接收（省去UTF-8解码），解析后原样转发
+                message = socket_from_a.recv(zmq.NOBLOCK)
+                handle_triple_data(message, socket_to_c, lerobot_handler)
+            
+            if socket_from_c in socks:
+                # 所有帧原样转发给A：纯字节中继，不解析内容，由A端解析
+                video_parts = socket_from_c.recv_multipart(zmq.NOBLOCK, copy=False)
+                socket_to_a.send_multipart(video_parts, copy=False)
+                forwarded_count += 1
                 
-            except zmq.Again:
-                # 超时，继续循环
-                continue
+                # 每30帧打印一次（只统计字节数）
+                if forwarded_count % 30 == 0:
+                    data_size = sum(len(part.buffer) for part in video_parts)
+                    print(f"[C→A] 转发视频帧 #{forwarded_count}, 大小: {data_size} bytes")
                 
+        except zmq.Again:
+            continue
+        
         except zmq.ZMQError as e:
-            print(f"[线程2-视频] ZMQ 错误: {e}")
-            if socket_from_c:
-                try:
-                    socket_from_c.close()
-                except:
-                    pass
-                socket_from_c = None
+            print(f"[转发线程] ZMQ 错误: {e}")
+            for sock in (socket_from_a, socket_from_c):
+                if sock:
+                    try:
+                        sock.close()
+                    except:
+                        pass
+            socket_from_a = None
+            socket_from_c = None
+            poller = None
             time.sleep(1)
             
-        except Exception as e:
-            print(f"[线程2-视频] 错误: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            log.exception("[转发线程] 错误")  # 随后sleep(1)，本身已限制为每秒最多一次
             time.sleep(1)
 
 
@@ -341,22 +373,29 @@ def run_server_b():
     print("  5. 保存数据为LeRobot格式")
     print("=" * 70)
     
-    # 启动线程1：接收triple数据并转发给C
-    data_thread = threading.Thread(target=thread_data_from_triple, daemon=True)
-    data_thread.start()
+    # 初始化LeRobot数据处理器
+    lerobot_handler = None
+    if LeRobotDataset is not None:
+        lerobot_handler = LeRobotDataHandler(
+            repo_id=DEFAULT_REPO_ID,
+            instruction=DEFAULT_INSTRUCTION,
+            fps=DEFAULT_FPS
+        )
     
-    # 启动线程2：接收C视频并转发给triple
-    video_thread = threading.Thread(target=thread_video_to_triple, daemon=True)
-    video_thread.start()
+    # 启动转发线程：triple数据→C 与 C视频→triple 由同一个Poller循环处理
+    forwarder_thread = threading.Thread(target=thread_forwarder, args=(lerobot_handler,), daemon=True)
+    forwarder_thread.start()
     
-    print("\n两个线程已启动")
+    print("\n转发线程已启动")
     print("按 Ctrl+C 停止服务器\n")
     
     try:
-        data_thread.join()
-        video_thread.join()
+        forwarder_thread.join()
     except KeyboardInterrupt:
         print("\n\n服务器 B 正在关闭...")
+        # 停止转发线程：它退出前会写入缓冲区中剩余的帧（避免与 add_frame 并发操作缓冲区）
+        stop_event.set()
+        forwarder_thread.join()
         print("服务器 B 已关闭。")
 
 
@@ -371,6 +410,8 @@ if __name__ == "__main__":
     
     args = parser.parse_args()
     
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    
     # 更新全局配置
     DEFAULT_REPO_ID = args.repo_id
     DEFAULT_INSTRUCTION = args.instruction
@@ -93,12 +93,20 @@ def thread_send_video():
     print(f"[视频线程] 跳帧策略: 每 {FRAME_SKIP} 帧发送 1 帧")
     
     # JPEG 编码参数
-    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY]
+    # 参数只构造一次（int32数组，OpenCV按 vector<int> 直接读取）；显式关闭哈夫曼表优化和渐进式编码
+    encode_param = np.array([cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+                             cv2.IMWRITE_JPEG_PROGRESSIVE, 0], dtype=np.int32)
+    cv2.setNumThreads(1)  # 小图逐帧处理用不上OpenCV线程池，避免工作线程与音频/命令线程争抢CPU
     
     frame_count = 0
     sent_count = 0
     start_time = time.time()
     
+    # 绝对截止时间调度：cap.read() 本身按摄像头帧率阻塞，这里只补足到下一个截止时间，不再额外叠加一整个周期
+    period_ns = int(1e9 * FRAME_SKIP / VIDEO_FPS)
+    start_ns = time.monotonic_ns()
+    tick = 0  # 自 start_ns 起已调度的帧数
+    
     try:
         while True:
             ret, frame = cap.read()
@@ -119,7 +127,7 @@ def thread_send_video():
             capture_time = time.time()
             
             # JPEG 编码（无 OSD 绘制）
-            _, encoded_frame = cv2.imencode('.jpg', frame, encode_param)
+            encoded_frame = cv2.imencode('.jpg', frame, encode_param)[1]
             
             # 最小化数据包
             frame_data = {
@@ -139,8 +147,14 @@ def thread_send_video():
                       f"大小: {len(encoded_frame)} bytes")
                 start_time = time.time()
             
-            # 控制帧率（实际发送频率）
-            time.sleep(1.0 / (VIDEO_FPS / FRAME_SKIP))
+            # 控制帧率：第 tick 帧截止于 start_ns + tick*period_ns（整数纳秒，不累积误差），落后时从当前时刻重新对齐
+            tick += 1
+            delay_ns = start_ns + tick * period_ns - time.monotonic_ns()
+            if delay_ns > 0:
+                time.sleep(delay_ns / 1e9)
+            else:
+                start_ns = time.monotonic_ns()
+                tick = 0
             
     except KeyboardInterrupt:
         print("\n[视频线程] 停止中...")
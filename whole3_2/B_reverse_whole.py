@@ -4,10 +4,13 @@
 # 2. 接收来自C的JSON数据（包含视频和机器人数据）
 # 3. 将数据转换为lerobot格式并保存到本地
 # 4. 同时将视频转发给A
+import os
 import json
 import threading
+import queue
 import time
 import pickle
+import struct
 import zmq
 import cv2
 import numpy as np
@@ -23,6 +26,15 @@ except ImportError:
     print("请安装: pip install lerobot")
     LeRobotDataset = None
 
+# 可选：libjpeg-turbo（SIMD加速的JPEG编码，可直接按RGB编码），未安装时回退到cv2.imencode
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJFLAG_FASTDCT
+    _tj = TurboJPEG()
+    TURBOJPEG_AVAILABLE = True
+except (ImportError, OSError, RuntimeError):
+    _tj = None
+    TURBOJPEG_AVAILABLE = False
+
 # --- 配置 ---
 # B 监听的端口 (给 A 接收控制命令)
 SERVER_B_HOST = "0.0.0.0"
@@ -37,10 +49,31 @@ SERVER_B_PORT_FOR_C_COMMAND = 5556
 # B 监听的端口 (让 C 主动连接 - 数据上传，包含视频和机器人数据)
 SERVER_B_PORT_FOR_C_DATA = 5558
 
+# 同机ipc端点（B在绑定TCP端口的同时也绑定这些路径；C可通过环境变量 ZMQ_C_*_EP 改连ipc）
+C_IPC_ENDPOINT = "ipc:///tmp/imu_rs485_b_{port}"
+
+# 视频帧头（C→B 与 B→A 共用，与 C_real_video_reverse_ultra.py 一致）：时间戳(float64) + JPEG长度(uint32)
+VIDEO_FRAME_HEADER = struct.Struct("<dI")
+
+# 转发给A的JPEG自适应质量（仅在B需要重新编码numpy图像时生效）
+FORWARD_JPEG_QUALITY_MIN = 60
+FORWARD_JPEG_QUALITY_MAX = 90
+FORWARD_JPEG_QUALITY_DEFAULT = 80
+FORWARD_JPEG_FASTDCT_BELOW = 80  # 质量低于此值时TurboJPEG使用快速DCT
+FORWARD_JPEG_RAISE_AFTER = 30  # 连续成功发送多少帧后质量+1
+FORWARD_JPEG_LOWER_STEP = 5  # 发送被丢弃/编码超时时质量下降步长
+FORWARD_ENCODE_BUDGET_MS = 10.0  # 单帧编码耗时预算
+
 # LeRobot数据集配置
 DEFAULT_REPO_ID = "real_robot_online_data"
 DEFAULT_INSTRUCTION = "Real robot teleoperation data collection"
 DEFAULT_FPS = 30
+LEROBOT_ROW_BLOCK = 64  # state/action行缓冲块：每块分配一次，逐帧就地填入一行
+LEROBOT_WRITE_QUEUE_SIZE = 64  # 数据集后台写入队列长度（满时丢弃新帧，不阻塞接收线程）
+_WRITER_STOP = object()  # 写入队列的结束标记：后台写入线程取到后退出
+
+# 关闭时先置位：接收数据的线程退出循环，不再向写入队列提交新帧
+stop_event = threading.Event()
 DEFAULT_HF_LEROBOT_HOME = Path("real_robot_data")
 # ------------
 
@@ -56,6 +89,29 @@ class TorchSerializer:
         return pickle.loads(data)
 
 
+# OpenCV >= 4.10 可直接解码为RGB；旧版本为None，解码为BGR后再转换
+IMREAD_COLOR_RGB = getattr(cv2, "IMREAD_COLOR_RGB", None)
+
+
+def decode_jpeg_rgb(data: bytes):
+    """
+    将JPEG直接解码为RGB图像（LeRobot使用RGB），失败时返回None
+    优先TurboJPEG按RGB输出（颜色空间转换在libjpeg-turbo内部完成，无需cvtColor）
+    """
+    if TURBOJPEG_AVAILABLE:
+        try:
+            return _tj.decode(data, pixel_format=TJPF_RGB)
+        except (OSError, ValueError):
+            return None
+    nparr = np.frombuffer(data, np.uint8)
+    if IMREAD_COLOR_RGB is not None:
+        return cv2.imdecode(nparr, IMREAD_COLOR_RGB)
+    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if image is not None:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return image
+
+
 class LeRobotDataHandler:
     """
     处理LeRobot数据集保存的类
@@ -124,10 +180,59 @@ class LeRobotDataHandler:
         )
         print("✅ LeRobot数据集已初始化，准备接收数据")
         self.frame_count = 0
+        
+        # 预分配的float32行缓冲块（数据集持有已写入行的引用，写满后换新块而不是覆盖）
+        self._state_rows = np.empty((LEROBOT_ROW_BLOCK, state_dim), dtype=np.float32)
+        self._action_rows = np.empty((LEROBOT_ROW_BLOCK, action_dim), dtype=np.float32)
+        self._row = 0
+        
+        # 后台写入线程：接收线程只把数据放入队列，图像解码与dataset.add_frame在此线程按顺序完成
+        self._write_queue = queue.Queue(maxsize=LEROBOT_WRITE_QUEUE_SIZE)
+        self.dropped_count = 0
+        self._writer_thread = threading.Thread(target=self._drain_writes, daemon=True)
+        self._writer_thread.start()
     
     def add_frame(self, data_dict: dict):
+        """将一帧数据放入后台写入队列（不阻塞调用方；队列满时丢弃该帧并提示）"""
+        if self.dataset is None:
+            return
+        try:
+            self._write_queue.put_nowait(data_dict)
+        except queue.Full:
+            self.dropped_count += 1
+            if self.dropped_count % 100 == 1:
+                print(f"⚠️ 数据集写入跟不上，已丢弃 {self.dropped_count} 帧")
+    
+    def _drain_writes(self):
+        """后台写入线程：按到达顺序取出帧写入数据集"""
+        while True:
+            data_dict = self._write_queue.get()
+            if data_dict is _WRITER_STOP:
+                return
+            self._write_frame(data_dict)
+    
+    def close(self):
         """
-        添加一帧数据到数据集
+        停止后台写入线程：放入结束标记，等队列中已提交的帧全部写入后线程退出
+        须在接收线程停止后调用，之后才能安全地 save_episode
+        """
+        if self.dataset is not None:
+            self._write_queue.put(_WRITER_STOP)
+            self._writer_thread.join()
+    
+    def _next_rows(self):
+        """取下一行state/action输出缓冲（当前块写满时分配新块）"""
+        if self._row == LEROBOT_ROW_BLOCK:
+            self._state_rows = np.empty_like(self._state_rows)
+            self._action_rows = np.empty_like(self._action_rows)
+            self._row = 0
+        row = self._row
+        self._row += 1
+        return self._state_rows[row], self._action_rows[row]
+    
+    def _write_frame(self, data_dict: dict):
+        """
+        添加一帧数据到数据集（在后台写入线程中执行）
         
         Args:
             data_dict: 包含以下字段的字典:
@@ -141,21 +246,21 @@ class LeRobotDataHandler:
         
         try:
             # 处理图像数据（支持多种字段名）
-            image = data_dict.get("image") or data_dict.get("camera_1.rgb")
+            # 不能用 `a or b`：image为numpy数组时真值判断会抛异常
+            image = data_dict.get("image")
+            if image is None:
+                image = data_dict.get("camera_1.rgb")
             if image is None:
                 # 不打印警告，因为可能只是转发视频而不保存数据集
                 return
             
             # 如果图像是bytes（JPEG编码），需要解码
-            if isinstance(image, bytes):
-                nparr = np.frombuffer(image, np.uint8)
-                image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            if isinstance(image, (bytes, memoryview)):
+                # 直接解码为RGB（LeRobot使用RGB）
+                image = decode_jpeg_rgb(image)
                 if image is None:
                     print("⚠️ 警告: 图像解码失败")
                     return
-                # BGR转RGB（OpenCV使用BGR，但LeRobot通常使用RGB）
-                if len(image.shape) == 3 and image.shape[2] == 3:
-                    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
             
             # 确保图像是numpy array
             if not isinstance(image, np.ndarray):
@@ -163,7 +268,10 @@ class LeRobotDataHandler:
                 return
             
             # 处理状态数据（支持多种字段名）
-            state = data_dict.get("state") or data_dict.get("observation.state")
+            # 注意：不能用 `a or b`，state为numpy数组时真值判断会抛异常
+            state = data_dict.get("state")
+            if state is None:
+                state = data_dict.get("observation.state")
             if state is None:
                 # 尝试从其他字段构建状态（例如：euler_angles + throttle）
                 euler = data_dict.get("euler_angles", {})
@@ -179,22 +287,19 @@ class LeRobotDataHandler:
                     print("⚠️ 警告: 数据中缺少state字段且无法构建")
                     return
             
-            if not isinstance(state, np.ndarray):
-                state = np.array(state, dtype=np.float32)
-            else:
-                state = state.astype(np.float32)
+            # 就地写入预分配的float32行（list或任意dtype数组均在赋值时转换，无需额外分配）
+            state_out, action_out = self._next_rows()
+            state_out[:] = state
             
             # 处理动作数据
             action = data_dict.get("action")
             if action is None:
                 # 如果没有action，可以使用state作为action（某些情况下）
-                action = state.copy()
+                action_out = state_out  # 只读使用，无需拷贝
                 print("⚠️ 警告: 数据中缺少action字段，使用state作为action")
-            
-            if not isinstance(action, np.ndarray):
-                action = np.array(action, dtype=np.float32)
             else:
-                action = action.astype(np.float32)
+                action_out[:] = action
+            state, action = state_out, action_out
             
             # 准备帧数据
             frame_data = {
@@ -247,17 +352,18 @@ def parse_json_data(raw_data):
     if isinstance(raw_data, dict):
         return raw_data
     
-    # 如果是bytes，先尝试pickle反序列化（最常见的情况）
+    # 如果是bytes，按首字节分派：pickle协议2+以PROTO操作码0x80开头（合法JSON不可能以该字节开头），
+    # 直接pickle解码（最常见的情况，C使用pickle），其余按JSON解析，不再“先试pickle失败再试JSON”
     if isinstance(raw_data, bytes):
-        try:
-            # 先尝试pickle（C_real_video_reverse.py使用pickle）
-            data = pickle.loads(raw_data)
-            if isinstance(data, dict):
-                return data
-        except Exception as e:
-            pass
+        if raw_data[:1] == b'\x80':
+            try:
+                data = pickle.loads(raw_data)
+            except Exception as e:
+                print(f"⚠️ pickle数据解析失败: {e}")
+                return None
+            return data if isinstance(data, dict) else None
         
-        # 如果pickle失败，尝试JSON
+        # 非pickle数据，按JSON解析
         try:
             json_str = raw_data.decode('utf-8')
             data = json.loads(json_str)
@@ -278,6 +384,28 @@ def parse_json_data(raw_data):
     return None
 
 
+# 当前转发质量及连续成功计数（只由转发线程读写）
+forward_jpeg_quality = FORWARD_JPEG_QUALITY_DEFAULT
+forward_ok_streak = 0
+
+
+def update_forward_quality(sent_ok: bool):
+    """
+    根据发送结果调整转发JPEG质量：
+    发送被丢弃（zmq.Again）或编码超出预算时降低质量，连续顺利发送后逐步回升
+    """
+    global forward_jpeg_quality, forward_ok_streak
+    if sent_ok:
+        forward_ok_streak += 1
+        if forward_ok_streak >= FORWARD_JPEG_RAISE_AFTER:
+            forward_ok_streak = 0
+            forward_jpeg_quality = min(forward_jpeg_quality + 1, FORWARD_JPEG_QUALITY_MAX)
+    else:
+        forward_ok_streak = 0
+        forward_jpeg_quality = max(forward_jpeg_quality - FORWARD_JPEG_LOWER_STEP,
+                                   FORWARD_JPEG_QUALITY_MIN)
+
+
 def extract_video_for_forwarding(data_dict: dict) -> bytes:
     """
     从数据字典中提取视频数据，用于转发给A
@@ -286,16 +414,33 @@ def extract_video_for_forwarding(data_dict: dict) -> bytes:
         data_dict: 包含视频数据的字典（支持多种字段名）
         
     Returns:
-        bytes: 视频帧的字节数据（JPEG编码），如果提取失败返回None
+        bytes/memoryview: 视频帧的JPEG数据（可直接用于send_multipart），如果提取失败返回None
     """
-    # 支持多种字段名
-    image = data_dict.get("image") or data_dict.get("camera_1.rgb")
+    # 支持多种字段名（不能用 `a or b`，image为numpy数组时真值判断会抛异常）
+    image = data_dict.get("image")
+    if image is None:
+        image = data_dict.get("camera_1.rgb")
     
     if image is None:
         return None
     
-    # 如果图像是numpy array，需要编码为JPEG
+    # 常见情况：C已发送JPEG数据（bytes或零拷贝memoryview），原样转发，不做任何图像处理
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return image
+    
+    # 如果图像是numpy array，需要编码为JPEG（质量由 update_forward_quality 自适应调整）
     if isinstance(image, np.ndarray):
+        quality = forward_jpeg_quality
+        encode_start = time.perf_counter()
+        
+        # TurboJPEG直接按RGB像素格式编码（通常LeRobot使用RGB），省去RGB→BGR转换
+        if TURBOJPEG_AVAILABLE and image.ndim == 3 and image.shape[2] == 3:
+            flags = TJFLAG_FASTDCT if quality < FORWARD_JPEG_FASTDCT_BELOW else 0
+            encoded = _tj.encode(image, quality=quality, pixel_format=TJPF_RGB, flags=flags)
+            if (time.perf_counter() - encode_start) * 1000 > FORWARD_ENCODE_BUDGET_MS:
+                update_forward_quality(False)
+            return encoded
+        
         # 如果是RGB，转换为BGR（OpenCV使用BGR）
         if len(image.shape) == 3 and image.shape[2] == 3:
             # 检查是否是RGB（通常LeRobot使用RGB）
@@ -310,107 +455,152 @@ def extract_video_for_forwarding(data_dict: dict) -> bytes:
             image_bgr = image
         
         # 编码为JPEG
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 80]
+        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
         result, encoded_frame = cv2.imencode('.jpg', image_bgr, encode_param)
+        if (time.perf_counter() - encode_start) * 1000 > FORWARD_ENCODE_BUDGET_MS:
+            update_forward_quality(False)
         if result:
-            return encoded_frame.tobytes()
+            return encoded_frame.data  # imencode缓冲区的memoryview，省去tobytes拷贝
         else:
             print("⚠️ 图像编码失败")
             return None
     
-    # 如果已经是bytes，直接返回
-    if isinstance(image, bytes):
-        return image
-    
     return None
 
 
-def thread_command_handler():
+def bind_endpoint(sock, endpoint: str):
+    """
+    绑定ZMQ端点；ipc:// 端点创建的套接字文件仅当前用户可访问（0600）
+    绑定期间临时收紧umask，避免文件先以默认权限创建再chmod的竞争窗口
+    """
+    if endpoint.startswith("ipc://"):
+        old_umask = os.umask(0o077)
+        try:
+            sock.bind(endpoint)
+        finally:
+            os.umask(old_umask)
+    else:
+        sock.bind(endpoint)
+
+
+def bind_local_ipc(sock, port: int):
+    """
+    在TCP端口之外再绑定同机ipc端点（C与B同机时可改连ipc，跳过TCP协议栈）；平台不支持ipc时忽略
+    ipc只是可选的加速路径：绑定失败（如/tmp下残留其他用户的套接字文件）时只打印警告，不影响TCP服务
+    """
+    if not zmq.has("ipc"):
+        return
+    endpoint = C_IPC_ENDPOINT.format(port=port)
+    try:
+        bind_endpoint(sock, endpoint)
+    except zmq.ZMQError as e:
+        print(f"⚠️ 绑定ipc端点失败（仅TCP可用）: {endpoint}: {e}")
+
+
+def handle_command(message: bytes, socket_to_c):
+    """处理一条 A 的控制命令：打印并原样转发给 C（A -> B -> C）"""
+    command = TorchSerializer.from_bytes(message)
+    print(f"\n[命令 A→C] 收到控制命令: {command}")
+    
+    # 转发给 C（如果 C 已连接）
+    try:
+        # 原样转发A的pickle字节（C端用同样的pickle解码），无需重新序列化
+        socket_to_c.send(message, zmq.NOBLOCK)
+        print(f"[命令 A→C] 命令已转发给 C")
+    except zmq.Again:
+        print(f"[命令 A→C] ⚠️ C 未连接，命令已丢弃")
+
+
+def handle_c_data(parts, socket_to_a, lerobot_handler: LeRobotDataHandler = None):
     """
-    线程1：处理控制命令流 (A -> B -> C)
-    反向模式：C 主动连接 B
-    支持 A 断开重连，自动恢复
+    处理一条 C 推送的数据（C -> B -> A）：
+    1. 解析数据（包含视频和机器人数据）
+    2. 交给LeRobot后台写入线程保存
+    3. 提取视频并转发给A
+    """
+    # 解析数据：两帧为 [固定帧头, JPEG]（C_real_video_reverse_ultra.py），
+    # 单帧为原有pickle/JSON格式
+    if len(parts) == 2 and len(parts[0]) == VIDEO_FRAME_HEADER.size:
+        capture_time, jpeg_size = VIDEO_FRAME_HEADER.unpack(parts[0].buffer)
+        data_dict = {"image": parts[1].buffer, "timestamp": capture_time}
+    else:
+        data_dict = parse_json_data(parts[0].bytes)
+    if data_dict is None:
+        print("[数据] ⚠️ 数据解析失败，跳过")
+        return
+    
+    # 打印接收到的数据信息（降低频率）
+    data_size = sum(len(part) for part in parts)
+    has_image = "image" in data_dict or "camera_1.rgb" in data_dict
+    has_state = "state" in data_dict or "observation.state" in data_dict
+    has_action = "action" in data_dict
+    print(f"[数据 C→B] 收到数据，大小: {data_size} bytes, "
+          f"包含: 图像={has_image}, 状态={has_state}, 动作={has_action}")
+    
+    # 保存到LeRobot数据集
+    if lerobot_handler is not None:
+        lerobot_handler.add_frame(data_dict)
+    
+    # 提取视频并转发给A
+    video_bytes = extract_video_for_forwarding(data_dict)
+    if video_bytes:
+        # 两帧消息转发给A：[固定帧头, JPEG]（与C的帧格式相同），JPEG不装入字典、不经过pickle
+        header = VIDEO_FRAME_HEADER.pack(data_dict.get("timestamp", time.time()), len(video_bytes))
+        try:
+            socket_to_a.send_multipart([header, video_bytes], zmq.DONTWAIT, copy=False)
+        except zmq.Again:
+            # 发送队列已满（A跟不上），降低重新编码质量
+            update_forward_quality(False)
+            print("[数据 B→A] ⚠️ 发送队列已满，丢弃本帧")
+            return
+        update_forward_quality(True)
+        print(f"[数据 B→A] 视频已转发给 A，大小: {len(video_bytes)} bytes")
+    else:
+        print("[数据 B→A] ⚠️ 无法提取视频数据，跳过转发")
+
+
+def thread_forwarder(lerobot_handler: LeRobotDataHandler = None):
+    """
+    转发线程：单线程 + zmq.Poller 同时处理两路数据（无需两个线程各自超时轮询、来回切换GIL）
+      - A 的控制命令 → C
+      - C 推送的数据（视频/机器人数据）→ 保存LeRobot + 视频转发给A
+    反向模式：C 主动连接 B；支持 A / C 断开重连，自动恢复
     """
     context = None
     socket_from_a = None
     socket_to_c = None
+    socket_from_c = None
+    socket_to_a = None
+    poller = None
     
-    while True:
+    while not stop_event.is_set():
         try:
             if context is None:
-                context = zmq.Context()
+                context = zmq.Context.instance()  # 各线程共享进程内唯一的上下文
             
             # 接收来自 A 的控制命令 (PULL socket)
             if socket_from_a is None:
                 socket_from_a = context.socket(zmq.PULL)
-                socket_from_a.setsockopt(zmq.RCVTIMEO, 1000)  # 1秒超时
                 socket_from_a.bind(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_FOR_A_COMMAND}")
-                print(f"[线程1-命令] 监听 A 的命令: *:{SERVER_B_PORT_FOR_A_COMMAND}")
+                print(f"[命令] 监听 A 的命令: *:{SERVER_B_PORT_FOR_A_COMMAND}")
+                poller = None
             
             # 等待 C 主动连接并接收命令 (PUSH socket - B 推送给 C)
             if socket_to_c is None:
                 socket_to_c = context.socket(zmq.PUSH)
                 socket_to_c.bind(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_FOR_C_COMMAND}")
-                print(f"[线程1-命令] 等待 C 连接: *:{SERVER_B_PORT_FOR_C_COMMAND}")
-            
-            # 接收 A 的命令（带超时）
-            try:
-                message = socket_from_a.recv()
-            except zmq.Again:
-                continue
-            
-            command = TorchSerializer.from_bytes(message)
-            print(f"\n[线程1 A→C] 收到控制命令: {command}")
-            
-            # 转发给 C（如果 C 已连接）
-            try:
-                socket_to_c.send(TorchSerializer.to_bytes(command), zmq.NOBLOCK)
-                print(f"[线程1 A→C] 命令已转发给 C")
-            except zmq.Again:
-                print(f"[线程1 A→C] ⚠️ C 未连接，命令已丢弃")
-            
-        except zmq.ZMQError as e:
-            print(f"[线程1-命令] ZMQ 错误: {e}")
-            if socket_from_a:
-                try:
-                    socket_from_a.close()
-                except:
-                    pass
-                socket_from_a = None
-            time.sleep(1)
-            
-        except Exception as e:
-            print(f"[线程1-命令] 错误: {e}")
-            import traceback
-            traceback.print_exc()
-            time.sleep(1)
-
-
-def thread_data_handler(lerobot_handler: LeRobotDataHandler):
-    """
-    线程2：处理数据流 (C -> B -> A)
-    反向模式：C 主动连接 B 并推送数据
-    功能：
-    1. 接收来自C的JSON数据（包含视频和机器人数据）
-    2. 转换为lerobot格式并保存
-    3. 提取视频并转发给A
-    支持 C 断开重连，自动恢复
-    """
-    context = None
-    socket_from_c = None
-    socket_to_a = None
-    
-    while True:
-        try:
-            if context is None:
-                context = zmq.Context()
+                bind_local_ipc(socket_to_c, SERVER_B_PORT_FOR_C_COMMAND)
+                print(f"[命令] 等待 C 连接: *:{SERVER_B_PORT_FOR_C_COMMAND}")
             
             # 等待 C 主动连接并推送数据 (PULL socket - B 接收)
             if socket_from_c is None:
                 socket_from_c = context.socket(zmq.PULL)
-                socket_from_c.setsockopt(zmq.RCVTIMEO, 1000)  # 1秒超时
+                socket_from_c.setsockopt(zmq.RCVHWM, 1)  # 只保留最新帧（多帧消息不能用CONFLATE）
+                socket_from_c.setsockopt(zmq.RCVBUF, 8192)  # 小接收缓冲，避免TCP层积压旧帧
                 socket_from_c.bind(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_FOR_C_DATA}")
-                print(f"[线程2-数据] 等待 C 连接并推送数据: *:{SERVER_B_PORT_FOR_C_DATA}")
+                bind_local_ipc(socket_from_c, SERVER_B_PORT_FOR_C_DATA)
+                print(f"[数据] 等待 C 连接并推送数据: *:{SERVER_B_PORT_FOR_C_DATA}")
+                poller = None
             
             # 向 A 推送视频流 (PUB socket)
             if socket_to_a is None:
@@ -418,62 +608,43 @@ def thread_data_handler(lerobot_handler: LeRobotDataHandler):
                 socket_to_a.setsockopt(zmq.SNDHWM, 1)  # 只保留最新1帧
                 socket_to_a.setsockopt(zmq.LINGER, 0)  # 立即丢弃
                 socket_to_a.bind(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_FOR_A_VIDEO}")
-                print(f"[线程2-数据] 向 A 发布视频: *:{SERVER_B_PORT_FOR_A_VIDEO}")
+                print(f"[数据] 向 A 发布视频: *:{SERVER_B_PORT_FOR_A_VIDEO}")
             
-            # 接收 C 推送的数据（带超时）
-            try:
-                raw_data = socket_from_c.recv()
-                
-                # 解析数据
-                data_dict = parse_json_data(raw_data)
-                if data_dict is None:
-                    print("[线程2-数据] ⚠️ 数据解析失败，跳过")
-                    continue
-                
-                # 打印接收到的数据信息（降低频率）
-                data_size = len(raw_data) if isinstance(raw_data, bytes) else 0
-                has_image = "image" in data_dict or "camera_1.rgb" in data_dict
-                has_state = "state" in data_dict or "observation.state" in data_dict
-                has_action = "action" in data_dict
-                print(f"[线程2 C→B] 收到数据，大小: {data_size} bytes, "
-                      f"包含: 图像={has_image}, 状态={has_state}, 动作={has_action}")
-                
-                # 保存到LeRobot数据集
-                if lerobot_handler is not None:
-                    lerobot_handler.add_frame(data_dict)
-                
-                # 提取视频并转发给A
-                video_bytes = extract_video_for_forwarding(data_dict)
-                if video_bytes:
-                    # 准备转发给A的数据格式（保持与A的兼容性）
-                    video_frame = {
-                        "image": video_bytes,
-                        "encoding": "jpeg",
-                        "timestamp": data_dict.get("timestamp", time.time()),
-                        "resolution": data_dict.get("resolution", "640x480"),
-                        "frame_count": data_dict.get("frame_count", 0),
-                    }
-                    socket_to_a.send(TorchSerializer.to_bytes(video_frame))
-                    print(f"[线程2 B→A] 视频已转发给 A，大小: {len(video_bytes)} bytes")
-                else:
-                    print("[线程2 B→A] ⚠️ 无法提取视频数据，跳过转发")
-                    
-            except zmq.Again:
-                # 超时，继续循环检查（C 可能未连接）
-                continue
+            # 接收socket重建后重新注册
+            if poller is None:
+                poller = zmq.Poller()
+                poller.register(socket_from_a, zmq.POLLIN)
+                poller.register(socket_from_c, zmq.POLLIN)
+            
+            # 等待任一路数据（1秒超时；A / C 可能未连接）
+            socks = dict(poller.poll(1000))
+            
+            if socket_from_a in socks:
+                handle_command(socket_from_a.recv(zmq.NOBLOCK), socket_to_c)
             
+            if socket_from_c in socks:
+                # copy=False：各帧以zmq.Frame交付，JPEG以memoryview一路传给解码/转发，不拷贝成bytes
+                parts = socket_from_c.recv_multipart(zmq.NOBLOCK, copy=False)
+                handle_c_data(parts, socket_to_a, lerobot_handler)
+            
+        except zmq.Again:
+            continue
+        
         except zmq.ZMQError as e:
-            print(f"[线程2-数据] ZMQ 错误: {e}")
-            if socket_from_c:
-                try:
-                    socket_from_c.close()
-                except:
-                    pass
-                socket_from_c = None
+            print(f"[转发线程] ZMQ 错误: {e}")
+            for sock in (socket_from_a, socket_from_c):
+                if sock:
+                    try:
+                        sock.close()
+                    except:
+                        pass
+            socket_from_a = None
+            socket_from_c = None
+            poller = None
             time.sleep(1)
             
         except Exception as e:
-            print(f"[线程2-数据] 错误: {e}")
+            print(f"[转发线程] 错误: {e}")
             import traceback
             traceback.print_exc()
             time.sleep(1)
@@ -523,23 +694,23 @@ def run_server_b(repo_id: str = None, instruction: str = None, fps: int = None,
         lerobot_handler = None
         print("⚠️ LeRobot数据集保存功能已禁用")
     
-    # 启动线程1：命令处理
-    command_thread = threading.Thread(target=thread_command_handler, daemon=True)
-    command_thread.start()
-    
-    # 启动线程2：数据处理（包含视频转发和数据集保存）
-    data_thread = threading.Thread(target=thread_data_handler, args=(lerobot_handler,), daemon=True)
-    data_thread.start()
+    # 启动转发线程：命令 A→C 与 数据 C→B→A 由同一个Poller循环处理
+    forwarder_thread = threading.Thread(target=thread_forwarder, args=(lerobot_handler,), daemon=True)
+    forwarder_thread.start()
     
-    print("\n两个线程已启动，等待 C 连接...")
+    print("\n转发线程已启动，等待 C 连接...")
     print("按 Ctrl+C 停止服务器\n")
     
     try:
         # 保持主线程运行
-        command_thread.join()
-        data_thread.join()
+        forwarder_thread.join()
     except KeyboardInterrupt:
         print("\n\n服务器 B 正在关闭...")
+        # 先停止接收（转发线程最多1秒内退出），再停止写入线程，最后保存，避免保存时仍在 add_frame
+        stop_event.set()
+        forwarder_thread.join()
+        if lerobot_handler:
+            lerobot_handler.close()
         if lerobot_handler and lerobot_handler.dataset and lerobot_handler.frame_count > 0:
             print("保存未完成的episode...")
             try:
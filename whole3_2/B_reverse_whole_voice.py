@@ -5,10 +5,13 @@
 # 3. 将数据转换为lerobot格式并保存到本地
 # 4. 同时将视频和音频转发给A
 # 5. 音频格式：Opus编码（16kHz, 单声道, 24kbps）
+import os
 import json
 import threading
+import queue
 import time
 import pickle
+import struct
 import zmq
 import cv2
 import numpy as np
@@ -25,6 +28,15 @@ except ImportError:
     print("请安装: pip install lerobot")
     LeRobotDataset = None
 
+# 可选：libjpeg-turbo（SIMD加速的JPEG编解码，可直接按RGB解码/编码），未安装时回退到OpenCV
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    _tj = TurboJPEG()
+    TURBOJPEG_AVAILABLE = True
+except (ImportError, OSError, RuntimeError):
+    _tj = None
+    TURBOJPEG_AVAILABLE = False
+
 # --- 配置 ---
 # B 监听的端口 (给 A 接收控制命令)
 SERVER_B_HOST = "0.0.0.0"
@@ -42,13 +54,31 @@ SERVER_B_PORT_FOR_C_DATA = 5558
 # B 监听的端口 (让 C 主动连接 - 音频数据流，独立端口)
 SERVER_B_PORT_FOR_C_AUDIO = 5559
 
+# 同机ipc端点（B在绑定TCP端口的同时也绑定这些路径；C可通过环境变量 ZMQ_C_*_EP 改连ipc）
+C_IPC_ENDPOINT = "ipc:///tmp/imu_rs485_b_{port}"
+
 # B 发布端口 (向 A 发送音频，独立端口)
 SERVER_B_PORT_TO_A_AUDIO = 5561
 
+# 进程内音频通道：C 随视频帧合并发送的音频，由数据线程经此交给音频线程转发给 A
+AUDIO_INPROC_ENDPOINT = "inproc://c-audio"
+
+# C端原始音频消息 [编码名, Opus数据] 的首帧（旧版C每条音频为单帧pickle字典）
+AUDIO_CODEC_NAME = b"opus"
+
+# C 视频帧头（与 C_real_video_audio_*.py 一致）：时间戳(float64) + JPEG长度(uint32)
+VIDEO_FRAME_HEADER = struct.Struct("<dI")
+
 # LeRobot数据集配置
 DEFAULT_REPO_ID = "real_robot_online_data"
 DEFAULT_INSTRUCTION = "Real robot teleoperation data collection"
 DEFAULT_FPS = 30
+LEROBOT_ROW_BLOCK = 64  # state/action行缓冲块：每块分配一次，逐帧就地填入一行
+LEROBOT_WRITE_QUEUE_SIZE = 64  # 数据集后台写入队列长度（满时丢弃新帧，不阻塞接收线程）
+_WRITER_STOP = object()  # 写入队列的结束标记：后台写入线程取到后退出
+
+# 关闭时先置位：接收数据的线程退出循环，不再向写入队列提交新帧
+stop_event = threading.Event()
 DEFAULT_HF_LEROBOT_HOME = Path("real_robot_data")
 # ------------
 
@@ -64,6 +94,29 @@ class TorchSerializer:
         return pickle.loads(data)
 
 
+# OpenCV >= 4.10 可直接解码为RGB；旧版本为None，解码为BGR后再转换
+IMREAD_COLOR_RGB = getattr(cv2, "IMREAD_COLOR_RGB", None)
+
+
+def decode_jpeg_rgb(data: bytes):
+    """
+    将JPEG直接解码为RGB图像（LeRobot使用RGB），失败时返回None
+    优先TurboJPEG按RGB输出（颜色空间转换在libjpeg-turbo内部完成，无需cvtColor）
+    """
+    if TURBOJPEG_AVAILABLE:
+        try:
+            return _tj.decode(data, pixel_format=TJPF_RGB)
+        except (OSError, ValueError):
+            return None
+    nparr = np.frombuffer(data, np.uint8)
+    if IMREAD_COLOR_RGB is not None:
+        return cv2.imdecode(nparr, IMREAD_COLOR_RGB)
+    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if image is not None:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return image
+
+
 class LeRobotDataHandler:
     """
     处理LeRobot数据集保存的类
@@ -143,6 +196,55 @@ class LeRobotDataHandler:
         )
         print("✅ LeRobot数据集已初始化，准备接收数据")
         self.frame_count = 0
+        
+        # 预分配的float32行缓冲块（数据集持有已写入行的引用，写满后换新块而不是覆盖）
+        self._state_rows = np.empty((LEROBOT_ROW_BLOCK, state_dim), dtype=np.float32)
+        self._action_rows = np.empty((LEROBOT_ROW_BLOCK, action_dim), dtype=np.float32)
+        self._row = 0
+        
+        # 后台写入线程：接收线程只把数据放入队列，图像解码与dataset.add_frame在此线程按顺序完成
+        self._write_queue = queue.Queue(maxsize=LEROBOT_WRITE_QUEUE_SIZE)
+        self.dropped_count = 0
+        self._writer_thread = threading.Thread(target=self._drain_writes, daemon=True)
+        self._writer_thread.start()
+    
+    def add_frame(self, data_dict: dict):
+        """将一帧数据放入后台写入队列（不阻塞调用方；队列满时丢弃该帧并提示）"""
+        if self.dataset is None:
+            return
+        try:
+            self._write_queue.put_nowait(data_dict)
+        except queue.Full:
+            self.dropped_count += 1
+            if self.dropped_count % 100 == 1:
+                print(f"⚠️ 数据集写入跟不上，已丢弃 {self.dropped_count} 帧")
+    
+    def _drain_writes(self):
+        """后台写入线程：按到达顺序取出帧写入数据集"""
+        while True:
+            data_dict = self._write_queue.get()
+            if data_dict is _WRITER_STOP:
+                return
+            self._write_frame(data_dict)
+    
+    def close(self):
+        """
+        停止后台写入线程：放入结束标记，等队列中已提交的帧全部写入后线程退出
+        须在接收线程停止后调用，之后才能安全地 save_episode
+        """
+        if self.dataset is not None:
+            self._write_queue.put(_WRITER_STOP)
+            self._writer_thread.join()
+    
+    def _next_rows(self):
+        """取下一行state/action输出缓冲（当前块写满时分配新块）"""
+        if self._row == LEROBOT_ROW_BLOCK:
+            self._state_rows = np.empty_like(self._state_rows)
+            self._action_rows = np.empty_like(self._action_rows)
+            self._row = 0
+        row = self._row
+        self._row += 1
+        return self._state_rows[row], self._action_rows[row]
     
     def _save_episode_async(self):
         """
@@ -160,9 +262,9 @@ class LeRobotDataHandler:
             traceback.print_exc()
 
     # TODO: 支持更多相机数据
-    def add_frame(self, data_dict: dict):
+    def _write_frame(self, data_dict: dict):
         """
-        添加一帧数据到数据集
+        添加一帧数据到数据集（在后台写入线程中执行）
         
         Args:
             data_dict: 包含以下字段的字典:
@@ -183,20 +285,14 @@ class LeRobotDataHandler:
                 return
             
             # 如果图像是bytes（JPEG编码），需要解码
+            # 直接解码为RGB（LeRobot使用RGB）；单摄像头复用时两路为同一份JPEG，只解码一次
             if isinstance(image_left_wrist, bytes):
-                nparr = np.frombuffer(image_left_wrist, np.uint8)
-                image_left_wrist = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-                # BGR转RGB（OpenCV使用BGR，但LeRobot通常使用RGB）
-                if len(image_left_wrist.shape) == 3 and image_left_wrist.shape[2] == 3:
-                    image_left_wrist = cv2.cvtColor(image_left_wrist, cv2.COLOR_BGR2RGB)
+                same_jpeg = image_top is image_left_wrist
+                image_left_wrist = decode_jpeg_rgb(image_left_wrist)
+                if same_jpeg:
+                    image_top = image_left_wrist
             if isinstance(image_top, bytes):
-                nparr = np.frombuffer(image_top, np.uint8)
-                image_top = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-                # BGR转RGB
-                if len(image_top.shape) == 3 and image_top.shape[2] == 3:
-                    image_top = cv2.cvtColor(image_top, cv2.COLOR_BGR2RGB)
+                image_top = decode_jpeg_rgb(image_top)
             
             # 确保图像是numpy array
             if not isinstance(image_left_wrist, np.ndarray):
@@ -207,26 +303,26 @@ class LeRobotDataHandler:
                 return
             
             # 处理状态数据（支持多种字段名）
-            state = data_dict.get("state") or data_dict.get("observation.state")
+            # 注意：不能用 `a or b`，state为numpy数组时真值判断会抛异常
+            state = data_dict.get("state")
+            if state is None:
+                state = data_dict.get("observation.state")
             if state is None:
                 print("⚠️ 警告: 数据中缺少state字段，跳过该帧")
                 return            
-            if not isinstance(state, np.ndarray):
-                state = np.array(state, dtype=np.float32)
-            else:
-                state = state.astype(np.float32)
+            # 就地写入预分配的float32行（list或任意dtype数组均在赋值时转换，无需额外分配）
+            state_out, action_out = self._next_rows()
+            state_out[:] = state
             
             # 处理动作数据
             action = data_dict.get("action")
             if action is None:
                 # 如果没有action，可以使用state作为action（某些情况下）
-                action = state.copy()
+                action_out = state_out  # 只读使用，无需拷贝
                 print("⚠️ 警告: 数据中缺少action字段，使用state作为action")
-            
-            if not isinstance(action, np.ndarray):
-                action = np.array(action, dtype=np.float32)
             else:
-                action = action.astype(np.float32)
+                action_out[:] = action
+            state, action = state_out, action_out
             
             task = data_dict.get("instruction")
 
@@ -262,17 +358,19 @@ class LeRobotDataHandler:
 
     def shutdown(self):
         """
-        安全关闭，保存任何未完成的episode并关闭线程池
+        安全关闭（须在数据线程停止后调用）：写完队列中的帧并停止写入线程，
+        等待已提交的episode保存完成，最后保存未完成的episode
         """
-        if self.dataset and self.frame_count > 0:
-            print("\n程序关闭中，保存最后一个未完成的episode...")
-            # 直接调用，因为程序马上要退出
-            self._save_episode_async()
-        
+        self.close()
         if hasattr(self, 'executor'):
             print("关闭后台保存线程池...")
             self.executor.shutdown(wait=True)
             print("线程池已关闭。")
+        
+        if self.dataset and self.frame_count > 0:
+            print("\n程序关闭中，保存最后一个未完成的episode...")
+            # 直接调用，因为程序马上要退出
+            self._save_episode_async()
 
 
 def parse_json_data(raw_data):
@@ -299,17 +397,18 @@ def parse_json_data(raw_data):
     if isinstance(raw_data, dict):
         return raw_data
     
-    # 如果是bytes，先尝试pickle反序列化（最常见的情况）
+    # 如果是bytes，按首字节分派：pickle协议2+以PROTO操作码0x80开头（合法JSON不可能以该字节开头），
+    # 直接pickle解码（最常见的情况，C使用pickle），其余按JSON解析，不再“先试pickle失败再试JSON”
     if isinstance(raw_data, bytes):
-        try:
-            # 先尝试pickle（C_real_video_reverse.py使用pickle）
-            data = pickle.loads(raw_data)
-            if isinstance(data, dict):
-                return data
-        except Exception as e:
-            pass
+        if raw_data[:1] == b'\x80':
+            try:
+                data = pickle.loads(raw_data)
+            except Exception as e:
+                print(f"⚠️ pickle数据解析失败: {e}")
+                return None
+            return data if isinstance(data, dict) else None
         
-        # 如果pickle失败，尝试JSON
+        # 非pickle数据，按JSON解析
         try:
             json_str = raw_data.decode('utf-8')
             data = json.loads(json_str)
@@ -338,7 +437,7 @@ def extract_video_for_forwarding(data_dict: dict, camera_key: str) -> bytes:
         data_dict: 包含视频数据的字典（支持多种字段名）
         
     Returns:
-        bytes: 视频帧的字节数据（JPEG编码），如果提取失败返回None
+        bytes/memoryview: 视频帧的JPEG数据（可直接用于send_multipart），如果提取失败返回None
     """
     # 支持多种字段名
     image = data_dict.get(f"image.{camera_key}")
@@ -346,8 +445,16 @@ def extract_video_for_forwarding(data_dict: dict, camera_key: str) -> bytes:
     if image is None:
         return None
     
+    # 常见情况：C已发送JPEG数据（bytes或零拷贝memoryview），原样转发，不做任何图像处理
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return image
+    
     # 如果图像是numpy array，需要编码为JPEG
     if isinstance(image, np.ndarray):
+        # TurboJPEG直接按RGB像素格式编码（通常LeRobot使用RGB），省去RGB→BGR转换
+        if TURBOJPEG_AVAILABLE and image.ndim == 3 and image.shape[2] == 3:
+            return _tj.encode(image, quality=80, pixel_format=TJPF_RGB)
+        
         # 如果是RGB，转换为BGR（OpenCV使用BGR）
         if len(image.shape) == 3 and image.shape[2] == 3:
             # 检查是否是RGB（通常LeRobot使用RGB）
@@ -365,18 +472,43 @@ def extract_video_for_forwarding(data_dict: dict, camera_key: str) -> bytes:
         encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 80]
         result, encoded_frame = cv2.imencode('.jpg', image_bgr, encode_param)
         if result:
-            return encoded_frame.tobytes()
+            return encoded_frame.data  # imencode缓冲区的memoryview，省去tobytes拷贝
         else:
             print("⚠️ 图像编码失败")
             return None
     
-    # 如果已经是bytes，直接返回
-    if isinstance(image, bytes):
-        return image
-    
     return None
 
 
+def bind_endpoint(sock, endpoint: str):
+    """
+    绑定ZMQ端点；ipc:// 端点创建的套接字文件仅当前用户可访问（0600）
+    绑定期间临时收紧umask，避免文件先以默认权限创建再chmod的竞争窗口
+    """
+    if endpoint.startswith("ipc://"):
+        old_umask = os.umask(0o077)
+        try:
+            sock.bind(endpoint)
+        finally:
+            os.umask(old_umask)
+    else:
+        sock.bind(endpoint)
+
+
+def bind_local_ipc(sock, port: int):
+    """
+    在TCP端口之外再绑定同机ipc端点（C与B同机时可改连ipc，跳过TCP协议栈）；平台不支持ipc时忽略
+    ipc只是可选的加速路径：绑定失败（如/tmp下残留其他用户的套接字文件）时只打印警告，不影响TCP服务
+    """
+    if not zmq.has("ipc"):
+        return
+    endpoint = C_IPC_ENDPOINT.format(port=port)
+    try:
+        bind_endpoint(sock, endpoint)
+    except zmq.ZMQError as e:
+        print(f"⚠️ 绑定ipc端点失败（仅TCP可用）: {endpoint}: {e}")
+
+
 def thread_command_handler():
     """
     线程1：处理控制命令流 (A -> B -> C)
@@ -390,7 +522,7 @@ def thread_command_handler():
     while True:
         try:
             if context is None:
-                context = zmq.Context()
+                context = zmq.Context.instance()  # 各线程共享进程内唯一的上下文
             
             # 接收来自 A 的控制命令 (PULL socket)
             if socket_from_a is None:
@@ -403,6 +535,7 @@ def thread_command_handler():
             if socket_to_c is None:
                 socket_to_c = context.socket(zmq.PUSH)
                 socket_to_c.bind(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_FOR_C_COMMAND}")
+                bind_local_ipc(socket_to_c, SERVER_B_PORT_FOR_C_COMMAND)
                 print(f"[线程1-命令] 等待 C 连接: *:{SERVER_B_PORT_FOR_C_COMMAND}")
             
             # 接收 A 的命令（带超时）
@@ -416,7 +549,8 @@ def thread_command_handler():
             
             # 转发给 C（如果 C 已连接）
             try:
-                socket_to_c.send(TorchSerializer.to_bytes(command), zmq.NOBLOCK)
+                # 原样转发A的pickle字节（C端用同样的pickle解码），无需重新序列化
+                socket_to_c.send(message, zmq.NOBLOCK)
                 print(f"[线程1 A→C] 命令已转发给 C")
             except zmq.Again:
                 print(f"[线程1 A→C] ⚠️ C 未连接，命令已丢弃")
@@ -447,11 +581,13 @@ def thread_audio_handler():
     2. 直接转发给 A (端口 5561)
     支持 C 和 A 断开重连，自动恢复
     """
-    context = zmq.Context()
+    context = zmq.Context.instance()  # 各线程共享进程内唯一的上下文
     
     # 接收来自 C 的音频（PULL模式）
     socket_from_c = context.socket(zmq.PULL)
     socket_from_c.bind(f"tcp://*:{SERVER_B_PORT_FOR_C_AUDIO}")
+    bind_local_ipc(socket_from_c, SERVER_B_PORT_FOR_C_AUDIO)
+    socket_from_c.bind(AUDIO_INPROC_ENDPOINT)  # 同时接收数据线程拆出的音频帧（同一PULL公平接收）
     socket_from_c.setsockopt(zmq.RCVHWM, 100)  # 高水位标记
     socket_from_c.setsockopt(zmq.LINGER, 0)
     
@@ -475,12 +611,11 @@ def thread_audio_handler():
     try:
         while True:
             try:
-                # 接收来自 C 的音频数据
-                audio_data = socket_from_c.recv()
+                # 接收来自 C 的音频消息（[编码名, Opus数据]、合并发送的多组 [编码名, Opus数据] 或旧版单帧pickle），按整条消息原样转发给 A
+                audio_parts = socket_from_c.recv_multipart(copy=False)
                 received_count += 1
                 
-                # 直接转发给 A
-                socket_to_a.send(audio_data)
+                socket_to_a.send_multipart(audio_parts, copy=False)
                 forwarded_count += 1
                 
                 # 统计信息
@@ -488,7 +623,7 @@ def thread_audio_handler():
                     elapsed = time.time() - start_time
                     fps = 100 / elapsed if elapsed > 0 else 0
                     print(f"[线程2-音频] 已转发 {forwarded_count} 帧, FPS: {fps:.1f}, "
-                          f"大小: {len(audio_data)} bytes")
+                          f"大小: {len(audio_parts[-1])} bytes")
                     start_time = time.time()
                     
             except zmq.Again:
@@ -503,8 +638,7 @@ def thread_audio_handler():
         traceback.print_exc()
     finally:
         socket_from_c.close()
-        socket_to_a.close()
-        context.term()
+        socket_to_a.close()  # 共享上下文不在线程内term
         print("[线程2-音频] 已关闭")
 
 
@@ -521,11 +655,19 @@ def thread_data_handler(lerobot_handler: LeRobotDataHandler):
     context = None
     socket_from_c = None
     socket_to_a = None
+    audio_out = None
     
-    while True:
+    while not stop_event.is_set():
         try:
             if context is None:
-                context = zmq.Context()
+                context = zmq.Context.instance()  # 各线程共享进程内唯一的上下文
+            
+            # 随视频帧附带的音频帧交给音频线程（inproc，不跨线程共用socket）
+            if audio_out is None:
+                audio_out = context.socket(zmq.PUSH)
+                audio_out.setsockopt(zmq.SNDHWM, 100)
+                audio_out.setsockopt(zmq.LINGER, 0)
+                audio_out.connect(AUDIO_INPROC_ENDPOINT)
             
             # 等待 C 主动连接并推送数据 (PULL socket - B 接收)
             if socket_from_c is None:
@@ -533,6 +675,7 @@ def thread_data_handler(lerobot_handler: LeRobotDataHandler):
                 print(socket_from_c)
                 socket_from_c.setsockopt(zmq.RCVTIMEO, 1000)  # 1秒超时
                 socket_from_c.bind(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_FOR_C_DATA}")
+                bind_local_ipc(socket_from_c, SERVER_B_PORT_FOR_C_DATA)
                 print(f"[线程2-数据] 等待 C 连接并推送数据: *:{SERVER_B_PORT_FOR_C_DATA}")
             
             # 向 A 推送视频流 (PUB socket)
@@ -545,16 +688,41 @@ def thread_data_handler(lerobot_handler: LeRobotDataHandler):
             
             # 接收 C 推送的数据（带超时）
             try:
-                raw_data = socket_from_c.recv()
+                parts = socket_from_c.recv_multipart()
+                raw_data = parts[0]
                 
-                # 解析数据
-                data_dict = parse_json_data(raw_data)
+                # 解析数据：[固定帧头, JPEG, 音频帧...]（单摄像头复用为 left_wrist 和 top），
+                # 或 [pickle协议5元数据, 带外缓冲...]（旧版 C_real_video_audio.py，image_keys 列出共用 image_data 的字段），
+                # 单帧为原有pickle/JSON格式
+                if len(parts) >= 2 and len(raw_data) == VIDEO_FRAME_HEADER.size:
+                    capture_time, jpeg_size = VIDEO_FRAME_HEADER.unpack(raw_data)
+                    # 附带的音频交给音频线程转发给 A：原始格式每两帧 [编码名, Opus数据] 为一条，旧版每帧一条
+                    audio_parts = parts[2:]
+                    step = 2 if audio_parts[:1] == [AUDIO_CODEC_NAME] else 1
+                    for i in range(0, len(audio_parts), step):
+                        try:
+                            audio_out.send_multipart(audio_parts[i:i + step], zmq.NOBLOCK)
+                        except zmq.Again:
+                            pass
+                    data_dict = {
+                        "image.left_wrist": parts[1],
+                        "image.top": parts[1],
+                        "timestamp": capture_time,
+                    }
+                elif len(parts) > 1 and raw_data[:1] == b'\x80':
+                    data_dict = pickle.loads(raw_data, buffers=parts[1:])
+                else:
+                    data_dict = parse_json_data(raw_data)
+                if data_dict is not None and "image_keys" in data_dict:
+                    image = data_dict.pop("image_data")
+                    for key in data_dict.pop("image_keys"):
+                        data_dict[key] = image
                 if data_dict is None:
                     print("[线程2-数据] ⚠️ 数据解析失败，跳过")
                     continue
                 
                 # 打印接收到的数据信息（降低频率）
-                data_size = len(raw_data) if isinstance(raw_data, bytes) else 0
+                data_size = sum(len(part) for part in parts)
                 has_image = "image.left_wrist" in data_dict or "image.top" in data_dict
                 has_state = "state" in data_dict or "observation.state" in data_dict
                 has_action = "action" in data_dict
@@ -570,10 +738,9 @@ def thread_data_handler(lerobot_handler: LeRobotDataHandler):
                 video_top = extract_video_for_forwarding(data_dict, camera_key="top")
 
                 if video_left_wrist and video_top:
-                    # 准备转发给A的数据格式（保持与A的兼容性）
-                    video_frame = {
-                        "image.left_wrist": video_left_wrist,
-                        "image.top": video_top,
+                    # 多帧格式转发给A：[JSON头, 左腕JPEG, 顶部JPEG]，两路为同一JPEG时为 [JSON头(aliases), JPEG]
+                    # JPEG原样作为独立帧发送，A端无需pickle反序列化
+                    video_header = {
                         "encoding": "jpeg",
                         "timestamp": data_dict.get("timestamp", time.time()),
                         "resolution": data_dict.get("resolution", "640x480"),
@@ -581,10 +748,16 @@ def thread_data_handler(lerobot_handler: LeRobotDataHandler):
                     }
                     
                     # 音频已由独立线程处理，这里只转发视频
-                    socket_to_a.send(TorchSerializer.to_bytes(video_frame))
+                    if video_top is video_left_wrist:
+                        # 单摄像头复用同一份JPEG：只发送一次，由帧头 aliases 指明它同时作为哪些字段（A端按别名复用）
+                        video_header["aliases"] = ["image.left_wrist", "image.top"]
+                        video_frames = [json.dumps(video_header).encode('utf-8'), video_left_wrist]
+                    else:
+                        video_frames = [json.dumps(video_header).encode('utf-8'), video_left_wrist, video_top]
+                    socket_to_a.send_multipart(video_frames, copy=False)
                     
                     # 统计信息
-                    video_size = len(video_left_wrist) + len(video_top)
+                    video_size = sum(len(frame) for frame in video_frames[1:])
                     print(f"[线程3-视频 B→A] 视频已转发: {video_size} bytes")
                 else:
                     print("[线程2 B→A] ⚠️ 无法提取视频数据，跳过转发")
@@ -679,6 +852,9 @@ def run_server_b(repo_id: str = None, instruction: str = None, fps: int = None,
         data_thread.join()
     except KeyboardInterrupt:
         print("\n\n服务器 B 正在关闭...")
+        # 先停止数据线程（接收超时1秒内退出），不再提交新帧，再关闭写入线程并保存
+        stop_event.set()
+        data_thread.join()
         if lerobot_handler:
             lerobot_handler.shutdown()
         print("服务器 B 已关闭。")
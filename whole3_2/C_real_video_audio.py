@@ -4,14 +4,16 @@
 # 2. 麦克风音频采集，使用 Opus 编码（低延迟、高压缩比）
 # 3. 通过 ZMQ 发送视频+音频到 B 端
 
+import os
 import time
 import threading
+import queue
 from datetime import datetime
 from zmq_base import TorchSerializer
 import zmq
 import cv2
 import numpy as np
-import pickle
+import struct
 
 try:
     import sounddevice as sd
@@ -21,18 +23,26 @@ except ImportError:
     print("安装方法: pip install sounddevice")
     AUDIO_AVAILABLE = False
 
-try:
-    import opuslib
-    OPUS_AVAILABLE = True
-except ImportError:
+# Opus 编码器：优先 cffi 直接调用 libopus，否则使用 opuslib（见 opus_encoder.py）
+from opus_encoder import create_opus_encoder, OPUS_AVAILABLE
+if not OPUS_AVAILABLE:
     print("⚠️ opuslib 未安装，音频功能将被禁用")
     print("安装方法: pip install opuslib")
-    OPUS_AVAILABLE = False
+
+# 可选：libjpeg-turbo（SIMD加速的色彩转换/DCT，比cv2.imencode快2-4倍），未安装时回退到cv2.imencode
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TURBOJPEG_AVAILABLE = False
 
 # --- 服务器配置 ---
 SERVER_B_HOST = "localhost"
 SERVER_B_PORT_COMMAND = 5556  # 接收命令
 SERVER_B_PORT_DATA = 5558     # 发送视频+音频数据
+# ZMQ端点（可用环境变量覆盖；与B在同一台机器时可设为 ipc:///tmp/imu_rs485_b_<端口>，B端已同时绑定）
+ENDPOINT_COMMAND = os.environ.get("ZMQ_C_COMMAND_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+ENDPOINT_DATA = os.environ.get("ZMQ_C_DATA_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_DATA}")
 
 # --- 摄像头配置 ---
 CAMERA_ID = 0
@@ -42,6 +52,23 @@ VIDEO_HEIGHT = 180
 JPEG_QUALITY = 30
 FRAME_SKIP = 1
 ENABLE_OSD = False
+# 摄像头输出MJPG时关闭OpenCV的解码，直接转发原始JPEG码流，省去每帧的JPEG编码（画质/分辨率由摄像头决定）；
+# 后端不支持时read()照常返回BGR图像，回退到JPEG编码
+USE_RAW_MJPEG = True
+
+# 静止画面跳过编码：按 STATIC_DIFF_STRIDE 降采样后与上次编码的帧比较平均绝对差，低于阈值时复用上次的JPEG；
+# 静止期间每 STATIC_KEEPALIVE_FRAMES 帧仍发送一次，保持B/A端画面和时间戳刷新
+SKIP_STATIC_FRAMES = True
+STATIC_DIFF_STRIDE = 8
+STATIC_DIFF_THRESHOLD = 2.0  # 平均每个采样值的差（0-255）
+STATIC_KEEPALIVE_FRAMES = 8
+
+# 视频帧头：采集时间戳(float64) + JPEG长度(uint32)，小端，共12字节（与 C_real_video_audio_fixed.py 一致）
+# 每帧以多帧消息发送：[帧头, JPEG, 编码名0, 音频0, 编码名1, 音频1, ...]，不经过pickle（B端按两帧一组把音频转发给A）
+VIDEO_FRAME_HEADER = struct.Struct("<dI")
+
+# 音频消息：[编码名, Opus数据] 两帧（A端 audio_receiver_thread 的原始帧格式，B端按消息原样转发）
+AUDIO_CODEC_NAME = b"opus"
 
 # --- 音频配置 ---
 AUDIO_SAMPLE_RATE = 16000      # 16kHz 采样率（语音质量足够）
@@ -50,7 +77,8 @@ AUDIO_CHUNK_SIZE = 960          # 每次读取 960 样本（60ms @ 16kHz）
 OPUS_BITRATE = 24000           # 24kbps 比特率（语音质量好）
 OPUS_FRAME_SIZE = 960          # Opus 帧大小（60ms @ 16kHz）
 OPUS_COMPLEXITY = 5            # 编码复杂度（0-10，5 为平衡）
-OPUS_APPLICATION = opuslib.APPLICATION_VOIP if OPUS_AVAILABLE else None  # VOIP 模式
+AUDIO_RING_SLOTS = 8            # PCM环形缓冲槽数（8 × 60ms），满时丢弃新到的块
+AUDIO_QUEUE_SIZE = 5            # 已编码音频帧队列长度，满时丢弃新帧
 
 # --- 全局状态 ---
 latest_command = {
@@ -58,34 +86,49 @@ latest_command = {
     "throttle": 0,
     "timestamp": time.time()
 }
+latest_command_raw = None  # 尚未解码的最新命令原始字节（命令线程只保存，读取时才反序列化）
 command_lock = threading.Lock()
 
-# 音频缓冲
-audio_buffer = []
-audio_lock = threading.Lock()
+# 音频缓冲：预分配的单生产者环形缓冲（每槽一块 AUDIO_CHUNK_SIZE 个 int16 样本）
+# 生产者（音频回调）只写 head，消费者只写 tail；CPython下int读写是原子的，回调中无需加锁、无内存分配
+audio_ring = np.zeros((AUDIO_RING_SLOTS, AUDIO_CHUNK_SIZE), dtype=np.int16)
+audio_ring_head = 0  # 已写入的块数（仅音频回调修改）
+audio_ring_tail = 0  # 已取出的块数（仅消费者修改）
+audio_ring_dropped = 0
+# 已编码音频：音频线程是环形缓冲唯一的消费者/编码者，Opus数据经此队列交给数据线程发送
+audio_encoded_queue = queue.Queue(maxsize=AUDIO_QUEUE_SIZE)
 audio_enabled = AUDIO_AVAILABLE and OPUS_AVAILABLE
 
 
+def get_latest_command():
+    """返回最新命令字典：只在读取时反序列化最新一条（命令线程不再逐条pickle解码，期间被覆盖的旧命令不解码）"""
+    global latest_command, latest_command_raw
+    with command_lock:
+        raw, latest_command_raw = latest_command_raw, None
+        if raw is not None:
+            latest_command = TorchSerializer.from_bytes(raw)
+        return latest_command
+
+
 def thread_receive_commands():
     """线程1：接收控制命令"""
-    global latest_command
+    global latest_command_raw
     
-    context = zmq.Context()
+    context = zmq.Context.instance()  # 各线程共享进程内唯一的上下文（一个libzmq I/O线程）
     socket = context.socket(zmq.PULL)
-    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+    socket.connect(ENDPOINT_COMMAND)
     
-    print(f"[命令线程] 已连接到 B: {SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+    print(f"[命令线程] 已连接到 B: {ENDPOINT_COMMAND}")
     print(f"[命令线程] 等待接收控制命令...")
     
     received_count = 0
     try:
         while True:
             raw_data = socket.recv()
-            command = TorchSerializer.from_bytes(raw_data)
             received_count += 1
             
             with command_lock:
-                latest_command = command
+                latest_command_raw = raw_data
             
             if received_count % 10 == 0:
                 print(f"[命令线程] 已接收 {received_count} 条命令")
@@ -93,8 +136,7 @@ def thread_receive_commands():
     except KeyboardInterrupt:
         pass
     finally:
-        socket.close()
-        context.term()
+        socket.close()  # 共享上下文不在线程内term
 
 
 def audio_callback(indata, frames, time_info, status):
@@ -110,9 +152,37 @@ def audio_callback(indata, frames, time_info, status):
     if status:
         print(f"[音频] 采集警告: {status}")
     
-    # 将音频数据添加到缓冲区
-    with audio_lock:
-        audio_buffer.append(indata.copy())
+    global audio_ring_head, audio_ring_dropped
+    
+    # 缓冲区满：丢弃新到的块（不改动tail，避免覆盖消费者正在读取的槽）
+    head = audio_ring_head
+    if head - audio_ring_tail >= AUDIO_RING_SLOTS:
+        audio_ring_dropped += 1
+        return
+    
+    # 直接拷入预分配的槽位，再发布head
+    np.copyto(audio_ring[head % AUDIO_RING_SLOTS], indata[:, 0])
+    audio_ring_head = head + 1
+
+
+def encode_next_audio_chunk(encoder):
+    """
+    从环形缓冲取出最旧的一块PCM并直接在槽位上进行Opus编码；缓冲为空时返回None
+    编码完成后才推进tail，保证编码期间该槽不会被音频回调覆盖（仅由音频线程调用）
+    """
+    global audio_ring_tail
+    tail = audio_ring_tail
+    if audio_ring_head == tail:
+        return None
+    try:
+        return encoder.encode(audio_ring[tail % AUDIO_RING_SLOTS], OPUS_FRAME_SIZE)
+    finally:
+        audio_ring_tail = tail + 1
+
+
+def pack_audio_frame(opus_data: bytes) -> list:
+    """组装音频消息：[编码名, Opus数据]，原始字节直接发送，不经过pickle"""
+    return [AUDIO_CODEC_NAME, opus_data]
 
 
 def thread_audio_capture():
@@ -127,13 +197,7 @@ def thread_audio_capture():
     
     # 创建 Opus 编码器
     try:
-        encoder = opuslib.Encoder(
-            fs=AUDIO_SAMPLE_RATE,
-            channels=AUDIO_CHANNELS,
-            application=OPUS_APPLICATION
-        )
-        encoder.bitrate = OPUS_BITRATE
-        encoder.complexity = OPUS_COMPLEXITY
+        encoder = create_opus_encoder(AUDIO_SAMPLE_RATE, AUDIO_CHANNELS, OPUS_BITRATE, OPUS_COMPLEXITY)
         print("[音频线程] ✅ Opus 编码器已创建")
     except Exception as e:
         print(f"[音频线程] ❌ 创建 Opus 编码器失败: {e}")
@@ -165,38 +229,36 @@ def thread_audio_capture():
         return
     
     encoded_count = 0
+    queue_dropped = 0
+    pcm_size = AUDIO_CHUNK_SIZE * audio_ring.itemsize
     try:
         while True:
-            # 从缓冲区获取音频数据
-            audio_chunk = None
-            with audio_lock:
-                if len(audio_buffer) > 0:
-                    audio_chunk = audio_buffer.pop(0)
+            # 从环形缓冲取出并编码（Opus 编码，输入为 int16 PCM）
+            try:
+                opus_data = encode_next_audio_chunk(encoder)
+            except Exception as e:
+                print(f"[音频线程] 编码失败: {e}")
+                continue
             
-            if audio_chunk is None:
+            if opus_data is None:
                 time.sleep(0.01)  # 10ms
                 continue
             
-            # 编码音频数据
+            encoded_count += 1
+            
+            # 交给数据线程随下一帧视频发送；队列满（数据线程停滞）时丢弃新帧
             try:
-                # 确保数据是连续的（Opus 要求）
-                pcm_data = np.ascontiguousarray(audio_chunk[:, 0] if audio_chunk.ndim > 1 else audio_chunk)
-                
-                # Opus 编码（输入为 int16 PCM）
-                opus_data = encoder.encode(pcm_data.tobytes(), OPUS_FRAME_SIZE)
-                
-                encoded_count += 1
-                
-                # 统计信息
-                if encoded_count % 50 == 0:
-                    compression_ratio = len(pcm_data.tobytes()) / len(opus_data)
-                    print(f"[音频线程] 已编码 {encoded_count} 帧, "
-                          f"PCM: {len(pcm_data.tobytes())} bytes → "
-                          f"Opus: {len(opus_data)} bytes (压缩比: {compression_ratio:.1f}x)")
-                
-            except Exception as e:
-                print(f"[音频线程] 编码失败: {e}")
-                continue
+                audio_encoded_queue.put_nowait(opus_data)
+            except queue.Full:
+                queue_dropped += 1
+            
+            # 统计信息
+            if encoded_count % 50 == 0:
+                compression_ratio = pcm_size / len(opus_data)
+                print(f"[音频线程] 已编码 {encoded_count} 帧, "
+                      f"PCM: {pcm_size} bytes → "
+                      f"Opus: {len(opus_data)} bytes (压缩比: {compression_ratio:.1f}x), "
+                      f"丢弃: {audio_ring_dropped}/{queue_dropped}")
             
     except KeyboardInterrupt:
         print("\n[音频线程] 停止中...")
@@ -206,9 +268,65 @@ def thread_audio_capture():
         print("[音频线程] 音频流已关闭")
 
 
+def open_camera():
+    """打开并配置摄像头（USE_RAW_MJPEG 时请求MJPG格式并关闭RGB转换，V4L2后端直接返回压缩的JPEG码流）"""
+    cap = cv2.VideoCapture(CAMERA_ID)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, VIDEO_WIDTH)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, VIDEO_HEIGHT)
+    cap.set(cv2.CAP_PROP_FPS, VIDEO_FPS)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    if USE_RAW_MJPEG:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+    return cap
+
+
+def is_mjpeg_frame(frame) -> bool:
+    """CONVERT_RGB关闭且摄像头输出MJPG时，V4L2后端返回压缩的JPEG码流：(1, N) uint8"""
+    return frame.ndim == 2 and frame.shape[0] == 1
+
+
+def frame_unchanged(frame, prev_small):
+    """
+    判断画面相对上次编码的帧是否基本无变化：只比较降采样后的约1/64像素（cv2.absdiff/sumElems 为SIMD实现）
+    返回 (是否无变化, 本帧降采样图)；原始MJPG码流返回码流本身
+    """
+    if is_mjpeg_frame(frame):
+        # 原始MJPG码流直接转发、不需要编码，不为静止检测解码：只比较压缩码流是否逐字节相同（摄像头重复输出同一帧时命中）
+        data = frame.reshape(-1)
+        return prev_small is not None and np.array_equal(data, prev_small), data
+    small = np.ascontiguousarray(frame[::STATIC_DIFF_STRIDE, ::STATIC_DIFF_STRIDE])
+    if prev_small is None or prev_small.shape != small.shape:
+        return False, small
+    mean_diff = sum(cv2.sumElems(cv2.absdiff(small, prev_small))) / small.size
+    return mean_diff < STATIC_DIFF_THRESHOLD, small
+
+
+def create_jpeg_encoder():
+    """
+    创建JPEG编码函数 frame(BGR) -> JPEG缓冲区
+    优先使用TurboJPEG（复用同一个编码器句柄），libturbojpeg缺失时回退到cv2.imencode
+    """
+    if TURBOJPEG_AVAILABLE:
+        try:
+            tj = TurboJPEG()
+            print("[数据线程] JPEG编码: TurboJPEG")
+            return lambda frame: tj.encode(frame, quality=JPEG_QUALITY,
+                                           pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420)
+        except (OSError, RuntimeError) as e:
+            print(f"[数据线程] TurboJPEG不可用（{e}），回退到cv2.imencode")
+    
+    # 参数只构造一次（int32数组，OpenCV按 vector<int> 直接读取）；显式关闭哈夫曼表优化和渐进式编码
+    encode_param = np.array([cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+                             cv2.IMWRITE_JPEG_PROGRESSIVE, 0], dtype=np.int32)
+    cv2.setNumThreads(1)  # 小图逐帧处理用不上OpenCV线程池，避免工作线程与音频/命令线程争抢CPU
+    print("[数据线程] JPEG编码: cv2.imencode")
+    return lambda frame: cv2.imencode('.jpg', frame, encode_param)[1]
+
+
 def thread_send_data():
     """线程3：发送视频+音频数据"""
-    context = zmq.Context()
+    context = zmq.Context.instance()  # 各线程共享进程内唯一的上下文（一个libzmq I/O线程）
     
     # 配置 socket
     socket = context.socket(zmq.PUSH)
@@ -222,40 +340,31 @@ def thread_send_data():
         socket.setsockopt(zmq.SNDBUF, 32768)
     except:
         pass
-    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_DATA}")
+    socket.connect(ENDPOINT_DATA)
     
-    print(f"[数据线程] 已连接到 B: {SERVER_B_HOST}:{SERVER_B_PORT_DATA}")
+    print(f"[数据线程] 已连接到 B: {ENDPOINT_DATA}")
     
     # 打开摄像头
-    cap = cv2.VideoCapture(CAMERA_ID)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, VIDEO_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, VIDEO_HEIGHT)
-    cap.set(cv2.CAP_PROP_FPS, VIDEO_FPS)
-    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    cap = open_camera()
     
     print(f"[数据线程] 摄像头已打开，分辨率: {VIDEO_WIDTH}x{VIDEO_HEIGHT}, FPS: {VIDEO_FPS}")
     
-    # 初始化 Opus 编码器（用于音频编码）
-    opus_encoder = None
-    if audio_enabled:
-        try:
-            opus_encoder = opuslib.Encoder(
-                fs=AUDIO_SAMPLE_RATE,
-                channels=AUDIO_CHANNELS,
-                application=OPUS_APPLICATION
-            )
-            opus_encoder.bitrate = OPUS_BITRATE
-            opus_encoder.complexity = OPUS_COMPLEXITY
-            print(f"[数据线程] ✅ Opus 编码器已初始化")
-        except Exception as e:
-            print(f"[数据线程] ⚠️ Opus 编码器初始化失败: {e}")
-    
-    # JPEG 编码参数
-    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY]
+    # JPEG 编码器（TurboJPEG 或 cv2.imencode）
+    encode_jpeg = create_jpeg_encoder()
     
     frame_count = 0
     sent_count = 0
-    start_time = time.time()
+    send_dropped = 0  # NOBLOCK 发送失败（zmq.Again）丢弃的帧数
+    encoded_frame = None
+    prev_small = None  # 上次编码帧的降采样图
+    audio_parts = []   # 待发送的音频帧；发送失败时保留到下一次
+    static_count = 0  # 连续复用上次编码结果的帧数
+    stats_start_ns = time.monotonic_ns()
+    
+    # 绝对截止时间调度：cap.read() 本身按摄像头帧率阻塞，这里只补足到下一个截止时间，不再额外叠加一整个周期
+    period_ns = int(1e9 * FRAME_SKIP / VIDEO_FPS)
+    start_ns = time.monotonic_ns()
+    tick = 0  # 自 start_ns 起已调度的帧数
     
     try:
         while True:
@@ -265,7 +374,7 @@ def thread_send_data():
                 print("[数据线程] 无法读取帧，尝试重新打开摄像头...")
                 cap.release()
                 time.sleep(1)
-                cap = cv2.VideoCapture(CAMERA_ID)
+                cap = open_camera()
                 continue
             
             frame_count += 1
@@ -277,65 +386,62 @@ def thread_send_data():
             # 记录时间戳
             timestamp = time.time()
             
-            # JPEG 编码
-            _, encoded_frame = cv2.imencode('.jpg', frame, encode_param)
-            video_bytes = encoded_frame.tobytes()
+            # JPEG 编码；静止画面复用上次的编码结果
+            unchanged, small = frame_unchanged(frame, prev_small) if SKIP_STATIC_FRAMES else (False, None)
+            if unchanged and encoded_frame is not None:
+                static_count += 1
+            else:
+                # 原始MJPG码流本身就是JPEG，直接发送；已解码的帧才需要编码
+                encoded_frame = frame.reshape(-1) if is_mjpeg_frame(frame) else encode_jpeg(frame)
+                prev_small = small
+                static_count = 0
             
-            # 获取音频数据（从缓冲区）
-            audio_data = None
-            if audio_enabled and opus_encoder:
-                with audio_lock:
-                    if len(audio_buffer) > 0:
-                        audio_chunk = audio_buffer.pop(0)
-                        try:
-                            # Opus 编码
-                            pcm_data = np.ascontiguousarray(
-                                audio_chunk[:, 0] if audio_chunk.ndim > 1 else audio_chunk
-                            )
-                            audio_data = opus_encoder.encode(pcm_data.tobytes(), OPUS_FRAME_SIZE)
-                        except Exception as e:
-                            if sent_count % 20 == 0:
-                                print(f"[数据线程] 音频编码失败: {e}")
+            # 取出音频线程已编码的帧（不阻塞），追加到待发送列表与视频一起发送
+            while audio_enabled:
+                try:
+                    audio_parts.extend(pack_audio_frame(audio_encoded_queue.get_nowait()))
+                except queue.Empty:
+                    break
             
-            # 准备发送的数据包（兼容现有格式）
-            frame_data = {
-                "image.left_wrist": video_bytes,  # 单摄像头复用为 left_wrist
-                "image.top": video_bytes,         # 同样的图像也作为 top
-                "timestamp": timestamp,
-            }
-            
-            # 添加音频数据（如果有）
-            if audio_data:
-                frame_data["audio"] = {
-                    "codec": "opus",
-                    "sample_rate": AUDIO_SAMPLE_RATE,
-                    "channels": AUDIO_CHANNELS,
-                    "data": audio_data,
-                    "timestamp": timestamp
-                }
-            
-            # 发送数据
-            socket.send(pickle.dumps(frame_data, protocol=pickle.HIGHEST_PROTOCOL))
-            sent_count += 1
-            
-            # 统计信息
-            if sent_count % 20 == 0:
-                elapsed = time.time() - start_time
-                fps = 20 / elapsed
-                audio_status = "有音频" if audio_data else "无音频"
-                print(f"[数据线程] 已发送 {sent_count} 帧, FPS: {fps:.1f}, "
-                      f"视频: {len(video_bytes)} bytes, {audio_status}")
-                start_time = time.time()
+            # 静止画面且没有待发送音频时跳过发送，每 STATIC_KEEPALIVE_FRAMES 帧保活一次
+            if static_count % STATIC_KEEPALIVE_FRAMES == 0 or audio_parts:
+                # 发送数据：[帧头, JPEG, 音频帧...]（单摄像头由B端复用为 left_wrist 和 top），
+                # copy=False 时libzmq直接引用编码结果缓冲区
+                header = VIDEO_FRAME_HEADER.pack(timestamp, len(encoded_frame))
+                try:
+                    socket.send_multipart([header, encoded_frame] + audio_parts, zmq.NOBLOCK, copy=False)
+                except zmq.Again:
+                    send_dropped += 1  # B未连接或发送队列已满（SNDHWM）：丢弃本视频帧，不阻塞采集/编码
+                    # 音频帧留到下一次发送；只保留最近 AUDIO_QUEUE_SIZE 帧，B长时间不可达时丢弃最旧的
+                    del audio_parts[:-2 * AUDIO_QUEUE_SIZE]
+                else:
+                    sent_count += 1
+                    sent_audio = len(audio_parts) // 2
+                    audio_parts = []
+                    
+                    # 统计信息
+                    if sent_count % 20 == 0:
+                        elapsed = (time.monotonic_ns() - stats_start_ns) / 1e9
+                        fps = 20 / elapsed
+                        audio_status = f"音频: {sent_audio} 帧"
+                        print(f"[数据线程] 已发送 {sent_count} 帧 (丢弃 {send_dropped}), FPS: {fps:.1f}, "
+                              f"视频: {len(encoded_frame)} bytes, {audio_status}")
+                        stats_start_ns = time.monotonic_ns()
             
-            # 控制帧率
-            time.sleep(1.0 / (VIDEO_FPS / FRAME_SKIP))
+            # 控制帧率：第 tick 帧截止于 start_ns + tick*period_ns（整数纳秒，不累积误差），落后时从当前时刻重新对齐
+            tick += 1
+            delay_ns = start_ns + tick * period_ns - time.monotonic_ns()
+            if delay_ns > 0:
+                time.sleep(delay_ns / 1e9)
+            else:
+                start_ns = time.monotonic_ns()
+                tick = 0
             
     except KeyboardInterrupt:
         print("\n[数据线程] 停止中...")
     finally:
         cap.release()
-        socket.close()
-        context.term()
+        socket.close()  # 共享上下文不在线程内term
 
 
 def main():
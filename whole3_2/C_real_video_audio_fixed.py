@@ -7,6 +7,7 @@
 # 
 # 架构：单线程音频采集+编码，避免竞争
 
+import os
 import time
 import threading
 import queue
@@ -15,7 +16,7 @@ from zmq_base import TorchSerializer
 import zmq
 import cv2
 import numpy as np
-import pickle
+import struct
 
 try:
     import sounddevice as sd
@@ -25,19 +26,31 @@ except ImportError:
     print("安装方法: pip install sounddevice")
     AUDIO_AVAILABLE = False
 
-try:
-    import opuslib
-    OPUS_AVAILABLE = True
-except ImportError:
+# Opus 编码器：优先 cffi 直接调用 libopus，否则使用 opuslib（见 opus_encoder.py）
+from opus_encoder import create_opus_encoder, OPUS_AVAILABLE
+if not OPUS_AVAILABLE:
     print("⚠️ opuslib 未安装，音频功能将被禁用")
     print("安装方法: pip install opuslib")
-    OPUS_AVAILABLE = False
+
+# 可选：libjpeg-turbo（SIMD加速的色彩转换/DCT，比cv2.imencode快2-4倍），未安装时回退到cv2.imencode
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420, TJSAMP_422
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TURBOJPEG_AVAILABLE = False
 
 # --- 服务器配置 ---
 SERVER_B_HOST = "localhost"
 SERVER_B_PORT_COMMAND = 5556  # 接收命令
 SERVER_B_PORT_DATA = 5558     # 发送视频数据
-SERVER_B_PORT_AUDIO = 5559    # 发送音频数据（独立端口）
+SERVER_B_PORT_AUDIO = 5559    # 发送音频数据（独立端口，仅 BATCH_AUDIO_WITH_VIDEO=False 时使用）
+# ZMQ端点（可用环境变量覆盖；与B在同一台机器时可设为 ipc:///tmp/imu_rs485_b_<端口>，B端已同时绑定）
+ENDPOINT_COMMAND = os.environ.get("ZMQ_C_COMMAND_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+ENDPOINT_DATA = os.environ.get("ZMQ_C_DATA_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_DATA}")
+ENDPOINT_AUDIO = os.environ.get("ZMQ_C_AUDIO_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_AUDIO}")
+# 音频随视频帧合并发送：每帧视频消息后附上期间积累的Opus帧，一次send_multipart（少一半发送系统调用）；
+# 代价是音频最多多等一个视频帧间隔（8FPS时125ms，静止画面跳帧时更久），默认走独立端口保证对讲实时性
+BATCH_AUDIO_WITH_VIDEO = False
 
 # --- 摄像头配置 ---
 CAMERA_ID = 0
@@ -46,6 +59,27 @@ VIDEO_WIDTH = 240
 VIDEO_HEIGHT = 180
 JPEG_QUALITY = 30
 FRAME_SKIP = 1
+# 摄像头输出MJPG时关闭OpenCV的解码，直接转发原始JPEG码流，省去每帧的JPEG编码（画质/分辨率由摄像头决定）；
+# 后端不支持时read()照常返回BGR图像，按下面的方式编码
+USE_RAW_MJPEG = True
+# 摄像头直接输出原始YUYV（关闭OpenCV的BGR转换），由TurboJPEG从YUV 4:2:2平面编码，
+# 省去 YUYV→BGR→YCbCr 两次色彩转换；仅TurboJPEG可用时启用，后端不支持时自动按BGR处理
+USE_YUYV_CAPTURE = True  # 仅 USE_RAW_MJPEG 关闭时生效
+
+# 静止画面跳过编码：按 STATIC_DIFF_STRIDE 降采样后与上次编码的帧比较平均绝对差，低于阈值时复用上次的JPEG；
+# 静止期间每 STATIC_KEEPALIVE_FRAMES 帧仍发送一次，保持B/A端画面和时间戳刷新
+SKIP_STATIC_FRAMES = True
+STATIC_DIFF_STRIDE = 8
+STATIC_DIFF_THRESHOLD = 2.0  # 平均每个采样值的差（0-255）
+STATIC_KEEPALIVE_FRAMES = 8
+
+# 视频帧头：采集时间戳(float64) + JPEG长度(uint32)，小端，共12字节（与 C_real_video_reverse_ultra.py 一致）
+# 每帧以多帧消息发送：[帧头, JPEG, 编码名0, 音频0, 编码名1, 音频1, ...]，JPEG直接取自编码结果缓冲区（零拷贝），不经过pickle；
+# 附带的音频与独立音频流的消息格式相同（B端按两帧一组转发给A）
+VIDEO_FRAME_HEADER = struct.Struct("<dI")
+
+# 音频消息：[编码名, Opus数据] 两帧（A端 audio_receiver_thread 的原始帧格式，B端按消息原样转发）
+AUDIO_CODEC_NAME = b"opus"
 
 # --- 音频配置 ---
 AUDIO_SAMPLE_RATE = 48000      # 48kHz 采样率（设备支持）
@@ -54,6 +88,9 @@ AUDIO_CHUNK_SIZE = 2880         # 2880 样本 = 60ms @ 48kHz
 OPUS_BITRATE = 64000           # 64kbps（匹配更高采样率）
 OPUS_FRAME_SIZE = 2880         # Opus 帧大小
 OPUS_COMPLEXITY = 5            # 编码复杂度
+# 音频回调线程（PortAudio创建）的SCHED_FIFO实时优先级，避免被JPEG编码等抢占导致丢帧；
+# 仅Linux生效，需要root或CAP_SYS_NICE（sudo setcap cap_sys_nice+ep $(which python3)），无权限时忽略；None禁用
+AUDIO_FIFO_PRIORITY = 50
 
 # --- 全局状态 ---
 latest_command = {
@@ -61,32 +98,110 @@ latest_command = {
     "throttle": 0,
     "timestamp": time.time()
 }
+latest_command_raw = None  # 尚未解码的最新命令原始字节（命令线程只保存，读取时才反序列化）
 command_lock = threading.Lock()
 
-# 音频队列：存储已编码的 Opus 数据
-audio_encoded_queue = queue.Queue(maxsize=5)
+# 视频流水线：采集线程 → 最新帧槽位 → 编码/发送线程（槽位只保留最新一帧，旧帧直接覆盖）
+latest_video_frame = None  # (BGR帧, 采集时间戳)
+video_frame_lock = threading.Lock()
+video_frame_event = threading.Event()
+
+AUDIO_QUEUE_SIZE = 8             # 已编码音频队列槽数（满时丢弃新帧）
+AUDIO_QUEUE_POLL_INTERVAL = 0.005  # 消费者阻塞取数据时的轮询间隔（秒）
+# 独立音频流每条消息最多合并的Opus帧数（1=每帧单独发送），以及凑批的最长等待时间（秒）；
+# 窗口为0时只合并发送线程来不及发出而积压的帧，调大窗口可减少消息数，但每帧最多增加相应的延迟
+AUDIO_SEND_BATCH = 3
+AUDIO_SEND_BATCH_WINDOW = 0.0
+
+
+class SPSCAudioRing:
+    """
+    单生产者/单消费者环形队列（替代 queue.Queue）：音频回调只写 head，消费者只写 tail，
+    CPython下列表槽位与int的读写是原子的，实时回调中不获取锁、不触发Condition通知。
+    接口与 queue.Queue 的 put_nowait / get_nowait / get / qsize 一致
+    """
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._slots = [None] * maxsize
+        self._head = 0  # 已放入的总数（仅生产者修改）
+        self._tail = 0  # 已取出的总数（仅消费者修改）
+    
+    def qsize(self) -> int:
+        return self._head - self._tail
+    
+    def put_nowait(self, item):
+        head = self._head
+        if head - self._tail >= self.maxsize:
+            raise queue.Full
+        self._slots[head % self.maxsize] = item
+        self._head = head + 1  # 槽位写好后再发布
+    
+    def get_nowait(self):
+        tail = self._tail
+        if self._head == tail:
+            raise queue.Empty
+        index = tail % self.maxsize
+        item = self._slots[index]
+        self._slots[index] = None
+        self._tail = tail + 1
+        return item
+    
+    def get(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.get_nowait()
+            except queue.Empty:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(AUDIO_QUEUE_POLL_INTERVAL)
+
+
+# 音频队列：存储已编码的 Opus 数据（音频回调 → 发送线程）
+audio_encoded_queue = SPSCAudioRing(AUDIO_QUEUE_SIZE)
 audio_enabled = AUDIO_AVAILABLE and OPUS_AVAILABLE
 
 
+def set_realtime_priority(priority, label):
+    """将调用线程设为SCHED_FIFO实时调度（Linux下sched_setscheduler(0)只作用于调用线程）；不支持或无权限时打印提示并继续"""
+    if priority is None or not hasattr(os, "sched_setscheduler"):
+        return
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        print(f"[{label}] 已启用 SCHED_FIFO 实时调度（优先级 {priority}）")
+    except OSError:
+        print(f"[{label}] 无权限设置实时调度（需要root或CAP_SYS_NICE），保持默认")
+
+
+def get_latest_command():
+    """返回最新命令字典：只在读取时反序列化最新一条（命令线程不再逐条pickle解码，期间被覆盖的旧命令不解码）"""
+    global latest_command, latest_command_raw
+    with command_lock:
+        raw, latest_command_raw = latest_command_raw, None
+        if raw is not None:
+            latest_command = TorchSerializer.from_bytes(raw)
+        return latest_command
+
+
 def thread_receive_commands():
     """线程1：接收控制命令"""
-    global latest_command
+    global latest_command_raw
     
-    context = zmq.Context()
+    context = zmq.Context.instance()  # 各线程共享进程内唯一的上下文（一个libzmq I/O线程）
     socket = context.socket(zmq.PULL)
-    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+    socket.connect(ENDPOINT_COMMAND)
     
-    print(f"[命令线程] 已连接到 B: {SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+    print(f"[命令线程] 已连接到 B: {ENDPOINT_COMMAND}")
     
     received_count = 0
     try:
         while True:
             raw_data = socket.recv()
-            command = TorchSerializer.from_bytes(raw_data)
             received_count += 1
             
             with command_lock:
-                latest_command = command
+                latest_command_raw = raw_data
             
             if received_count % 10 == 0:
                 print(f"[命令线程] 已接收 {received_count} 条命令")
@@ -94,8 +209,7 @@ def thread_receive_commands():
     except KeyboardInterrupt:
         pass
     finally:
-        socket.close()
-        context.term()
+        socket.close()  # 共享上下文不在线程内term
 
 
 def audio_callback(indata, frames, time_info, status):
@@ -107,15 +221,12 @@ def audio_callback(indata, frames, time_info, status):
         print(f"[音频] 警告: {status}")
     
     if not hasattr(audio_callback, 'encoder'):
-        # 在第一次调用时创建编码器
+        # 在第一次调用时（已在PortAudio的回调线程中）提升线程优先级并创建编码器
+        set_realtime_priority(AUDIO_FIFO_PRIORITY, "音频回调")
         try:
-            audio_callback.encoder = opuslib.Encoder(
-                fs=AUDIO_SAMPLE_RATE,
-                channels=AUDIO_CHANNELS,
-                application=opuslib.APPLICATION_VOIP
+            audio_callback.encoder = create_opus_encoder(
+                AUDIO_SAMPLE_RATE, AUDIO_CHANNELS, OPUS_BITRATE, OPUS_COMPLEXITY
             )
-            audio_callback.encoder.bitrate = OPUS_BITRATE
-            audio_callback.encoder.complexity = OPUS_COMPLEXITY
             audio_callback.encode_count = 0
             print("[音频回调] Opus 编码器已创建")
         except Exception as e:
@@ -123,28 +234,23 @@ def audio_callback(indata, frames, time_info, status):
             return
     
     try:
-        # 转换为 int16 PCM
-        pcm_data = (indata[:, 0] * 32767).astype(np.int16)
-        pcm_bytes = np.ascontiguousarray(pcm_data).tobytes()
+        # 音频流直接以 int16 PCM 采集，无需 float32→int16 转换和中间数组；
+        # 单声道时 indata[:, 0] 即连续的int16缓冲区，直接交给编码器（不再 tobytes 拷贝）
+        pcm_data = indata[:, 0]
         
         # Opus 编码
-        opus_data = audio_callback.encoder.encode(pcm_bytes, OPUS_FRAME_SIZE)
+        opus_data = audio_callback.encoder.encode(pcm_data, OPUS_FRAME_SIZE)
         
         # 放入队列
         try:
-            audio_encoded_queue.put_nowait({
-                "codec": "opus",
-                "sample_rate": AUDIO_SAMPLE_RATE,
-                "channels": AUDIO_CHANNELS,
-                "data": opus_data,
-                "timestamp": time.time()
-            })
+            # 只放入 Opus 数据，消息由发送线程组装
+            audio_encoded_queue.put_nowait(opus_data)
             
             audio_callback.encode_count += 1
             
             # 定期打印调试信息
             if audio_callback.encode_count % 50 == 0:
-                pcm_size = len(pcm_bytes)
+                pcm_size = pcm_data.nbytes
                 opus_size = len(opus_data)
                 compression = pcm_size / opus_size if opus_size > 0 else 0
                 print(f"[音频回调] 已编码 {audio_callback.encode_count} 帧, "
@@ -164,13 +270,18 @@ def audio_callback(indata, frames, time_info, status):
             print(f"[音频回调] 编码错误: {e}")
 
 
+def pack_audio_frame(opus_data: bytes) -> list:
+    """组装音频消息：[编码名, Opus数据]，原始字节直接发送，不经过pickle"""
+    return [AUDIO_CODEC_NAME, opus_data]
+
+
 def thread_send_audio():
     """线程2：独立发送音频数据"""
     if not audio_enabled:
         print("[音频发送线程] 音频功能未启用，线程退出")
         return
     
-    context = zmq.Context()
+    context = zmq.Context.instance()  # 各线程共享进程内唯一的上下文（一个libzmq I/O线程）
     socket = context.socket(zmq.PUSH)
     socket.setsockopt(zmq.SNDHWM, 10)  # 音频允许更多缓冲
     socket.setsockopt(zmq.LINGER, 0)
@@ -178,85 +289,165 @@ def thread_send_audio():
         socket.setsockopt(1, 1)  # TCP_NODELAY
     except:
         pass
-    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_AUDIO}")
+    socket.connect(ENDPOINT_AUDIO)
     
-    print(f"[音频发送线程] 已连接到 B: {SERVER_B_HOST}:{SERVER_B_PORT_AUDIO}")
+    print(f"[音频发送线程] 已连接到 B: {ENDPOINT_AUDIO}")
     print(f"[音频发送线程] 独立音频流已启动")
     
     sent_count = 0
+    send_dropped = 0  # NOBLOCK 发送失败（zmq.Again）丢弃的帧数
+    report_count = 0  # 上次打印统计时的 sent_count
     start_time = time.time()
     
     try:
         while True:
             # 从队列获取音频数据（阻塞）
             try:
-                audio_data = audio_encoded_queue.get(timeout=1.0)
+                batch = [audio_encoded_queue.get(timeout=1.0)]
                 
-                # 发送音频数据
-                socket.send(pickle.dumps(audio_data, protocol=pickle.HIGHEST_PROTOCOL))
-                sent_count += 1
+                # 合并多帧为一条消息：继续取帧直到 AUDIO_SEND_BATCH 帧或等待窗口结束
+                # （窗口为0时只合并已积压的帧，不额外增加延迟）
+                deadline = time.monotonic() + AUDIO_SEND_BATCH_WINDOW
+                while len(batch) < AUDIO_SEND_BATCH:
+                    try:
+                        batch.append(audio_encoded_queue.get_nowait())
+                    except queue.Empty:
+                        if time.monotonic() >= deadline:
+                            break
+                        time.sleep(AUDIO_QUEUE_POLL_INTERVAL)
                 
-                # 统计信息
-                if sent_count % 50 == 0:
-                    elapsed = time.time() - start_time
-                    fps = 50 / elapsed if elapsed > 0 else 0
-                    queue_size = audio_encoded_queue.qsize()
-                    print(f"[音频发送线程] 已发送 {sent_count} 帧, FPS: {fps:.1f}, "
-                          f"队列: {queue_size}/{audio_encoded_queue.maxsize}")
-                    start_time = time.time()
+                audio_parts = []
+                for opus_data in batch:
+                    audio_parts.extend(pack_audio_frame(opus_data))
+                
+                # 发送音频数据：[编码名0, 音频0, 编码名1, 音频1, ...]（copy=False：libzmq直接引用Opus数据）
+                try:
+                    socket.send_multipart(audio_parts, zmq.NOBLOCK, copy=False)
+                except zmq.Again:
+                    send_dropped += len(batch)  # B未连接或发送队列已满：丢弃本批，不阻塞音频队列
+                else:
+                    sent_count += len(batch)
                     
+                    # 统计信息
+                    if sent_count - report_count >= 50:
+                        elapsed = time.time() - start_time
+                        fps = (sent_count - report_count) / elapsed if elapsed > 0 else 0
+                        report_count = sent_count
+                        queue_size = audio_encoded_queue.qsize()
+                        print(f"[音频发送线程] 已发送 {sent_count} 帧 (丢弃 {send_dropped}), FPS: {fps:.1f}, "
+                              f"队列: {queue_size}/{audio_encoded_queue.maxsize}")
+                        start_time = time.time()
+                        
             except queue.Empty:
                 continue
                 
     except KeyboardInterrupt:
         print("\n[音频发送线程] 停止中...")
     finally:
-        socket.close()
-        context.term()
+        socket.close()  # 共享上下文不在线程内term
         print("[音频发送线程] 已关闭")
 
 
-def thread_send_data():
-    """线程3：发送视频数据（不再包含音频）"""
-    context = zmq.Context()
-    
-    # 配置 socket
-    socket = context.socket(zmq.PUSH)
-    socket.setsockopt(zmq.SNDHWM, 1)
-    socket.setsockopt(zmq.LINGER, 0)
-    try:
-        socket.setsockopt(1, 1)  # TCP_NODELAY
-    except:
-        pass
-    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_DATA}")
-    
-    print(f"[数据线程] 已连接到 B: {SERVER_B_HOST}:{SERVER_B_PORT_DATA}")
-    
-    # 打开摄像头
+def is_yuyv_frame(frame) -> bool:
+    """CONVERT_RGB关闭时，V4L2后端返回打包的YUYV帧：(H, W, 2)，通道0为Y，通道1为交替的U/V"""
+    return frame.ndim == 3 and frame.shape[2] == 2
+
+
+def is_mjpeg_frame(frame) -> bool:
+    """CONVERT_RGB关闭且摄像头输出MJPG时，V4L2后端返回压缩的JPEG码流：(1, N) uint8"""
+    return frame.ndim == 2 and frame.shape[0] == 1
+
+
+def yuyv_to_planar(frame):
+    """打包的YUYV (H, W, 2) → 平面YUV 4:2:2 缓冲区 [Y | U | V]（TurboJPEG encode_from_yuv 的输入格式）"""
+    return np.concatenate((frame[:, :, 0].ravel(), frame[:, 0::2, 1].ravel(), frame[:, 1::2, 1].ravel()))
+
+
+def open_camera():
+    """打开并配置摄像头（USE_RAW_MJPEG 时请求原始MJPG码流，否则 USE_YUYV_CAPTURE 且TurboJPEG可用时请求原始YUYV输出）"""
     cap = cv2.VideoCapture(CAMERA_ID)
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, VIDEO_WIDTH)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, VIDEO_HEIGHT)
     cap.set(cv2.CAP_PROP_FPS, VIDEO_FPS)
     cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    if USE_RAW_MJPEG:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+    elif USE_YUYV_CAPTURE and TURBOJPEG_AVAILABLE:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'YUYV'))
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+    return cap
+
+
+def frame_unchanged(frame, prev_small):
+    """
+    判断画面相对上次编码的帧是否基本无变化：只比较降采样后的约1/64像素（cv2.absdiff/sumElems 为SIMD实现）
+    返回 (是否无变化, 本帧降采样图)；原始MJPG码流返回码流本身
+    """
+    if is_mjpeg_frame(frame):
+        # 原始MJPG码流直接转发、不需要编码，不为静止检测解码：只比较压缩码流是否逐字节相同（摄像头重复输出同一帧时命中）
+        data = frame.reshape(-1)
+        return prev_small is not None and np.array_equal(data, prev_small), data
+    small = np.ascontiguousarray(frame[::STATIC_DIFF_STRIDE, ::STATIC_DIFF_STRIDE])
+    if prev_small is None or prev_small.shape != small.shape:
+        return False, small
+    mean_diff = sum(cv2.sumElems(cv2.absdiff(small, prev_small))) / small.size
+    return mean_diff < STATIC_DIFF_THRESHOLD, small
+
+
+def create_jpeg_encoder():
+    """
+    创建JPEG编码函数 frame(BGR或YUYV) -> JPEG缓冲区
+    优先使用TurboJPEG（复用同一个编码器句柄；YUYV帧直接从YUV平面编码），libturbojpeg缺失时回退到cv2.imencode
+    """
+    if TURBOJPEG_AVAILABLE:
+        try:
+            tj = TurboJPEG()
+            print("[数据线程] JPEG编码: TurboJPEG")
+            
+            def encode_turbo(frame):
+                if is_yuyv_frame(frame):
+                    height, width = frame.shape[:2]
+                    return tj.encode_from_yuv(yuyv_to_planar(frame), height, width,
+                                              quality=JPEG_QUALITY, jpeg_subsample=TJSAMP_422)
+                return tj.encode(frame, quality=JPEG_QUALITY,
+                                 pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420)
+            return encode_turbo
+        except (OSError, RuntimeError) as e:
+            print(f"[数据线程] TurboJPEG不可用（{e}），回退到cv2.imencode")
     
-    print(f"[数据线程] 摄像头已打开: {VIDEO_WIDTH}x{VIDEO_HEIGHT} @ {VIDEO_FPS} FPS")
+    # 参数只构造一次（int32数组，OpenCV按 vector<int> 直接读取）；显式关闭哈夫曼表优化和渐进式编码
+    encode_param = np.array([cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+                             cv2.IMWRITE_JPEG_PROGRESSIVE, 0], dtype=np.int32)
+    cv2.setNumThreads(1)  # 小图逐帧处理用不上OpenCV线程池，避免工作线程与音频/命令线程争抢CPU
+    print("[数据线程] JPEG编码: cv2.imencode")
     
-    # JPEG 编码参数
-    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY]
+    def encode_cv2(frame):
+        if is_yuyv_frame(frame):
+            frame = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_YUYV)
+        return cv2.imencode('.jpg', frame, encode_param)[1]
+    return encode_cv2
+
+
+def thread_capture_video():
+    """线程4：只负责读取摄像头，把最新一帧放入槽位；JPEG编码和发送在 thread_send_data 中进行，不阻塞读取"""
+    global latest_video_frame
     
-    frame_count = 0
-    sent_count = 0
-    start_time = time.time()
+    # 打开摄像头
+    cap = open_camera()
+    
+    print(f"[采集线程] 摄像头已打开: {VIDEO_WIDTH}x{VIDEO_HEIGHT} @ {VIDEO_FPS} FPS")
     
+    frame_count = 0
     try:
         while True:
-            # 读取视频帧
+            # 读取视频帧（按摄像头帧率阻塞）
             ret, frame = cap.read()
             if not ret:
-                print("[数据线程] 无法读取帧，尝试重新打开...")
+                print("[采集线程] 无法读取帧，尝试重新打开...")
                 cap.release()
                 time.sleep(1)
-                cap = cv2.VideoCapture(CAMERA_ID)
+                cap = open_camera()
                 continue
             
             frame_count += 1
@@ -265,41 +456,112 @@ def thread_send_data():
             if frame_count % FRAME_SKIP != 0:
                 continue
             
-            timestamp = time.time()
+            with video_frame_lock:
+                latest_video_frame = (frame, time.time())
+            video_frame_event.set()
             
-            # JPEG 编码
-            _, encoded_frame = cv2.imencode('.jpg', frame, encode_param)
-            video_bytes = encoded_frame.tobytes()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cap.release()
+
+
+def thread_send_data():
+    """线程3：发送视频数据（BATCH_AUDIO_WITH_VIDEO 时附带期间积累的音频帧）"""
+    context = zmq.Context.instance()  # 各线程共享进程内唯一的上下文（一个libzmq I/O线程）
+    
+    # 配置 socket
+    socket = context.socket(zmq.PUSH)
+    socket.setsockopt(zmq.SNDHWM, 1)
+    socket.setsockopt(zmq.LINGER, 0)
+    try:
+        socket.setsockopt(1, 1)  # TCP_NODELAY
+    except:
+        pass
+    socket.connect(ENDPOINT_DATA)
+    
+    print(f"[数据线程] 已连接到 B: {ENDPOINT_DATA}")
+    
+    # JPEG 编码器（TurboJPEG 或 cv2.imencode）
+    encode_jpeg = create_jpeg_encoder()
+    
+    sent_count = 0
+    send_dropped = 0  # NOBLOCK 发送失败（zmq.Again）丢弃的帧数
+    encoded_frame = None
+    prev_small = None  # 上次编码帧的降采样图
+    audio_parts = []   # 待发送的音频帧；发送失败时保留到下一次
+    static_count = 0  # 连续复用上次编码结果的帧数
+    stats_start_ns = time.monotonic_ns()
+    
+    # 绝对截止时间调度：采集线程按摄像头帧率更新槽位，这里按发送帧率取最新帧
+    period_ns = int(1e9 * FRAME_SKIP / VIDEO_FPS)
+    start_ns = time.monotonic_ns()
+    tick = 0  # 自 start_ns 起已调度的帧数
+    
+    try:
+        while True:
+            # 等待采集线程放入新帧，取出最新一帧（期间被覆盖的旧帧不再编码）
+            video_frame_event.wait()
+            video_frame_event.clear()
+            with video_frame_lock:
+                frame, timestamp = latest_video_frame
             
-            # 准备数据包（不再包含音频，音频由独立线程发送）
-            frame_data = {
-                "image.left_wrist": video_bytes,
-                "image.top": video_bytes,  # 单摄像头复用
-                "timestamp": timestamp,
-            }
+            # JPEG 编码；静止画面复用上次的编码结果
+            unchanged, small = frame_unchanged(frame, prev_small) if SKIP_STATIC_FRAMES else (False, None)
+            if unchanged and encoded_frame is not None:
+                static_count += 1
+            else:
+                # 原始MJPG码流本身就是JPEG，直接发送；已解码的帧才需要编码
+                encoded_frame = frame.reshape(-1) if is_mjpeg_frame(frame) else encode_jpeg(frame)
+                prev_small = small
+                static_count = 0
             
-            # 发送视频数据
-            socket.send(pickle.dumps(frame_data, protocol=pickle.HIGHEST_PROTOCOL))
-            sent_count += 1
+            # 取出期间积累的音频帧（不阻塞），追加到待发送列表与视频一起发送
+            if audio_enabled and BATCH_AUDIO_WITH_VIDEO:
+                while True:
+                    try:
+                        audio_parts.extend(pack_audio_frame(audio_encoded_queue.get_nowait()))
+                    except queue.Empty:
+                        break
             
-            # 统计信息
-            if sent_count % 20 == 0:
-                elapsed = time.time() - start_time
-                fps = 20 / elapsed if elapsed > 0 else 0
-                queue_status = f"音频队列: {audio_encoded_queue.qsize()}" if audio_enabled else ""
-                print(f"[视频发送线程] 已发送 {sent_count} 帧, FPS: {fps:.1f}, "
-                      f"视频: {len(video_bytes)}B, {queue_status}")
-                start_time = time.time()
+            # 静止画面且没有待发送音频时跳过发送，每 STATIC_KEEPALIVE_FRAMES 帧保活一次
+            if static_count % STATIC_KEEPALIVE_FRAMES == 0 or audio_parts:
+                # 发送视频数据：固定帧头 + JPEG缓冲区 (+ 音频帧)
+                # copy=False：libzmq直接引用编码结果缓冲区，发送完成前由消息持有引用；下一帧编码会分配新缓冲区
+                # B端单摄像头复用为 left_wrist 和 top
+                header = VIDEO_FRAME_HEADER.pack(timestamp, len(encoded_frame))
+                try:
+                    socket.send_multipart([header, encoded_frame] + audio_parts, zmq.NOBLOCK, copy=False)
+                except zmq.Again:
+                    send_dropped += 1  # B未连接或发送队列已满（SNDHWM）：丢弃本视频帧，不阻塞采集/编码
+                    # 音频帧留到下一次发送；只保留最近 AUDIO_QUEUE_SIZE 帧，B长时间不可达时丢弃最旧的
+                    del audio_parts[:-2 * AUDIO_QUEUE_SIZE]
+                else:
+                    sent_count += 1
+                    audio_parts = []
+                    
+                    # 统计信息
+                    if sent_count % 20 == 0:
+                        elapsed = (time.monotonic_ns() - stats_start_ns) / 1e9
+                        fps = 20 / elapsed if elapsed > 0 else 0
+                        queue_status = f"音频队列: {audio_encoded_queue.qsize()}" if audio_enabled else ""
+                        print(f"[视频发送线程] 已发送 {sent_count} 帧 (丢弃 {send_dropped}), FPS: {fps:.1f}, "
+                              f"视频: {len(encoded_frame)}B, {queue_status}")
+                        stats_start_ns = time.monotonic_ns()
             
-            # 控制帧率
-            time.sleep(1.0 / (VIDEO_FPS / FRAME_SKIP))
+            # 控制帧率：第 tick 帧截止于 start_ns + tick*period_ns（整数纳秒，不累积误差），落后时从当前时刻重新对齐
+            tick += 1
+            delay_ns = start_ns + tick * period_ns - time.monotonic_ns()
+            if delay_ns > 0:
+                time.sleep(delay_ns / 1e9)
+            else:
+                start_ns = time.monotonic_ns()
+                tick = 0
             
     except KeyboardInterrupt:
         print("\n[数据线程] 停止中...")
     finally:
-        cap.release()
-        socket.close()
-        context.term()
+        socket.close()  # 共享上下文不在线程内term
 
 
 def main():
@@ -351,15 +613,17 @@ def main():
     command_thread = threading.Thread(target=thread_receive_commands, daemon=True)
     command_thread.start()
     
-    # 启动线程2: 音频发送（独立）
+    # 启动线程2: 音频发送（独立；合并发送时由视频线程附带音频，不需要此线程）
     audio_send_thread = None
-    if audio_enabled:
+    if audio_enabled and not BATCH_AUDIO_WITH_VIDEO:
         audio_send_thread = threading.Thread(target=thread_send_audio, daemon=True)
         audio_send_thread.start()
     
-    # 启动线程3: 视频发送
+    # 启动线程3: 视频编码/发送，线程4: 摄像头采集
     data_thread = threading.Thread(target=thread_send_data, daemon=True)
     data_thread.start()
+    capture_thread = threading.Thread(target=thread_capture_video, daemon=True)
+    capture_thread.start()
     
     # 如果音频启用，启动音频流
     audio_stream = None
@@ -369,8 +633,9 @@ def main():
             audio_stream = sd.InputStream(
                 samplerate=AUDIO_SAMPLE_RATE,
                 channels=AUDIO_CHANNELS,
-                dtype='float32',
+                dtype='int16',  # 16-bit PCM，直接交给Opus编码
                 blocksize=AUDIO_CHUNK_SIZE,
+                latency='low',  # 使用设备的低延迟缓冲设置
                 callback=audio_callback
             )
             audio_stream.start()
@@ -383,8 +648,14 @@ def main():
     print("=" * 70)
     print("所有线程已启动:")
     print("  线程1: 命令接收 (A→C)")
-    print("  线程2: 音频发送 (C→B:5559) ← 独立音频流" if audio_enabled else "  线程2: 音频发送 (禁用)")
-    print("  线程3: 视频发送 (C→B:5558)")
+    if not audio_enabled:
+        print("  线程2: 音频发送 (禁用)")
+    elif BATCH_AUDIO_WITH_VIDEO:
+        print("  线程2: 音频发送 (随视频帧合并发送 C→B:5558)")
+    else:
+        print("  线程2: 音频发送 (C→B:5559) ← 独立音频流")
+    print("  线程3: 视频编码/发送 (C→B:5558)")
+    print("  线程4: 摄像头采集（只保留最新帧）")
     print("按 Ctrl+C 停止...")
     print("=" * 70)
     print()
@@ -3,18 +3,20 @@
 # 功能：
 # 1. 单摄像头采集，复用为 left_wrist 和 top
 # 2. 麦克风音频采集，使用 Opus 编码
-# 3. 【新增】深度降噪（noisereduce）+ 噪声门（Noise Gate）
+# 3. 【新增】流式谱减降噪 + 噪声门（Noise Gate）
 # 4. 通过 ZMQ 发送视频+音频到 B 端
 # 
 # 降噪策略：
-# - 方案5: noisereduce 深度学习降噪（去除环境噪声）
+# - 方案5: 谱减降噪（学习阶段估计噪声幅度谱，之后逐帧相减，去除稳态环境噪声）
 # - 方案1: 噪声门阈值 500（去除底噪）
 # 
 # 延迟分析：
-# - noisereduce 处理时间：~5-10ms/帧（非平稳模式）
-# - 对于 60ms 帧大小，延迟增加 < 10ms
-# - 总延迟：~70ms（原 60ms + 降噪 10ms）
+# - 16kHz 处理（设备不支持时48kHz采集后3:1抽取，抽取滤波器延迟 <0.5ms）
+# - 谱减降噪：320点FFT、50%重叠相加，处理时间 <1ms/帧，算法延迟一个跳步（160样本 = 10ms）
+# - 音频帧 20ms，Opus 使用 RESTRICTED_LOWDELAY（前瞻 2.5ms）
+# - 总延迟：~33ms（采集 20ms + 降噪 10ms + 编码前瞻 2.5ms）
 
+import os
 import time
 import threading
 import queue
@@ -23,7 +25,8 @@ from zmq_base import TorchSerializer
 import zmq
 import cv2
 import numpy as np
-import pickle
+from numpy.lib.stride_tricks import sliding_window_view
+import struct
 
 try:
     import sounddevice as sd
@@ -33,27 +36,34 @@ except ImportError:
     print("安装方法: pip install sounddevice")
     AUDIO_AVAILABLE = False
 
-try:
-    import opuslib
-    OPUS_AVAILABLE = True
-except ImportError:
+# Opus 编码器：优先 cffi 直接调用 libopus，否则使用 opuslib（见 opus_encoder.py）
+from opus_encoder import create_opus_encoder, OPUS_AVAILABLE, OPUS_APPLICATION_RESTRICTED_LOWDELAY
+if not OPUS_AVAILABLE:
     print("⚠️ opuslib 未安装，音频功能将被禁用")
     print("安装方法: pip install opuslib")
-    OPUS_AVAILABLE = False
 
+# 可选：libjpeg-turbo（SIMD加速的色彩转换/DCT，比cv2.imencode快2-4倍），未安装时回退到cv2.imencode
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420, TJSAMP_422
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TURBOJPEG_AVAILABLE = False
+
+# 谱减降噪的FFT：优先 scipy.fft（pocketfft，实数变换更快），未安装时使用 numpy.fft
 try:
-    import noisereduce as nr
-    NOISEREDUCE_AVAILABLE = True
+    from scipy.fft import rfft, irfft
 except ImportError:
-    print("⚠️ noisereduce 未安装，降噪功能将被禁用")
-    print("安装方法: pip install noisereduce")
-    NOISEREDUCE_AVAILABLE = False
+    from numpy.fft import rfft, irfft
 
 # --- 服务器配置 ---
 SERVER_B_HOST = "localhost"
 SERVER_B_PORT_COMMAND = 5556  # 接收命令
 SERVER_B_PORT_DATA = 5558     # 发送视频数据
 SERVER_B_PORT_AUDIO = 5559    # 发送音频数据（独立端口）
+# ZMQ端点（可用环境变量覆盖；与B在同一台机器时可设为 ipc:///tmp/imu_rs485_b_<端口>，B端已同时绑定）
+ENDPOINT_COMMAND = os.environ.get("ZMQ_C_COMMAND_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+ENDPOINT_DATA = os.environ.get("ZMQ_C_DATA_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_DATA}")
+ENDPOINT_AUDIO = os.environ.get("ZMQ_C_AUDIO_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_AUDIO}")
 
 # --- 摄像头配置 ---
 CAMERA_ID = 0
@@ -62,20 +72,52 @@ VIDEO_WIDTH = 240
 VIDEO_HEIGHT = 180
 JPEG_QUALITY = 30
 FRAME_SKIP = 1
+# 摄像头输出MJPG时关闭OpenCV的解码，直接转发原始JPEG码流，省去每帧的JPEG编码（画质/分辨率由摄像头决定）；
+# 后端不支持时read()照常返回BGR图像，按下面的方式编码
+USE_RAW_MJPEG = True
+# 摄像头直接输出原始YUYV（关闭OpenCV的BGR转换），由TurboJPEG从YUV 4:2:2平面编码，
+# 省去 YUYV→BGR→YCbCr 两次色彩转换；仅TurboJPEG可用时启用，后端不支持时自动按BGR处理
+USE_YUYV_CAPTURE = True  # 仅 USE_RAW_MJPEG 关闭时生效
+
+# 静止画面跳过编码：按 STATIC_DIFF_STRIDE 降采样后与上次编码的帧比较平均绝对差，低于阈值时复用上次的JPEG；
+# 静止期间每 STATIC_KEEPALIVE_FRAMES 帧仍发送一次，保持B/A端画面和时间戳刷新
+SKIP_STATIC_FRAMES = True
+STATIC_DIFF_STRIDE = 8
+STATIC_DIFF_THRESHOLD = 2.0  # 平均每个采样值的差（0-255）
+STATIC_KEEPALIVE_FRAMES = 8
+
+# 视频帧头：采集时间戳(float64) + JPEG长度(uint32)，小端，共12字节（与 C_real_video_reverse_ultra.py 一致）
+# 每帧以两帧消息发送：[帧头, JPEG]，JPEG直接取自编码结果缓冲区（零拷贝），不经过pickle
+VIDEO_FRAME_HEADER = struct.Struct("<dI")
+
+# 音频消息：[编码名, Opus数据] 两帧（A端 audio_receiver_thread 的原始帧格式，B端按消息原样转发）
+AUDIO_CODEC_NAME = b"opus"
 
 # --- 音频配置 ---
-AUDIO_SAMPLE_RATE = 48000      # 48kHz 采样率（设备支持）
+AUDIO_SAMPLE_RATE = 16000      # 处理/编码采样率：16kHz 语音足够，降噪、噪声门等逐样本处理的数据量只有48kHz的1/3
+# 依次尝试的设备采集采样率（须为 AUDIO_SAMPLE_RATE 的整数倍）：设备不支持16kHz时以48kHz采集，在回调中抽取到16kHz
+AUDIO_DEVICE_SAMPLE_RATES = (16000, 48000)
 AUDIO_CHANNELS = 1              # 单声道
-AUDIO_CHUNK_SIZE = 2880         # 2880 样本 = 60ms @ 48kHz
-OPUS_BITRATE = 64000           # 64kbps（匹配更高采样率）
-OPUS_FRAME_SIZE = 2880         # Opus 帧大小
+AUDIO_CHUNK_SIZE = AUDIO_SAMPLE_RATE // 50  # 20ms 一帧（Opus/CELT 原生帧长），16kHz 下为 320 样本
+OPUS_BITRATE = 24000           # 24kbps（16kHz 语音）
+OPUS_FRAME_SIZE = AUDIO_CHUNK_SIZE  # Opus 帧大小
+DECIMATE_TAPS = 48             # 抽取低通FIR长度（按设备采样率计）
 OPUS_COMPLEXITY = 5            # 编码复杂度
+# 仅CELT的低延迟模式：不走SILK/混合路径，前瞻 2.5ms（VOIP 为 6.5ms）；A端解码器无需改动
+OPUS_APPLICATION = OPUS_APPLICATION_RESTRICTED_LOWDELAY
+# 音频回调线程（PortAudio创建）的SCHED_FIFO实时优先级，避免被JPEG编码等抢占导致丢帧；
+# 仅Linux生效，需要root或CAP_SYS_NICE（sudo setcap cap_sys_nice+ep $(which python3)），无权限时忽略；None禁用
+AUDIO_FIFO_PRIORITY = 50
 
 # --- 降噪配置 ---
-ENABLE_NOISEREDUCE = NOISEREDUCE_AVAILABLE  # 是否启用深度降噪
+ENABLE_NOISEREDUCE = True                    # 是否启用谱减降噪
 ENABLE_NOISE_GATE = True                     # 是否启用噪声门
 NOISE_GATE_THRESHOLD = 500                   # 噪声门阈值（建议范围：300-800）
-NOISE_PROFILE_FRAMES = 10                    # 学习噪声特征的帧数（~0.6秒）
+NOISE_PROFILE_FRAMES = 30                    # 学习噪声特征的帧数（0.6秒）
+NR_HOP_SIZE = AUDIO_CHUNK_SIZE // 2          # 谱减跳步（10ms，需整除 AUDIO_CHUNK_SIZE）
+NR_FFT_SIZE = 2 * NR_HOP_SIZE                # FFT长度（50%重叠）
+NR_PROP_DECREASE = 1.0                       # 降噪强度（0.0-1.0，1.0=减去完整噪声谱）
+NR_GAIN_FLOOR = 0.1                          # 每个频点的最小增益（避免“音乐噪声”）
 
 # --- 全局状态 ---
 latest_command = {
@@ -83,32 +125,195 @@ latest_command = {
     "throttle": 0,
     "timestamp": time.time()
 }
+latest_command_raw = None  # 尚未解码的最新命令原始字节（命令线程只保存，读取时才反序列化）
 command_lock = threading.Lock()
 
-# 音频队列：存储已编码的 Opus 数据
-audio_encoded_queue = queue.Queue(maxsize=5)
+# 视频流水线：采集线程 → 最新帧槽位 → 编码/发送线程（槽位只保留最新一帧，旧帧直接覆盖）
+latest_video_frame = None  # (BGR帧, 采集时间戳)
+video_frame_lock = threading.Lock()
+video_frame_event = threading.Event()
+
+AUDIO_RING_SLOTS = 8             # 采集环形缓冲槽数（8 × 20ms），处理线程停滞时满则丢弃新块
+AUDIO_QUEUE_SIZE = 8             # 已编码音频队列槽数（满时丢弃新帧）
+AUDIO_QUEUE_POLL_INTERVAL = 0.005  # 消费者阻塞取数据时的轮询间隔（秒）
+# 独立音频流每条消息最多合并的Opus帧数（1=每帧单独发送），以及凑批的最长等待时间（秒）；
+# 窗口为0时只合并发送线程来不及发出而积压的帧，调大窗口可减少消息数（20ms帧下 0.04 约为三帧一条），但会抵消短帧带来的低延迟
+AUDIO_SEND_BATCH = 3
+AUDIO_SEND_BATCH_WINDOW = 0.0
+
+
+class SpectralSubtractor:
+    """
+    流式谱减降噪：sqrt-Hann 分析/合成窗、50% 重叠相加（两窗相乘为周期Hann，重叠后增益恒为1）；
+    噪声幅度谱取学习样本各帧幅度谱的中值。跨回调保留输入历史和重叠累积，输出比输入晚一个跳步
+    """
+    
+    def __init__(self, noise_sample: np.ndarray, fft_size: int = NR_FFT_SIZE, hop_size: int = NR_HOP_SIZE,
+                 prop_decrease: float = NR_PROP_DECREASE, gain_floor: float = NR_GAIN_FLOOR):
+        self.fft_size = fft_size
+        self.hop_size = hop_size
+        self.gain_floor = gain_floor
+        self.window = np.sqrt(np.hanning(fft_size + 1)[:-1]).astype(np.float32)
+        
+        # 噪声幅度谱：学习样本按同样的窗和跳步分帧，取中值（对偶发的响声不敏感）
+        starts = range(0, len(noise_sample) - fft_size + 1, hop_size)
+        noise_mags = [np.abs(rfft(noise_sample[i:i + fft_size] * self.window)) for i in starts]
+        self.noise_mag = (prop_decrease * np.median(noise_mags, axis=0)).astype(np.float32)
+        
+        self._history = np.zeros(fft_size, dtype=np.float32)  # 最近 fft_size 个输入样本
+        self._overlap = np.zeros(fft_size, dtype=np.float32)  # 重叠相加累积
+        self._frame = np.empty(fft_size, dtype=np.float32)
+        self._gain = np.empty(fft_size // 2 + 1, dtype=np.float32)
+    
+    def reset(self):
+        """清空历史（跳过若干帧后重新开始，避免把过期的重叠部分叠加到新音频上）"""
+        self._history.fill(0)
+        self._overlap.fill(0)
+    
+    def process(self, samples: np.ndarray, out: np.ndarray):
+        """对 samples（长度为跳步整数倍）降噪，结果写入等长的 out"""
+        hop = self.hop_size
+        for i in range(0, len(samples), hop):
+            self._history[:-hop] = self._history[hop:]
+            self._history[-hop:] = samples[i:i + hop]
+            np.multiply(self._history, self.window, out=self._frame)
+            
+            # 幅度谱减去噪声谱（保留相位）：增益 = max(1 - 噪声/幅度, 下限)
+            spectrum = rfft(self._frame)
+            np.abs(spectrum, out=self._gain, casting='unsafe')
+            np.maximum(self._gain, 1e-9, out=self._gain)
+            np.divide(self.noise_mag, self._gain, out=self._gain)
+            np.subtract(1.0, self._gain, out=self._gain)
+            np.maximum(self._gain, self.gain_floor, out=self._gain)
+            spectrum *= self._gain
+            
+            # 合成窗后重叠相加，输出已完整的前一个跳步
+            self._overlap += irfft(spectrum, self.fft_size) * self.window
+            out[i:i + hop] = self._overlap[:hop]
+            self._overlap[:-hop] = self._overlap[hop:]
+            self._overlap[-hop:] = 0
+
+
+class Decimator:
+    """
+    整数倍抽取：加窗sinc低通FIR（截止于输出奈奎斯特频率的0.9倍），跨回调保留 num_taps-1 个输入历史；
+    只计算保留下来的输出点（每 factor 个输入算一个点积），缓冲区全部预分配
+    """
+    
+    def __init__(self, factor: int, block_size: int, num_taps: int = DECIMATE_TAPS):
+        cutoff = 0.9 / factor  # 相对输入奈奎斯特频率
+        n = np.arange(num_taps) - (num_taps - 1) / 2
+        taps = cutoff * np.sinc(cutoff * n) * np.hamming(num_taps)
+        self.taps = (taps / taps.sum()).astype(np.float32)  # 对称滤波器，直流增益为1
+        self._history = num_taps - 1
+        self._buf = np.zeros(self._history + block_size, dtype=np.float32)  # [历史 | 本块]
+        self._windows = sliding_window_view(self._buf, num_taps)[::factor]  # 每个输出点对应的输入窗口（视图）
+    
+    def process(self, samples: np.ndarray, out: np.ndarray):
+        """抽取 block_size 个输入样本，结果写入长度为 block_size // factor 的 out"""
+        h = self._history
+        self._buf[h:] = samples
+        np.dot(self._windows, self.taps, out=out)
+        self._buf[:h] = self._buf[-h:]
+
+
+class SPSCAudioRing:
+    """
+    单生产者/单消费者环形队列（替代 queue.Queue）：生产者只写 head，消费者只写 tail，
+    CPython下列表槽位与int的读写是原子的，生产端不获取锁、不触发Condition通知。
+    接口与 queue.Queue 的 put_nowait / get_nowait / get / qsize 一致
+    """
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._slots = [None] * maxsize
+        self._head = 0  # 已放入的总数（仅生产者修改）
+        self._tail = 0  # 已取出的总数（仅消费者修改）
+    
+    def qsize(self) -> int:
+        return self._head - self._tail
+    
+    def put_nowait(self, item):
+        head = self._head
+        if head - self._tail >= self.maxsize:
+            raise queue.Full
+        self._slots[head % self.maxsize] = item
+        self._head = head + 1  # 槽位写好后再发布
+    
+    def get_nowait(self):
+        tail = self._tail
+        if self._head == tail:
+            raise queue.Empty
+        index = tail % self.maxsize
+        item = self._slots[index]
+        self._slots[index] = None
+        self._tail = tail + 1
+        return item
+    
+    def get(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.get_nowait()
+            except queue.Empty:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(AUDIO_QUEUE_POLL_INTERVAL)
+
+
+# 音频队列：存储已编码的 Opus 数据（音频处理线程 → 发送线程）
+audio_encoded_queue = SPSCAudioRing(AUDIO_QUEUE_SIZE)
 audio_enabled = AUDIO_AVAILABLE and OPUS_AVAILABLE
+audio_device_rate = AUDIO_SAMPLE_RATE  # 实际采集采样率（main 中按设备支持情况选择）
+
+# 采集缓冲：预分配的单生产者环形缓冲（每槽一块设备采样率下的 float32 样本，main 中按设备采样率分配）
+# 音频回调只写 head，处理线程只写 tail；CPython下int读写是原子的，回调中无需加锁、无内存分配
+audio_ring = None
+audio_ring_head = 0  # 已写入的块数（仅音频回调修改）
+audio_ring_tail = 0  # 已处理的块数（仅处理线程修改）
+audio_ring_dropped = 0
+audio_ring_event = threading.Event()  # 回调写入新块后唤醒处理线程
+
+
+def set_realtime_priority(priority, label):
+    """将调用线程设为SCHED_FIFO实时调度（Linux下sched_setscheduler(0)只作用于调用线程）；不支持或无权限时打印提示并继续"""
+    if priority is None or not hasattr(os, "sched_setscheduler"):
+        return
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        print(f"[{label}] 已启用 SCHED_FIFO 实时调度（优先级 {priority}）")
+    except OSError:
+        print(f"[{label}] 无权限设置实时调度（需要root或CAP_SYS_NICE），保持默认")
+
+
+def get_latest_command():
+    """返回最新命令字典：只在读取时反序列化最新一条（命令线程不再逐条pickle解码，期间被覆盖的旧命令不解码）"""
+    global latest_command, latest_command_raw
+    with command_lock:
+        raw, latest_command_raw = latest_command_raw, None
+        if raw is not None:
+            latest_command = TorchSerializer.from_bytes(raw)
+        return latest_command
 
 
 def thread_receive_commands():
     """线程1：接收控制命令"""
-    global latest_command
+    global latest_command_raw
     
-    context = zmq.Context()
+    context = zmq.Context.instance()  # 各线程共享进程内唯一的上下文（一个libzmq I/O线程）
     socket = context.socket(zmq.PULL)
-    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+    socket.connect(ENDPOINT_COMMAND)
     
-    print(f"[命令线程] 已连接到 B: {SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+    print(f"[命令线程] 已连接到 B: {ENDPOINT_COMMAND}")
     
     received_count = 0
     try:
         while True:
             raw_data = socket.recv()
-            command = TorchSerializer.from_bytes(raw_data)
             received_count += 1
             
             with command_lock:
-                latest_command = command
+                latest_command_raw = raw_data
             
             if received_count % 10 == 0:
                 print(f"[命令线程] 已接收 {received_count} 条命令")
@@ -116,183 +321,224 @@ def thread_receive_commands():
     except KeyboardInterrupt:
         pass
     finally:
-        socket.close()
-        context.term()
+        socket.close()  # 共享上下文不在线程内term
 
 
 def audio_callback(indata, frames, time_info, status):
     """
-    音频采集回调函数
-    【优化】添加 noisereduce 深度降噪 + 噪声门
+    音频采集回调函数（PortAudio实时线程）：只把本块拷入预分配的环形缓冲并唤醒处理线程，
+    降噪、噪声门和Opus编码都在 thread_process_audio 中进行，回调里不做耗时计算
     """
+    global audio_ring_head, audio_ring_dropped
+    
     if status:
         print(f"[音频] 警告: {status}")
     
-    if not hasattr(audio_callback, 'encoder'):
-        # 在第一次调用时创建编码器
+    if not hasattr(audio_callback, 'started'):
+        # 在第一次调用时（已在PortAudio的回调线程中）提升线程优先级
+        set_realtime_priority(AUDIO_FIFO_PRIORITY, "音频回调")
+        audio_callback.started = True
+    
+    # 缓冲区满（处理线程停滞）：丢弃新到的块（不改动tail，避免覆盖处理线程正在读取的槽）
+    head = audio_ring_head
+    if head - audio_ring_tail >= AUDIO_RING_SLOTS:
+        audio_ring_dropped += 1
+        return
+    
+    np.copyto(audio_ring[head % AUDIO_RING_SLOTS], indata[:, 0])
+    audio_ring_head = head + 1  # 槽位写好后再发布
+    audio_ring_event.set()
+
+
+def process_audio_chunk(chunk):
+    """
+    处理一块采集的音频（设备采样率的 float32 单声道）
+    【优化】抽取 → 流式谱减降噪 + 噪声门 → Opus编码 → 放入发送队列
+    """
+    if not hasattr(process_audio_chunk, 'encoder'):
         try:
-            audio_callback.encoder = opuslib.Encoder(
-                fs=AUDIO_SAMPLE_RATE,
-                channels=AUDIO_CHANNELS,
-                application=opuslib.APPLICATION_VOIP
+            process_audio_chunk.encoder = create_opus_encoder(
+                AUDIO_SAMPLE_RATE, AUDIO_CHANNELS, OPUS_BITRATE, OPUS_COMPLEXITY, OPUS_APPLICATION
             )
-            audio_callback.encoder.bitrate = OPUS_BITRATE
-            audio_callback.encoder.complexity = OPUS_COMPLEXITY
-            audio_callback.encode_count = 0
+            process_audio_chunk.encode_count = 0
+            process_audio_chunk.silence = np.zeros(AUDIO_CHUNK_SIZE, dtype=np.float32)  # 噪声门静音帧
+            
+            # 设备采样率高于处理采样率时，先抽取到 AUDIO_SAMPLE_RATE
+            factor = audio_device_rate // AUDIO_SAMPLE_RATE
+            process_audio_chunk.decimator = Decimator(factor, AUDIO_CHUNK_SIZE * factor) if factor > 1 else None
+            process_audio_chunk.resample_buf = np.empty(AUDIO_CHUNK_SIZE, dtype=np.float32)
             
             # 降噪相关状态
-            audio_callback.noise_learning = ENABLE_NOISEREDUCE
-            audio_callback.noise_buffer = []
-            audio_callback.noise_profile = None
-            audio_callback.nr_processing_times = []
-            audio_callback.noisereduce_enabled = ENABLE_NOISEREDUCE  # 存储到局部状态
+            process_audio_chunk.noise_learning = ENABLE_NOISEREDUCE
+            process_audio_chunk.noise_pool = np.empty(NOISE_PROFILE_FRAMES * AUDIO_CHUNK_SIZE, dtype=np.float32)  # 噪声样本（预分配）
+            process_audio_chunk.noise_count = 0  # 已采用的噪声样本帧数
+            process_audio_chunk.noise_learning_frames = 0  # 学习阶段已收到的帧数（含未采用的响亮帧）
+            process_audio_chunk.denoiser = None
+            process_audio_chunk.denoise_buf = np.empty(AUDIO_CHUNK_SIZE, dtype=np.float32)  # 降噪输出（每帧复用）
+            process_audio_chunk.nr_processing_times = []
+            process_audio_chunk.noisereduce_enabled = ENABLE_NOISEREDUCE  # 存储到局部状态
             
-            print("[音频回调] Opus 编码器已创建")
+            print("[音频处理] Opus 编码器已创建")
             if ENABLE_NOISEREDUCE:
-                print(f"[音频回调] 深度降噪已启用，学习前 {NOISE_PROFILE_FRAMES} 帧作为噪声特征")
+                print(f"[音频处理] 深度降噪已启用，学习前 {NOISE_PROFILE_FRAMES} 帧作为噪声特征")
             if ENABLE_NOISE_GATE:
-                print(f"[音频回调] 噪声门已启用，阈值: {NOISE_GATE_THRESHOLD}")
+                print(f"[音频处理] 噪声门已启用，阈值: {NOISE_GATE_THRESHOLD}")
         except Exception as e:
-            print(f"[音频回调] 创建编码器失败: {e}")
+            print(f"[音频处理] 创建编码器失败: {e}")
             return
     
     try:
         # ========================================
         # 步骤1：获取 float32 音频数据
         # ========================================
-        audio_float = indata[:, 0].copy()  # 单声道
+        audio_float = chunk  # 单声道（环形缓冲槽位视图，需保留时再拷贝）
+        if process_audio_chunk.decimator is not None:
+            process_audio_chunk.decimator.process(audio_float, process_audio_chunk.resample_buf)
+            audio_float = process_audio_chunk.resample_buf
+        
+        # 先计算 RMS 能量（点积，换算到 int16 幅度）：低于噪声门阈值的静音帧无需降噪，直接输出静音
+        rms = float(np.sqrt(np.dot(audio_float, audio_float) / audio_float.size)) * 32767
+        gated = ENABLE_NOISE_GATE and rms < NOISE_GATE_THRESHOLD
         
         # ========================================
-        # 步骤2：深度降噪（noisereduce）
+        # 步骤2：谱减降噪（被噪声门静音的帧跳过）
         # ========================================
-        if audio_callback.noisereduce_enabled:
-            if audio_callback.noise_learning:
-                # 学习阶段：收集噪声样本
-                audio_callback.noise_buffer.append(audio_float)
+        if process_audio_chunk.noisereduce_enabled:
+            if process_audio_chunk.noise_learning:
+                # 学习阶段：只收集低于阈值的安静帧作为噪声样本（避免把咳嗽、说话学成噪声）；
+                # 环境持续较吵时，超过3倍学习帧数后不再筛选
+                process_audio_chunk.noise_learning_frames += 1
+                if (rms < NOISE_GATE_THRESHOLD
+                        or process_audio_chunk.noise_learning_frames > 3 * NOISE_PROFILE_FRAMES):
+                    # 直接拷入预分配样本池的对应位置（不为每帧分配新数组，结束时也无需拼接）
+                    i = process_audio_chunk.noise_count
+                    np.copyto(process_audio_chunk.noise_pool[i * AUDIO_CHUNK_SIZE:(i + 1) * AUDIO_CHUNK_SIZE], audio_float)
+                    process_audio_chunk.noise_count = i + 1
                 
-                if len(audio_callback.noise_buffer) >= NOISE_PROFILE_FRAMES:
+                if process_audio_chunk.noise_count >= NOISE_PROFILE_FRAMES:
                     # 学习完成：生成噪声特征
-                    noise_sample = np.concatenate(audio_callback.noise_buffer)
+                    noise_sample = process_audio_chunk.noise_pool
                     
                     nr_start = time.time()
                     try:
-                        # 使用收集的噪声样本作为参考
-                        audio_callback.noise_profile = noise_sample
-                        audio_callback.noise_learning = False
+                        # 由收集的噪声样本估计噪声幅度谱
+                        process_audio_chunk.denoiser = SpectralSubtractor(noise_sample)
+                        process_audio_chunk.noise_learning = False
                         
                         nr_time = (time.time() - nr_start) * 1000
-                        print(f"[音频回调] ✅ 噪声特征学习完成，用时: {nr_time:.1f}ms")
-                        print(f"[音频回调] 噪声样本 RMS: {np.sqrt(np.mean(noise_sample**2)):.6f}")
+                        print(f"[音频处理] ✅ 噪声特征学习完成，用时: {nr_time:.1f}ms")
+                        print(f"[音频处理] 噪声样本 RMS: {np.sqrt(np.mean(noise_sample**2)):.6f}")
                     except Exception as e:
-                        print(f"[音频回调] 噪声学习失败: {e}")
-                        audio_callback.noise_learning = False
-                        audio_callback.noisereduce_enabled = False
+                        print(f"[音频处理] 噪声学习失败: {e}")
+                        process_audio_chunk.noise_learning = False
+                        process_audio_chunk.noisereduce_enabled = False
                 
                 # 学习期间不处理音频，直接返回
                 return
+            elif gated:
+                # 静音帧不送入降噪器，下一帧从空历史开始
+                process_audio_chunk.denoiser.reset()
             else:
                 # 降噪处理
                 nr_start = time.time()
                 try:
-                    audio_float = nr.reduce_noise(
-                        y=audio_float,
-                        sr=AUDIO_SAMPLE_RATE,
-                        y_noise=audio_callback.noise_profile,
-                        stationary=False,      # 非平稳降噪（更智能，稍慢）
-                        prop_decrease=1.0,     # 降噪强度（0.0-1.0，1.0=最强）
-                    )
+                    process_audio_chunk.denoiser.process(audio_float, process_audio_chunk.denoise_buf)
+                    audio_float = process_audio_chunk.denoise_buf
                     
                     nr_time = (time.time() - nr_start) * 1000
-                    audio_callback.nr_processing_times.append(nr_time)
+                    process_audio_chunk.nr_processing_times.append(nr_time)
+                    
+                    # 降噪后能量可能降到阈值以下，重新判断噪声门
+                    rms = float(np.sqrt(np.dot(audio_float, audio_float) / audio_float.size)) * 32767
+                    gated = ENABLE_NOISE_GATE and rms < NOISE_GATE_THRESHOLD
                     
                     # 定期报告降噪性能
-                    if audio_callback.encode_count % 100 == 0 and audio_callback.nr_processing_times:
-                        avg_nr_time = np.mean(audio_callback.nr_processing_times[-50:])
-                        max_nr_time = np.max(audio_callback.nr_processing_times[-50:])
-                        print(f"[音频回调] 降噪处理时间: 平均 {avg_nr_time:.1f}ms, 最大 {max_nr_time:.1f}ms")
+                    if process_audio_chunk.encode_count % 100 == 0 and process_audio_chunk.nr_processing_times:
+                        avg_nr_time = np.mean(process_audio_chunk.nr_processing_times[-50:])
+                        max_nr_time = np.max(process_audio_chunk.nr_processing_times[-50:])
+                        print(f"[音频处理] 降噪处理时间: 平均 {avg_nr_time:.1f}ms, 最大 {max_nr_time:.1f}ms")
                         
                 except Exception as e:
-                    if not hasattr(audio_callback, 'nr_error_count'):
-                        audio_callback.nr_error_count = 0
-                    audio_callback.nr_error_count += 1
-                    if audio_callback.nr_error_count <= 3:
-                        print(f"[音频回调] 降噪处理失败: {e}")
-        
-        # ========================================
-        # 步骤3：转换为 int16 PCM
-        # ========================================
-        pcm_data = (audio_float * 32767).astype(np.int16)
+                    if not hasattr(process_audio_chunk, 'nr_error_count'):
+                        process_audio_chunk.nr_error_count = 0
+                    process_audio_chunk.nr_error_count += 1
+                    if process_audio_chunk.nr_error_count <= 3:
+                        print(f"[音频处理] 降噪处理失败: {e}")
         
         # ========================================
-        # 步骤4：噪声门（Noise Gate）
+        # 步骤3：噪声门（Noise Gate）
         # ========================================
-        if ENABLE_NOISE_GATE:
-            # 计算当前帧的 RMS 能量
-            rms = np.sqrt(np.mean(pcm_data.astype(np.float32)**2))
-            
+        pcm_data = audio_float
+        if gated:
             # 低于阈值时强制静音
-            if rms < NOISE_GATE_THRESHOLD:
-                pcm_data = np.zeros_like(pcm_data)
-                
-                # 定期报告噪声门触发
-                if not hasattr(audio_callback, 'gate_trigger_count'):
-                    audio_callback.gate_trigger_count = 0
-                audio_callback.gate_trigger_count += 1
-                
-                if audio_callback.gate_trigger_count % 100 == 0:
-                    print(f"[音频回调] 噪声门已触发 {audio_callback.gate_trigger_count} 次")
+            pcm_data = process_audio_chunk.silence
+            
+            # 定期报告噪声门触发
+            if not hasattr(process_audio_chunk, 'gate_trigger_count'):
+                process_audio_chunk.gate_trigger_count = 0
+            process_audio_chunk.gate_trigger_count += 1
+            
+            if process_audio_chunk.gate_trigger_count % 100 == 0:
+                print(f"[音频处理] 噪声门已触发 {process_audio_chunk.gate_trigger_count} 次")
         
         # ========================================
-        # 步骤5：Opus 编码
+        # 步骤4：Opus 编码（float 接口直接编码 float32 采样，无需转换为 int16）
         # ========================================
-        pcm_bytes = np.ascontiguousarray(pcm_data).tobytes()
-        opus_data = audio_callback.encoder.encode(pcm_bytes, OPUS_FRAME_SIZE)
+        opus_data = process_audio_chunk.encoder.encode_float(pcm_data, OPUS_FRAME_SIZE)
         
         # ========================================
-        # 步骤6：放入发送队列
+        # 步骤5：放入发送队列
         # ========================================
         try:
-            audio_encoded_queue.put_nowait({
-                "codec": "opus",
-                "sample_rate": AUDIO_SAMPLE_RATE,
-                "channels": AUDIO_CHANNELS,
-                "data": opus_data,
-                "timestamp": time.time()
-            })
+            # 只放入 Opus 数据，消息由发送线程组装
+            audio_encoded_queue.put_nowait(opus_data)
             
-            audio_callback.encode_count += 1
+            process_audio_chunk.encode_count += 1
             
             # 定期打印统计信息
-            if audio_callback.encode_count % 50 == 0:
-                pcm_size = len(pcm_bytes)
+            if process_audio_chunk.encode_count % 50 == 0:
+                pcm_size = pcm_data.nbytes
                 opus_size = len(opus_data)
                 compression = pcm_size / opus_size if opus_size > 0 else 0
                 
-                # 计算当前音频质量指标
-                current_rms = np.sqrt(np.mean(pcm_data.astype(np.float32)**2))
-                
-                status_msg = f"[音频回调] 已编码 {audio_callback.encode_count} 帧, "
+                status_msg = f"[音频处理] 已编码 {process_audio_chunk.encode_count} 帧, "
                 status_msg += f"PCM: {pcm_size}B → Opus: {opus_size}B (压缩比: {compression:.1f}x), "
                 status_msg += f"队列: {audio_encoded_queue.qsize()}/{audio_encoded_queue.maxsize}, "
-                status_msg += f"RMS: {current_rms:.0f}"
+                status_msg += f"RMS: {rms:.0f}, 采集丢弃: {audio_ring_dropped}"
                 
                 print(status_msg)
         
         except queue.Full:
             # 队列满，丢弃旧数据
-            if not hasattr(audio_callback, 'drop_count'):
-                audio_callback.drop_count = 0
-            audio_callback.drop_count += 1
+            if not hasattr(process_audio_chunk, 'drop_count'):
+                process_audio_chunk.drop_count = 0
+            process_audio_chunk.drop_count += 1
             
-            if audio_callback.drop_count % 20 == 0:
-                print(f"[音频回调] 队列满，已丢弃 {audio_callback.drop_count} 帧")
+            if process_audio_chunk.drop_count % 20 == 0:
+                print(f"[音频处理] 队列满，已丢弃 {process_audio_chunk.drop_count} 帧")
     
     except Exception as e:
-        if not hasattr(audio_callback, 'error_count'):
-            audio_callback.error_count = 0
-        audio_callback.error_count += 1
-        if audio_callback.error_count <= 3:
-            print(f"[音频回调] 处理错误: {e}")
+        if not hasattr(process_audio_chunk, 'error_count'):
+            process_audio_chunk.error_count = 0
+        process_audio_chunk.error_count += 1
+        if process_audio_chunk.error_count <= 3:
+            print(f"[音频处理] 处理错误: {e}")
+
+
+def thread_process_audio():
+    """线程5：音频处理——按顺序取出回调写入的块进行降噪/编码（普通线程，GC/GIL停顿不会拖慢声卡回调）"""
+    global audio_ring_tail
+    while True:
+        audio_ring_event.wait(1.0)
+        audio_ring_event.clear()
+        while audio_ring_tail != audio_ring_head:
+            tail = audio_ring_tail
+            process_audio_chunk(audio_ring[tail % AUDIO_RING_SLOTS])
+            audio_ring_tail = tail + 1  # 处理完成后才释放槽位
+
+def pack_audio_frame(opus_data: bytes) -> list:
+    """组装音频消息：[编码名, Opus数据]，原始字节直接发送，不经过pickle"""
+    return [AUDIO_CODEC_NAME, opus_data]
 
 
 def thread_send_audio():
@@ -301,7 +547,7 @@ def thread_send_audio():
         print("[音频发送线程] 音频功能未启用，线程退出")
         return
     
-    context = zmq.Context()
+    context = zmq.Context.instance()  # 各线程共享进程内唯一的上下文（一个libzmq I/O线程）
     socket = context.socket(zmq.PUSH)
     socket.setsockopt(zmq.SNDHWM, 10)  # 音频允许更多缓冲
     socket.setsockopt(zmq.LINGER, 0)
@@ -309,85 +555,165 @@ def thread_send_audio():
         socket.setsockopt(1, 1)  # TCP_NODELAY
     except:
         pass
-    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_AUDIO}")
+    socket.connect(ENDPOINT_AUDIO)
     
-    print(f"[音频发送线程] 已连接到 B: {SERVER_B_HOST}:{SERVER_B_PORT_AUDIO}")
+    print(f"[音频发送线程] 已连接到 B: {ENDPOINT_AUDIO}")
     print(f"[音频发送线程] 独立音频流已启动")
     
     sent_count = 0
+    send_dropped = 0  # NOBLOCK 发送失败（zmq.Again）丢弃的帧数
+    report_count = 0  # 上次打印统计时的 sent_count
     start_time = time.time()
     
     try:
         while True:
             # 从队列获取音频数据（阻塞）
             try:
-                audio_data = audio_encoded_queue.get(timeout=1.0)
+                batch = [audio_encoded_queue.get(timeout=1.0)]
+                
+                # 合并多帧为一条消息：继续取帧直到 AUDIO_SEND_BATCH 帧或等待窗口结束
+                # （窗口为0时只合并已积压的帧，不额外增加延迟）
+                deadline = time.monotonic() + AUDIO_SEND_BATCH_WINDOW
+                while len(batch) < AUDIO_SEND_BATCH:
+                    try:
+                        batch.append(audio_encoded_queue.get_nowait())
+                    except queue.Empty:
+                        if time.monotonic() >= deadline:
+                            break
+                        time.sleep(AUDIO_QUEUE_POLL_INTERVAL)
                 
-                # 发送音频数据
-                socket.send(pickle.dumps(audio_data, protocol=pickle.HIGHEST_PROTOCOL))
-                sent_count += 1
+                audio_parts = []
+                for opus_data in batch:
+                    audio_parts.extend(pack_audio_frame(opus_data))
                 
-                # 统计信息
-                if sent_count % 50 == 0:
-                    elapsed = time.time() - start_time
-                    fps = 50 / elapsed if elapsed > 0 else 0
-                    queue_size = audio_encoded_queue.qsize()
-                    print(f"[音频发送线程] 已发送 {sent_count} 帧, FPS: {fps:.1f}, "
-                          f"队列: {queue_size}/{audio_encoded_queue.maxsize}")
-                    start_time = time.time()
+                # 发送音频数据：[编码名0, 音频0, 编码名1, 音频1, ...]（copy=False：libzmq直接引用Opus数据）
+                try:
+                    socket.send_multipart(audio_parts, zmq.NOBLOCK, copy=False)
+                except zmq.Again:
+                    send_dropped += len(batch)  # B未连接或发送队列已满：丢弃本批，不阻塞音频队列
+                else:
+                    sent_count += len(batch)
                     
+                    # 统计信息
+                    if sent_count - report_count >= 50:
+                        elapsed = time.time() - start_time
+                        fps = (sent_count - report_count) / elapsed if elapsed > 0 else 0
+                        report_count = sent_count
+                        queue_size = audio_encoded_queue.qsize()
+                        print(f"[音频发送线程] 已发送 {sent_count} 帧 (丢弃 {send_dropped}), FPS: {fps:.1f}, "
+                              f"队列: {queue_size}/{audio_encoded_queue.maxsize}")
+                        start_time = time.time()
+                        
             except queue.Empty:
                 continue
                 
     except KeyboardInterrupt:
         print("\n[音频发送线程] 停止中...")
     finally:
-        socket.close()
-        context.term()
+        socket.close()  # 共享上下文不在线程内term
         print("[音频发送线程] 已关闭")
 
 
-def thread_send_data():
-    """线程3：发送视频数据（不再包含音频）"""
-    context = zmq.Context()
-    
-    # 配置 socket
-    socket = context.socket(zmq.PUSH)
-    socket.setsockopt(zmq.SNDHWM, 1)
-    socket.setsockopt(zmq.LINGER, 0)
-    try:
-        socket.setsockopt(1, 1)  # TCP_NODELAY
-    except:
-        pass
-    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_DATA}")
-    
-    print(f"[数据线程] 已连接到 B: {SERVER_B_HOST}:{SERVER_B_PORT_DATA}")
-    
-    # 打开摄像头
+def is_yuyv_frame(frame) -> bool:
+    """CONVERT_RGB关闭时，V4L2后端返回打包的YUYV帧：(H, W, 2)，通道0为Y，通道1为交替的U/V"""
+    return frame.ndim == 3 and frame.shape[2] == 2
+
+
+def is_mjpeg_frame(frame) -> bool:
+    """CONVERT_RGB关闭且摄像头输出MJPG时，V4L2后端返回压缩的JPEG码流：(1, N) uint8"""
+    return frame.ndim == 2 and frame.shape[0] == 1
+
+
+def yuyv_to_planar(frame):
+    """打包的YUYV (H, W, 2) → 平面YUV 4:2:2 缓冲区 [Y | U | V]（TurboJPEG encode_from_yuv 的输入格式）"""
+    return np.concatenate((frame[:, :, 0].ravel(), frame[:, 0::2, 1].ravel(), frame[:, 1::2, 1].ravel()))
+
+
+def open_camera():
+    """打开并配置摄像头（USE_RAW_MJPEG 时请求原始MJPG码流，否则 USE_YUYV_CAPTURE 且TurboJPEG可用时请求原始YUYV输出）"""
     cap = cv2.VideoCapture(CAMERA_ID)
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, VIDEO_WIDTH)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, VIDEO_HEIGHT)
     cap.set(cv2.CAP_PROP_FPS, VIDEO_FPS)
     cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    if USE_RAW_MJPEG:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+    elif USE_YUYV_CAPTURE and TURBOJPEG_AVAILABLE:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'YUYV'))
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+    return cap
+
+
+def frame_unchanged(frame, prev_small):
+    """
+    判断画面相对上次编码的帧是否基本无变化：只比较降采样后的约1/64像素（cv2.absdiff/sumElems 为SIMD实现）
+    返回 (是否无变化, 本帧降采样图)；原始MJPG码流返回码流本身
+    """
+    if is_mjpeg_frame(frame):
+        # 原始MJPG码流直接转发、不需要编码，不为静止检测解码：只比较压缩码流是否逐字节相同（摄像头重复输出同一帧时命中）
+        data = frame.reshape(-1)
+        return prev_small is not None and np.array_equal(data, prev_small), data
+    small = np.ascontiguousarray(frame[::STATIC_DIFF_STRIDE, ::STATIC_DIFF_STRIDE])
+    if prev_small is None or prev_small.shape != small.shape:
+        return False, small
+    mean_diff = sum(cv2.sumElems(cv2.absdiff(small, prev_small))) / small.size
+    return mean_diff < STATIC_DIFF_THRESHOLD, small
+
+
+def create_jpeg_encoder():
+    """
+    创建JPEG编码函数 frame(BGR或YUYV) -> JPEG缓冲区
+    优先使用TurboJPEG（复用同一个编码器句柄；YUYV帧直接从YUV平面编码），libturbojpeg缺失时回退到cv2.imencode
+    """
+    if TURBOJPEG_AVAILABLE:
+        try:
+            tj = TurboJPEG()
+            print("[数据线程] JPEG编码: TurboJPEG")
+            
+            def encode_turbo(frame):
+                if is_yuyv_frame(frame):
+                    height, width = frame.shape[:2]
+                    return tj.encode_from_yuv(yuyv_to_planar(frame), height, width,
+                                              quality=JPEG_QUALITY, jpeg_subsample=TJSAMP_422)
+                return tj.encode(frame, quality=JPEG_QUALITY,
+                                 pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420)
+            return encode_turbo
+        except (OSError, RuntimeError) as e:
+            print(f"[数据线程] TurboJPEG不可用（{e}），回退到cv2.imencode")
     
-    print(f"[数据线程] 摄像头已打开: {VIDEO_WIDTH}x{VIDEO_HEIGHT} @ {VIDEO_FPS} FPS")
+    # 参数只构造一次（int32数组，OpenCV按 vector<int> 直接读取）；显式关闭哈夫曼表优化和渐进式编码
+    encode_param = np.array([cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+                             cv2.IMWRITE_JPEG_PROGRESSIVE, 0], dtype=np.int32)
+    cv2.setNumThreads(1)  # 小图逐帧处理用不上OpenCV线程池，避免工作线程与音频/命令线程争抢CPU
+    print("[数据线程] JPEG编码: cv2.imencode")
     
-    # JPEG 编码参数
-    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY]
+    def encode_cv2(frame):
+        if is_yuyv_frame(frame):
+            frame = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_YUYV)
+        return cv2.imencode('.jpg', frame, encode_param)[1]
+    return encode_cv2
+
+
+def thread_capture_video():
+    """线程4：只负责读取摄像头，把最新一帧放入槽位；JPEG编码和发送在 thread_send_data 中进行，不阻塞读取"""
+    global latest_video_frame
     
-    frame_count = 0
-    sent_count = 0
-    start_time = time.time()
+    # 打开摄像头
+    cap = open_camera()
+    
+    print(f"[采集线程] 摄像头已打开: {VIDEO_WIDTH}x{VIDEO_HEIGHT} @ {VIDEO_FPS} FPS")
     
+    frame_count = 0
     try:
         while True:
-            # 读取视频帧
+            # 读取视频帧（按摄像头帧率阻塞）
             ret, frame = cap.read()
             if not ret:
-                print("[数据线程] 无法读取帧，尝试重新打开...")
+                print("[采集线程] 无法读取帧，尝试重新打开...")
                 cap.release()
                 time.sleep(1)
-                cap = cv2.VideoCapture(CAMERA_ID)
+                cap = open_camera()
                 continue
             
             frame_count += 1
@@ -396,44 +722,116 @@ def thread_send_data():
             if frame_count % FRAME_SKIP != 0:
                 continue
             
-            timestamp = time.time()
-            
-            # JPEG 编码
-            _, encoded_frame = cv2.imencode('.jpg', frame, encode_param)
-            video_bytes = encoded_frame.tobytes()
+            with video_frame_lock:
+                latest_video_frame = (frame, time.time())
+            video_frame_event.set()
             
-            # 准备数据包（不再包含音频，音频由独立线程发送）
-            frame_data = {
-                "image.left_wrist": video_bytes,
-                "image.top": video_bytes,  # 单摄像头复用
-                "timestamp": timestamp,
-            }
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cap.release()
+
+
+def thread_send_data():
+    """线程3：发送视频数据（不再包含音频）"""
+    context = zmq.Context.instance()  # 各线程共享进程内唯一的上下文（一个libzmq I/O线程）
+    
+    # 配置 socket
+    socket = context.socket(zmq.PUSH)
+    socket.setsockopt(zmq.SNDHWM, 1)
+    socket.setsockopt(zmq.LINGER, 0)
+    try:
+        socket.setsockopt(1, 1)  # TCP_NODELAY
+    except:
+        pass
+    socket.connect(ENDPOINT_DATA)
+    
+    print(f"[数据线程] 已连接到 B: {ENDPOINT_DATA}")
+    
+    # JPEG 编码器（TurboJPEG 或 cv2.imencode）
+    encode_jpeg = create_jpeg_encoder()
+    
+    sent_count = 0
+    send_dropped = 0  # NOBLOCK 发送失败（zmq.Again）丢弃的帧数
+    encoded_frame = None
+    prev_small = None  # 上次编码帧的降采样图
+    static_count = 0  # 连续复用上次编码结果的帧数
+    stats_start_ns = time.monotonic_ns()
+    
+    # 绝对截止时间调度：采集线程按摄像头帧率更新槽位，这里按发送帧率取最新帧
+    period_ns = int(1e9 * FRAME_SKIP / VIDEO_FPS)
+    start_ns = time.monotonic_ns()
+    tick = 0  # 自 start_ns 起已调度的帧数
+    
+    try:
+        while True:
+            # 等待采集线程放入新帧，取出最新一帧（期间被覆盖的旧帧不再编码）
+            video_frame_event.wait()
+            video_frame_event.clear()
+            with video_frame_lock:
+                frame, timestamp = latest_video_frame
             
-            # 发送视频数据
-            socket.send(pickle.dumps(frame_data, protocol=pickle.HIGHEST_PROTOCOL))
-            sent_count += 1
+            # JPEG 编码；静止画面复用上次的编码结果
+            unchanged, small = frame_unchanged(frame, prev_small) if SKIP_STATIC_FRAMES else (False, None)
+            if unchanged and encoded_frame is not None:
+                static_count += 1
+            else:
+                # 原始MJPG码流本身就是JPEG，直接发送；已解码的帧才需要编码
+                encoded_frame = frame.reshape(-1) if is_mjpeg_frame(frame) else encode_jpeg(frame)
+                prev_small = small
+                static_count = 0
             
-            # 统计信息
-            if sent_count % 20 == 0:
-                elapsed = time.time() - start_time
-                fps = 20 / elapsed if elapsed > 0 else 0
-                queue_status = f"音频队列: {audio_encoded_queue.qsize()}" if audio_enabled else ""
-                print(f"[视频发送线程] 已发送 {sent_count} 帧, FPS: {fps:.1f}, "
-                      f"视频: {len(video_bytes)}B, {queue_status}")
-                start_time = time.time()
+            # 静止画面时跳过发送，每 STATIC_KEEPALIVE_FRAMES 帧保活一次
+            if static_count % STATIC_KEEPALIVE_FRAMES == 0:
+                # 发送视频数据（不再包含音频，音频由独立线程发送）：固定帧头 + JPEG缓冲区
+                # copy=False：libzmq直接引用编码结果缓冲区，发送完成前由消息持有引用；下一帧编码会分配新缓冲区
+                # B端单摄像头复用为 left_wrist 和 top
+                header = VIDEO_FRAME_HEADER.pack(timestamp, len(encoded_frame))
+                try:
+                    socket.send_multipart([header, encoded_frame], zmq.NOBLOCK, copy=False)
+                except zmq.Again:
+                    send_dropped += 1  # B未连接或发送队列已满（SNDHWM）：丢弃本帧，不阻塞采集/编码
+                else:
+                    sent_count += 1
+                    
+                    # 统计信息
+                    if sent_count % 20 == 0:
+                        elapsed = (time.monotonic_ns() - stats_start_ns) / 1e9
+                        fps = 20 / elapsed if elapsed > 0 else 0
+                        queue_status = f"音频队列: {audio_encoded_queue.qsize()}" if audio_enabled else ""
+                        print(f"[视频发送线程] 已发送 {sent_count} 帧 (丢弃 {send_dropped}), FPS: {fps:.1f}, "
+                              f"视频: {len(encoded_frame)}B, {queue_status}")
+                        stats_start_ns = time.monotonic_ns()
             
-            # 控制帧率
-            time.sleep(1.0 / (VIDEO_FPS / FRAME_SKIP))
+            # 控制帧率：第 tick 帧截止于 start_ns + tick*period_ns（整数纳秒，不累积误差），落后时从当前时刻重新对齐
+            tick += 1
+            delay_ns = start_ns + tick * period_ns - time.monotonic_ns()
+            if delay_ns > 0:
+                time.sleep(delay_ns / 1e9)
+            else:
+                start_ns = time.monotonic_ns()
+                tick = 0
             
     except KeyboardInterrupt:
         print("\n[数据线程] 停止中...")
     finally:
-        cap.release()
-        socket.close()
-        context.term()
+        socket.close()  # 共享上下文不在线程内term
+
+
+def select_device_sample_rate():
+    """按 AUDIO_DEVICE_SAMPLE_RATES 的顺序返回默认输入设备支持的第一个采集采样率（都不支持时用最后一个）"""
+    for rate in AUDIO_DEVICE_SAMPLE_RATES:
+        try:
+            sd.check_input_settings(channels=AUDIO_CHANNELS, samplerate=rate, dtype='float32')
+            return rate
+        except Exception:
+            continue
+    return AUDIO_DEVICE_SAMPLE_RATES[-1]
 
 
 def main():
+    global audio_device_rate, audio_ring
+    
     print("=" * 70)
     print("服务器 C 启动 - 音频降噪优化版")
     print("=" * 70)
@@ -444,19 +842,24 @@ def main():
     print()
     
     if audio_enabled:
+        audio_device_rate = select_device_sample_rate()
+        audio_ring = np.zeros((AUDIO_RING_SLOTS, AUDIO_CHUNK_SIZE * (audio_device_rate // AUDIO_SAMPLE_RATE)),
+                              dtype=np.float32)
         print(f"音频配置:")
-        print(f"  - 采样率: {AUDIO_SAMPLE_RATE} Hz")
+        print(f"  - 采样率: {AUDIO_SAMPLE_RATE} Hz"
+              + (f"（设备 {audio_device_rate} Hz，{audio_device_rate // AUDIO_SAMPLE_RATE}:1 抽取）"
+                 if audio_device_rate != AUDIO_SAMPLE_RATE else ""))
         print(f"  - 声道: {AUDIO_CHANNELS}")
         print(f"  - Opus 比特率: {OPUS_BITRATE} bps")
         print(f"  - 帧大小: {OPUS_FRAME_SIZE} 样本 ({OPUS_FRAME_SIZE/AUDIO_SAMPLE_RATE*1000:.0f}ms)")
         print(f"  - 状态: ✅ 启用")
         print()
         print(f"降噪配置:")
-        print(f"  - 深度降噪 (noisereduce): {'✅ 启用' if ENABLE_NOISEREDUCE else '❌ 禁用'}")
+        print(f"  - 谱减降噪: {'✅ 启用' if ENABLE_NOISEREDUCE else '❌ 禁用'}")
         if ENABLE_NOISEREDUCE:
             print(f"    · 噪声学习帧数: {NOISE_PROFILE_FRAMES} ({NOISE_PROFILE_FRAMES * OPUS_FRAME_SIZE / AUDIO_SAMPLE_RATE:.1f}秒)")
-            print(f"    · 模式: 非平稳降噪（智能）")
-            print(f"    · 预计延迟: +5-10ms/帧")
+            print(f"    · FFT: {NR_FFT_SIZE} 点, 跳步 {NR_HOP_SIZE} 样本")
+            print(f"    · 预计延迟: +{NR_HOP_SIZE / AUDIO_SAMPLE_RATE * 1000:.0f}ms")
         print(f"  - 噪声门 (Noise Gate): {'✅ 启用' if ENABLE_NOISE_GATE else '❌ 禁用'}")
         if ENABLE_NOISE_GATE:
             print(f"    · 阈值: {NOISE_GATE_THRESHOLD}")
@@ -492,15 +895,18 @@ def main():
     command_thread = threading.Thread(target=thread_receive_commands, daemon=True)
     command_thread.start()
     
-    # 启动线程2: 音频发送（独立）
+    # 启动线程2: 音频发送（独立），线程5: 音频处理（降噪/编码）
     audio_send_thread = None
     if audio_enabled:
         audio_send_thread = threading.Thread(target=thread_send_audio, daemon=True)
         audio_send_thread.start()
+        threading.Thread(target=thread_process_audio, daemon=True).start()
     
-    # 启动线程3: 视频发送
+    # 启动线程3: 视频编码/发送，线程4: 摄像头采集
     data_thread = threading.Thread(target=thread_send_data, daemon=True)
     data_thread.start()
+    capture_thread = threading.Thread(target=thread_capture_video, daemon=True)
+    capture_thread.start()
     
     # 如果音频启用，启动音频流
     audio_stream = None
@@ -508,10 +914,11 @@ def main():
         try:
             print("🎤 启动音频采集流...")
             audio_stream = sd.InputStream(
-                samplerate=AUDIO_SAMPLE_RATE,
+                samplerate=audio_device_rate,
                 channels=AUDIO_CHANNELS,
                 dtype='float32',
-                blocksize=AUDIO_CHUNK_SIZE,
+                blocksize=AUDIO_CHUNK_SIZE * (audio_device_rate // AUDIO_SAMPLE_RATE),  # 抽取后为一帧
+                latency='low',  # 使用设备的低延迟缓冲设置
                 callback=audio_callback
             )
             audio_stream.start()
@@ -533,12 +940,15 @@ def main():
     if audio_enabled:
         print("  线程2: 音频发送 (C→B:5559) ← 独立音频流")
         if ENABLE_NOISEREDUCE:
-            print("         └─ 深度降噪 (noisereduce)")
+            print("         └─ 谱减降噪")
         if ENABLE_NOISE_GATE:
             print("         └─ 噪声门 (阈值 500)")
     else:
         print("  线程2: 音频发送 (禁用)")
-    print("  线程3: 视频发送 (C→B:5558)")
+    print("  线程3: 视频编码/发送 (C→B:5558)")
+    print("  线程4: 摄像头采集（只保留最新帧）")
+    if audio_enabled:
+        print("  线程5: 音频处理（降噪/编码，音频回调只拷贝数据）")
     print("按 Ctrl+C 停止...")
     print("=" * 70)
     print()
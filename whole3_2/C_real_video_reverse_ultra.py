@@ -1,6 +1,8 @@
 # C_real_video_reverse.py - 极致优化版本
 # 目标延迟: < 500ms
 
+import os
+import argparse
 import time
 import threading
 from datetime import datetime
@@ -8,12 +10,22 @@ from zmq_base import TorchSerializer
 import zmq
 import cv2
 import numpy as np
-import pickle
+import struct
+
+# 可选：libjpeg-turbo（SIMD加速的色彩转换/DCT，比cv2.imencode快2-4倍），未安装时回退到cv2.imencode
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJPF_GRAY, TJSAMP_420, TJSAMP_GRAY
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TURBOJPEG_AVAILABLE = False
 
 # --- 极致优化配置 ---
 SERVER_B_HOST = "localhost"
 SERVER_B_PORT_COMMAND = 5556
 SERVER_B_PORT_VIDEO = 5558
+# ZMQ端点（可用环境变量覆盖；与B在同一台机器时可设为 ipc:///tmp/imu_rs485_b_<端口>，B端已同时绑定）
+ENDPOINT_COMMAND = os.environ.get("ZMQ_C_COMMAND_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+ENDPOINT_VIDEO = os.environ.get("ZMQ_C_VIDEO_EP", f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_VIDEO}")
 
 # 摄像头配置 - 极致优化
 CAMERA_ID = 0
@@ -23,6 +35,18 @@ VIDEO_HEIGHT = 180
 JPEG_QUALITY = 30  # 极低画质
 FRAME_SKIP = 1  # 跳帧：1=不跳帧，2=跳过50%，3=跳过66%
 ENABLE_OSD = False  # 禁用 OSD 绘制以节省时间
+GRAYSCALE = False  # 灰度编码（无OSD时仅作监控预览，JPEG输入数据量降为1/3；可用 --grayscale 开启）
+USE_RAW_MJPEG = True  # 摄像头输出MJPG时直接取原始JPEG码流，跳过 解码→imencode 重编码
+
+# CPU绑定与调度优先级（仅Linux生效；核心编号超出本机CPU数量时自动跳过，设为None禁用）
+VIDEO_THREAD_CPU = 2       # 视频采集/发送线程
+COMMAND_THREAD_CPU = 2     # 命令接收线程（与视频线程共用，避免占用更多核心）
+ZMQ_IO_THREAD_CPU = 3      # libzmq I/O线程（相邻核心）
+THREAD_NICE_INCREMENT = -5  # 提高优先级（需要CAP_SYS_NICE/root，无权限时忽略）
+
+# 视频帧头：采集时间戳(float64) + JPEG长度(uint32)，小端，共12字节
+# 每帧以两帧消息发送：[帧头, JPEG]，不经过pickle
+VIDEO_FRAME_HEADER = struct.Struct("<dI")
 # ------------
 
 # 全局状态
@@ -31,44 +55,150 @@ latest_command = {
     "throttle": 0,
     "timestamp": time.time()
 }
+latest_command_raw = None  # 尚未解码的最新命令原始字节（命令线程只保存，读取时才反序列化）
 command_lock = threading.Lock()
 
 
+def pin_current_thread(cpu, label):
+    """
+    将当前线程绑定到指定CPU并提高调度优先级（Linux下os.sched_setaffinity(0)/os.nice只作用于调用线程）
+    不支持的平台、CPU不存在或权限不足时打印提示并继续
+    """
+    if cpu is None or not hasattr(os, "sched_setaffinity"):
+        return
+    if cpu >= (os.cpu_count() or 1):
+        print(f"[{label}] CPU {cpu} 不存在，跳过CPU绑定")
+        return
+    try:
+        os.sched_setaffinity(0, {cpu})
+        print(f"[{label}] 已绑定到 CPU {cpu}")
+    except OSError as e:
+        print(f"[{label}] CPU绑定失败: {e}")
+    if THREAD_NICE_INCREMENT:
+        try:
+            os.nice(THREAD_NICE_INCREMENT)
+        except OSError:
+            print(f"[{label}] 无权限提高调度优先级（需要root），保持默认")
+
+
+_context_lock = threading.Lock()
+_shared_context = None
+
+
+def create_pinned_context():
+    """
+    获取进程内共享的ZMQ上下文（命令线程与视频线程共用一个libzmq I/O线程），
+    首次创建时将I/O线程绑定到 ZMQ_IO_THREAD_CPU（libzmq >= 4.3 支持，须在创建socket前设置）
+    """
+    global _shared_context
+    with _context_lock:
+        if _shared_context is None:
+            context = zmq.Context.instance()
+            if (ZMQ_IO_THREAD_CPU is not None and hasattr(zmq, "THREAD_AFFINITY_CPU_ADD")
+                    and ZMQ_IO_THREAD_CPU < (os.cpu_count() or 1)):
+                try:
+                    context.set(zmq.THREAD_AFFINITY_CPU_ADD, ZMQ_IO_THREAD_CPU)
+                except zmq.ZMQError:
+                    pass
+            _shared_context = context
+        return _shared_context
+
+
+def get_latest_command():
+    """返回最新命令字典：只在读取时反序列化最新一条（命令线程不再逐条pickle解码，期间被覆盖的旧命令不解码）"""
+    global latest_command, latest_command_raw
+    with command_lock:
+        raw, latest_command_raw = latest_command_raw, None
+        if raw is not None:
+            latest_command = TorchSerializer.from_bytes(raw)
+        return latest_command
+
+
 def thread_receive_commands():
     """接收控制命令"""
-    global latest_command
+    global latest_command_raw
     
-    context = zmq.Context()
+    pin_current_thread(COMMAND_THREAD_CPU, "命令线程")
+    context = create_pinned_context()
     socket = context.socket(zmq.PULL)
-    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+    socket.connect(ENDPOINT_COMMAND)
     
-    print(f"[命令线程] 已连接到 B: {SERVER_B_HOST}:{SERVER_B_PORT_COMMAND}")
+    print(f"[命令线程] 已连接到 B: {ENDPOINT_COMMAND}")
     print(f"[命令线程] 等待接收控制命令...")
     
     received_count = 0
     try:
         while True:
             raw_data = socket.recv()
-            command = TorchSerializer.from_bytes(raw_data)
             received_count += 1
             
             with command_lock:
-                latest_command = command
+                latest_command_raw = raw_data
             
             # 打印收到的命令（每10条打印一次）
             if received_count % 10 == 0:
-                print(f"[命令线程] 已接收 {received_count} 条命令, 最新: {command.get('euler_angles', {})}")
+                print(f"[命令线程] 已接收 {received_count} 条命令, 最新: {get_latest_command().get('euler_angles', {})}")
                 
     except KeyboardInterrupt:
         pass
     finally:
-        socket.close()
-        context.term()
+        socket.close()  # 共享上下文不在线程内term
+
+
+def open_camera():
+    """
+    打开并配置摄像头
+    
+    请求MJPG格式；USE_RAW_MJPEG时关闭RGB转换，V4L2后端会直接返回压缩的JPEG码流（1xN uint8），
+    不支持的后端/平台上设置无效，read()照常返回BGR图像，由调用方回退到imencode。
+    """
+    cap = cv2.VideoCapture(CAMERA_ID)
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, VIDEO_WIDTH)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, VIDEO_HEIGHT)
+    cap.set(cv2.CAP_PROP_FPS, VIDEO_FPS)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # 最小缓冲
+    if USE_RAW_MJPEG:
+        try:
+            cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        except Exception:
+            pass
+    return cap
+
+
+def create_jpeg_encoder():
+    """
+    创建JPEG编码函数 frame(BGR) -> JPEG缓冲区
+    优先使用TurboJPEG（复用同一个编码器句柄），libturbojpeg缺失时回退到cv2.imencode；
+    GRAYSCALE时先转为单通道灰度再编码（接收端imdecode照常得到3通道图像）
+    """
+    if TURBOJPEG_AVAILABLE:
+        try:
+            tj = TurboJPEG()
+            print(f"[视频线程] JPEG编码: TurboJPEG{'（灰度）' if GRAYSCALE else ''}")
+            if GRAYSCALE:
+                return lambda frame: tj.encode(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)[:, :, None],
+                                               quality=JPEG_QUALITY, pixel_format=TJPF_GRAY,
+                                               jpeg_subsample=TJSAMP_GRAY)
+            return lambda frame: tj.encode(frame, quality=JPEG_QUALITY,
+                                           pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420)
+        except (OSError, RuntimeError) as e:
+            print(f"[视频线程] TurboJPEG不可用（{e}），回退到cv2.imencode")
+    
+    # 参数只构造一次（int32数组，OpenCV按 vector<int> 直接读取）；显式关闭哈夫曼表优化和渐进式编码
+    encode_param = np.array([cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+                             cv2.IMWRITE_JPEG_PROGRESSIVE, 0], dtype=np.int32)
+    cv2.setNumThreads(1)  # 小图逐帧处理用不上OpenCV线程池，避免工作线程与音频/命令线程争抢CPU
+    print(f"[视频线程] JPEG编码: cv2.imencode{'（灰度）' if GRAYSCALE else ''}")
+    if GRAYSCALE:
+        return lambda frame: cv2.imencode('.jpg', cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), encode_param)[1]
+    return lambda frame: cv2.imencode('.jpg', frame, encode_param)[1]
 
 
 def thread_send_video():
     """发送视频流 - 极致优化版"""
-    context = zmq.Context()
+    pin_current_thread(VIDEO_THREAD_CPU, "视频线程")
+    context = create_pinned_context()
     
     # 优化的 socket 配置
     socket = context.socket(zmq.PUSH)
@@ -81,30 +211,32 @@ def thread_send_video():
         pass  # 如果不支持就跳过
     # SNDBUF 使用 zmq.SNDBUF
     try:
-        socket.setsockopt(zmq.SNDBUF, 32768)  # 减小发送缓冲 (32KB)
+        socket.setsockopt(zmq.SNDBUF, 8192)  # 减小发送缓冲 (8KB)，限制TCP层积压的旧帧
     except:
         pass
-    socket.connect(f"tcp://{SERVER_B_HOST}:{SERVER_B_PORT_VIDEO}")
+    socket.setsockopt(zmq.IMMEDIATE, 1)  # B未连接时直接丢弃，不在本地排队
+    # 注意：不使用CONFLATE——视频为两帧消息 [帧头, JPEG]，CONFLATE不支持多帧消息；SNDHWM=1已只保留最新帧
+    socket.connect(ENDPOINT_VIDEO)
     
-    print(f"[视频线程] 已连接到 B: {SERVER_B_HOST}:{SERVER_B_PORT_VIDEO}")
+    print(f"[视频线程] 已连接到 B: {ENDPOINT_VIDEO}")
     
     # 打开摄像头
-    cap = cv2.VideoCapture(CAMERA_ID)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, VIDEO_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, VIDEO_HEIGHT)
-    cap.set(cv2.CAP_PROP_FPS, VIDEO_FPS)
-    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # 最小缓冲
+    cap = open_camera()
     
     print(f"[视频线程] 摄像头已打开，分辨率: {VIDEO_WIDTH}x{VIDEO_HEIGHT}, FPS: {VIDEO_FPS}")
     print(f"[视频线程] 跳帧策略: 每 {FRAME_SKIP} 帧发送 1 帧")
     
-    # JPEG 编码参数
-    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY]
+    # JPEG 编码器
+    encode_jpeg = create_jpeg_encoder()
     
     frame_count = 0
     sent_count = 0
     start_time = time.time()
     
+    # 绝对截止时间调度：按固定周期发送，处理耗时不累加到周期上
+    period = FRAME_SKIP / VIDEO_FPS
+    next_t = time.monotonic()
+    
     try:
         while True:
             ret, frame = cap.read()
@@ -112,7 +244,7 @@ def thread_send_video():
                 print("[视频] 无法读取帧，尝试重新打开摄像头...")
                 cap.release()
                 time.sleep(1)
-                cap = cv2.VideoCapture(CAMERA_ID)
+                cap = open_camera()
                 continue
             
             frame_count += 1
@@ -124,17 +256,16 @@ def thread_send_video():
             # 记录采集时间
             capture_time = time.time()
             
-            # JPEG 编码（无 OSD 绘制）
-            _, encoded_frame = cv2.imencode('.jpg', frame, encode_param)
-            
-            # 最小化数据包
-            frame_data = {
-                "image": encoded_frame.tobytes(),
-                "timestamp": capture_time
-            }
+            if frame.ndim == 2 and frame.shape[0] == 1:
+                # 原始MJPG码流（CONVERT_RGB=0）：本身就是JPEG，直接发送
+                encoded_frame = frame.reshape(-1)
+            else:
+                # 已解码的BGR图像：JPEG 编码（无 OSD 绘制）
+                encoded_frame = encode_jpeg(frame)
             
-            # 发送 - 强制使用 pickle 以匹配 B 端
-            socket.send(pickle.dumps(frame_data, protocol=pickle.HIGHEST_PROTOCOL))
+            # 发送 - 固定帧头 + JPEG缓冲区（直接发送编码结果，无tobytes拷贝、无pickle）
+            header = VIDEO_FRAME_HEADER.pack(capture_time, len(encoded_frame))
+            socket.send_multipart([header, encoded_frame], copy=False)
             sent_count += 1
             
             # 统计
@@ -145,18 +276,30 @@ def thread_send_video():
                       f"大小: {len(encoded_frame)} bytes")
                 start_time = time.time()
             
-            # 控制帧率（实际发送频率）
-            time.sleep(1.0 / (VIDEO_FPS / FRAME_SKIP))
+            # 控制帧率（实际发送频率）：睡到下一个截止时间，落后时从当前时刻重新对齐
+            next_t += period
+            dt = next_t - time.monotonic()
+            if dt > 0:
+                time.sleep(dt)
+            else:
+                next_t = time.monotonic()
             
     except KeyboardInterrupt:
         print("\n[视频线程] 停止中...")
     finally:
         cap.release()
-        socket.close()
-        context.term()
+        socket.close()  # 共享上下文不在线程内term
 
 
 def main():
+    global GRAYSCALE
+    
+    parser = argparse.ArgumentParser(description="服务器 C - 极致优化版")
+    parser.add_argument("--grayscale", action="store_true",
+                        help="灰度编码视频（仅监控预览，减小帧大小；摄像头直出MJPG时不受影响）")
+    args = parser.parse_args()
+    GRAYSCALE = GRAYSCALE or args.grayscale
+    
     print("============================================================")
     print("服务器 C 启动 - 极致优化版（目标延迟 < 500ms）")
     print("============================================================")
@@ -165,6 +308,7 @@ def main():
     print(f"跳帧: 每 {FRAME_SKIP} 帧")
     print(f"画质: {JPEG_QUALITY}")
     print(f"OSD: {'启用' if ENABLE_OSD else '禁用'}")
+    print(f"灰度: {'启用' if GRAYSCALE else '禁用'}")
     print("============================================================")
     print("")
     
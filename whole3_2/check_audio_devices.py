@@ -3,8 +3,70 @@
 检查音频设备支持的采样率
 """
 
+import ctypes
+import ctypes.util
+import re
+
 import sounddevice as sd
 
+# 可选：直接用 libasound 在参数空间中测试采样率（只打开一次设备，不为每个采样率做一次完整的流打开探测）；
+# 非Linux或未安装alsa-lib时回退到 sd.check_input_settings
+try:
+    libasound = ctypes.CDLL(ctypes.util.find_library("asound") or "libasound.so.2")
+    ALSA_AVAILABLE = True
+except OSError:
+    ALSA_AVAILABLE = False
+
+SND_PCM_STREAM_CAPTURE = 1
+SND_PCM_NONBLOCK = 1
+
+TEST_RATES = [8000, 11025, 16000, 22050, 32000, 44100, 48000]
+
+
+def alsa_supported_rates(hw_name, channels, rates):
+    """
+    用ALSA硬件参数空间测试采样率：打开一次PCM、分配一次hw_params，逐个 snd_pcm_hw_params_test_rate；
+    设备无法打开或硬件不直接支持该声道数时返回 None，由调用方回退到 sounddevice
+    """
+    pcm = ctypes.c_void_p()
+    if libasound.snd_pcm_open(ctypes.byref(pcm), hw_name.encode(), SND_PCM_STREAM_CAPTURE, SND_PCM_NONBLOCK) < 0:
+        return None
+    params = ctypes.c_void_p()
+    try:
+        if libasound.snd_pcm_hw_params_malloc(ctypes.byref(params)) < 0:
+            return None
+        libasound.snd_pcm_hw_params_any(pcm, params)
+        if libasound.snd_pcm_hw_params_set_channels(pcm, params, channels) < 0:
+            return None  # hw设备不直接支持该声道数（如只有双声道），PortAudio可能仍可转换，交给sounddevice判断
+        return [rate for rate in rates if libasound.snd_pcm_hw_params_test_rate(pcm, params, rate, 0) == 0]
+    finally:
+        if params:
+            libasound.snd_pcm_hw_params_free(params)
+        libasound.snd_pcm_close(pcm)
+
+
+def supported_rates(index, dev, channels=1):
+    """设备支持的常见采样率：PortAudio的ALSA设备名带 (hw:X,Y) 时走 libasound，否则逐个 sd.check_input_settings"""
+    match = re.search(r"\((hw:\d+,\d+)\)", dev['name'])
+    if ALSA_AVAILABLE and match:
+        rates = alsa_supported_rates(match.group(1), channels, TEST_RATES)
+        if rates is not None:
+            return rates
+    
+    rates = []
+    for rate in TEST_RATES:
+        try:
+            sd.check_input_settings(
+                device=index,
+                channels=channels,
+                samplerate=rate
+            )
+            rates.append(rate)
+        except:
+            pass
+    return rates
+
+
 print("=" * 70)
 print("音频设备详细信息")
 print("=" * 70)
@@ -19,21 +81,7 @@ for i, dev in enumerate(devices):
         print(f"  默认采样率: {dev['default_samplerate']} Hz")
         
         # 测试常见采样率
-        supported_rates = []
-        test_rates = [8000, 11025, 16000, 22050, 32000, 44100, 48000]
-        
-        for rate in test_rates:
-            try:
-                sd.check_input_settings(
-                    device=i,
-                    channels=1,
-                    samplerate=rate
-                )
-                supported_rates.append(rate)
-            except:
-                pass
-        
-        print(f"  支持的采样率: {supported_rates}")
+        print(f"  支持的采样率: {supported_rates(i, dev)}")
         print()
 
 print("=" * 70)
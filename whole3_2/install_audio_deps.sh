@@ -43,6 +43,9 @@ if [ $? -ne 0 ]; then
     exit 1
 fi
 
+# 可选：cffi（C 端通过 cffi 直接调用 libopus，调用开销低于 opuslib 的 ctypes 封装；失败不影响使用）
+pip install cffi || echo "⚠️ cffi 安装失败，将使用 opuslib 编码"
+
 echo ""
 echo "3. 验证安装..."
 
@@ -0,0 +1,120 @@
+# opus_encoder.py - Opus 编码器封装（C_real_video_audio*.py 共用）
+# 优先通过 cffi 直接调用 libopus：调用开销低于 opuslib 的 ctypes 封装，输出缓冲区只分配一次；
+# cffi 或 libopus 不可用时回退到 opuslib（接口相同：encode(pcm, frame_size) -> bytes）
+# pcm 可以是 bytes 或连续的 int16 numpy 数组，两种实现都直接取其内存地址，无需 tobytes() 拷贝；
+# float32 采集（[-1, 1]）可用 encode_float 直接编码，省去 float→int16 转换
+import ctypes
+import ctypes.util
+
+import numpy as np
+
+try:
+    from cffi import FFI
+    _ffi = FFI()
+    _ffi.cdef("""
+        typedef struct OpusEncoder OpusEncoder;
+        OpusEncoder *opus_encoder_create(int32_t Fs, int channels, int application, int *error);
+        int32_t opus_encode(OpusEncoder *st, const int16_t *pcm, int frame_size,
+                            unsigned char *data, int32_t max_data_bytes);
+        int32_t opus_encode_float(OpusEncoder *st, const float *pcm, int frame_size,
+                                  unsigned char *data, int32_t max_data_bytes);
+        int opus_encoder_ctl(OpusEncoder *st, int request, ...);
+        void opus_encoder_destroy(OpusEncoder *st);
+    """)
+    _libopus = _ffi.dlopen(ctypes.util.find_library("opus") or "libopus.so.0")
+    CFFI_OPUS_AVAILABLE = True
+except (ImportError, OSError):
+    CFFI_OPUS_AVAILABLE = False
+
+try:
+    import opuslib
+    import opuslib.api.encoder
+    OPUSLIB_AVAILABLE = True
+except ImportError:
+    OPUSLIB_AVAILABLE = False
+
+OPUS_AVAILABLE = CFFI_OPUS_AVAILABLE or OPUSLIB_AVAILABLE
+
+# libopus 常量（opus_defines.h）
+OPUS_OK = 0
+OPUS_APPLICATION_VOIP = 2048
+OPUS_APPLICATION_RESTRICTED_LOWDELAY = 2051  # 仅CELT：关闭SILK/混合模式，前瞻 2.5ms（VOIP为 6.5ms）
+OPUS_SET_BITRATE_REQUEST = 4002
+OPUS_SET_COMPLEXITY_REQUEST = 4010
+OPUS_MAX_PACKET_BYTES = 4000  # libopus 推荐的单包输出上限
+
+
+class CffiOpusEncoder:
+    """cffi 直接调用 libopus 的编码器，输出缓冲区在创建时分配并复用"""
+
+    def __init__(self, fs: int, channels: int, bitrate: int, complexity: int,
+                 application: int = OPUS_APPLICATION_VOIP):
+        error = _ffi.new("int *")
+        state = _libopus.opus_encoder_create(fs, channels, application, error)
+        if error[0] != OPUS_OK:
+            raise RuntimeError(f"opus_encoder_create 失败: {error[0]}")
+        self._state = _ffi.gc(state, _libopus.opus_encoder_destroy)
+        _libopus.opus_encoder_ctl(self._state, OPUS_SET_BITRATE_REQUEST, _ffi.cast("int32_t", bitrate))
+        _libopus.opus_encoder_ctl(self._state, OPUS_SET_COMPLEXITY_REQUEST, _ffi.cast("int32_t", complexity))
+        self._out = _ffi.new("unsigned char[]", OPUS_MAX_PACKET_BYTES)
+
+    def encode(self, pcm, frame_size: int) -> bytes:
+        """编码一帧 int16 PCM（bytes 或连续 numpy 数组，按缓冲区直接传指针），返回 Opus 数据"""
+        pcm_ptr = _ffi.cast("const int16_t *", _ffi.from_buffer(pcm))
+        n = _libopus.opus_encode(self._state, pcm_ptr, frame_size, self._out, OPUS_MAX_PACKET_BYTES)
+        if n < 0:
+            raise RuntimeError(f"opus_encode 失败: {n}")
+        return _ffi.buffer(self._out, n)[:]
+
+    def encode_float(self, pcm, frame_size: int) -> bytes:
+        """编码一帧 float32 PCM（连续数组，范围 [-1, 1]），返回 Opus 数据"""
+        pcm_ptr = _ffi.cast("const float *", _ffi.from_buffer(pcm))
+        n = _libopus.opus_encode_float(self._state, pcm_ptr, frame_size, self._out, OPUS_MAX_PACKET_BYTES)
+        if n < 0:
+            raise RuntimeError(f"opus_encode_float 失败: {n}")
+        return _ffi.buffer(self._out, n)[:]
+
+
+class OpuslibEncoder:
+    """opuslib 回退实现：绕过 Encoder.encode，直接把 PCM 缓冲区指针交给 libopus，输出缓冲区创建时分配并复用"""
+
+    def __init__(self, fs: int, channels: int, bitrate: int, complexity: int,
+                 application: int = OPUS_APPLICATION_VOIP):
+        self._encoder = opuslib.Encoder(fs=fs, channels=channels, application=application)
+        self._encoder.bitrate = bitrate
+        self._encoder.complexity = complexity
+        self._out = (ctypes.c_char * OPUS_MAX_PACKET_BYTES)()
+
+    def encode(self, pcm, frame_size: int) -> bytes:
+        pcm = np.frombuffer(pcm, dtype=np.int16)  # bytes/数组统一为int16视图（不拷贝）
+        pcm_ptr = pcm.ctypes.data_as(opuslib.api.c_int16_pointer)
+        n = opuslib.api.encoder.libopus_encode(
+            self._encoder.encoder_state, pcm_ptr, frame_size, self._out, OPUS_MAX_PACKET_BYTES)
+        if n < 0:
+            raise RuntimeError(f"opus_encode 失败: {n}")
+        return ctypes.string_at(self._out, n)  # 只拷贝实际编码长度
+
+    def encode_float(self, pcm, frame_size: int) -> bytes:
+        pcm = np.frombuffer(pcm, dtype=np.float32)
+        pcm_ptr = pcm.ctypes.data_as(opuslib.api.c_float_pointer)
+        n = opuslib.api.encoder.libopus_encode_float(
+            self._encoder.encoder_state, pcm_ptr, frame_size, self._out, OPUS_MAX_PACKET_BYTES)
+        if n < 0:
+            raise RuntimeError(f"opus_encode_float 失败: {n}")
+        return ctypes.string_at(self._out, n)
+
+
+def create_opus_encoder(fs: int, channels: int, bitrate: int, complexity: int,
+                        application: int = OPUS_APPLICATION_VOIP):
+    """创建 Opus 编码器（默认 VOIP 模式）：cffi 可用时直接调用 libopus，否则使用 opuslib"""
+    if CFFI_OPUS_AVAILABLE:
+        try:
+            return CffiOpusEncoder(fs, channels, bitrate, complexity, application)
+        except RuntimeError as e:
+            if not OPUSLIB_AVAILABLE:
+                raise RuntimeError(f"cffi 编码器创建失败（{e}），且未安装 opuslib，无可用的 Opus 编码器") from e
+            print(f"[Opus] cffi 编码器创建失败（{e}），回退到 opuslib")
+
+    if not OPUSLIB_AVAILABLE:
+        raise RuntimeError("libopus(cffi) 与 opuslib 均不可用，无法创建 Opus 编码器")
+    return OpuslibEncoder(fs, channels, bitrate, complexity, application)
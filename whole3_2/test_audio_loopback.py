@@ -26,6 +26,9 @@ except ImportError as e:
     print("安装方法: pip install opuslib")
     exit(1)
 
+# 编码使用与 C 端相同的封装（cffi 直接调用 libopus，输出缓冲区复用；否则回退 opuslib）
+from opus_encoder import create_opus_encoder
+
 # --- 音频配置 ---
 SAMPLE_RATE = 48000  # 使用设备支持的采样率
 CHANNELS = 1
@@ -56,9 +59,10 @@ def audio_input_callback(indata, frames, time_info, status):
         print(f"[采集] 状态: {status}")
     
     try:
-        # 转换为 int16
-        audio_data = (indata[:, 0] * 32767).astype(np.int16)
-        audio_queue.put_nowait(audio_data.copy())
+        # 转换为 int16（一次乘法直接写入新数组，不再额外 astype/copy）
+        audio_data = np.empty(frames, dtype=np.int16)
+        np.multiply(indata[:, 0], 32767, out=audio_data, casting='unsafe')
+        audio_queue.put_nowait(audio_data)
         
         with stats_lock:
             stats["captured"] += 1
@@ -72,13 +76,7 @@ def thread_encode():
     print("[编码线程] 启动...")
     
     try:
-        encoder = opuslib.Encoder(
-            fs=SAMPLE_RATE,
-            channels=CHANNELS,
-            application=opuslib.APPLICATION_VOIP
-        )
-        encoder.bitrate = BITRATE
-        encoder.complexity = COMPLEXITY
+        encoder = create_opus_encoder(SAMPLE_RATE, CHANNELS, BITRATE, COMPLEXITY)
         print(f"[编码线程] Opus 编码器已创建 (比特率: {BITRATE} bps)")
     except Exception as e:
         print(f"[编码线程] ❌ 创建编码器失败: {e}")
@@ -86,14 +84,11 @@ def thread_encode():
     
     while True:
         try:
-            # 获取 PCM 数据
+            # 获取 PCM 数据（连续的 int16 数组）
             pcm_data = audio_queue.get(timeout=1.0)
             
-            # 确保数据连续
-            pcm_bytes = np.ascontiguousarray(pcm_data).tobytes()
-            
-            # Opus 编码
-            opus_data = encoder.encode(pcm_bytes, FRAME_SIZE)
+            # Opus 编码（直接读取数组缓冲区，不再 tobytes 拷贝）
+            opus_data = encoder.encode(pcm_data, FRAME_SIZE)
             
             # 放入编码队列
             encoded_queue.put_nowait(opus_data)
@@ -1,8 +1,110 @@
 # zmq_base.py - 简化版 ZMQ 基础类
+import asyncio
+import functools
+import itertools
+import math
+import os
+import queue
+from concurrent.futures import Future
+
 import zmq
+import zmq.asyncio
 import pickle
 import json
 
+# 可选：orjson（C实现，序列化/解析比标准库json快数倍），未安装时回退到标准json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 可选：lz4（块压缩，压缩/解压速度达GB/s级），未安装时消息帧原样发送
+try:
+    import lz4.block
+    LZ4_AVAILABLE = True
+except ImportError:
+    LZ4_AVAILABLE = False
+
+SERVER_BATCH_SIZE = 32  # 服务器每轮最多取走的排队请求数
+SOCKET_HWM = 1000        # 收发队列上限（消息数），限制积压请求占用的内存
+CLIENT_POOL_SIZE = 4     # 客户端为多线程同步调用准备的套接字数
+PING_TIMEOUT_MS = 1000   # ping 等待应答的超时（主套接字的 RCVTIMEO）
+LZ4_MIN_SIZE = 4096      # 超过该字节数的消息帧才尝试lz4压缩（小帧压缩收益抵不过开销）
+# 同机 ipc 为可选项（ZMQ_BASE_USE_IPC=1 开启）：localhost 也可能是SSH隧道转发的端口，那里没有ipc套接字
+USE_IPC = os.environ.get("ZMQ_BASE_USE_IPC", "0") == "1"
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "0.0.0.0")  # 视为本机的地址：开启ipc时客户端改用 ipc:// 连接
+IPC_PATH_TEMPLATE = "/tmp/imu_{port}.sock"           # 本机 Unix 域套接字路径（按端口区分）
+
+
+def _ipc_endpoint(port):
+    """本机 ipc:// 端点；未开启 USE_IPC 或平台不支持 ipc（如Windows）时返回 None"""
+    if not USE_IPC or not zmq.has("ipc"):
+        return None
+    return "ipc://" + IPC_PATH_TEMPLATE.format(port=port)
+
+
+def _bind_ipc(socket, endpoint):
+    """
+    绑定 ipc 端点：绑定期间临时收紧umask，套接字文件仅当前用户可访问（0600）；
+    ipc只是可选的加速路径，绑定失败（如/tmp下残留其他用户的套接字文件）时只打印警告，不影响TCP服务
+    """
+    old_umask = os.umask(0o077)
+    try:
+        socket.bind(endpoint)
+    except zmq.ZMQError as e:
+        print(f"⚠️ 绑定ipc端点失败（仅TCP可用）: {endpoint}: {e}")
+    finally:
+        os.umask(old_umask)
+
+
+@functools.lru_cache(maxsize=64)
+def _tcp_endpoint(host, port):
+    """tcp:// 端点地址（按 host/port 缓存，重复创建客户端/服务器时不再拼接）"""
+    return f"tcp://{host}:{port}"
+
+
+@functools.lru_cache(maxsize=64)
+def _client_endpoint(host, port):
+    """客户端连接地址：开启 USE_IPC 且服务器在本机时走 Unix 域套接字，省去内核TCP协议栈；否则用TCP"""
+    ipc_endpoint = _ipc_endpoint(port) if host in LOCAL_HOSTS else None
+    return ipc_endpoint or _tcp_endpoint(host, port)
+
+
+def _is_binary(value):
+    """bytes 类缓冲区或 numpy 数组/张量（有 __array_interface__）：JSON无法表示"""
+    return isinstance(value, (bytes, bytearray, memoryview)) or hasattr(value, "__array_interface__")
+
+
+def _has_nonfinite(value):
+    """递归检查 dict/list/tuple 中是否有 NaN/Inf：orjson会把它们静默编码成null，标准json编码成非标准的NaN"""
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_nonfinite(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_nonfinite(item) for item in value)
+    return False
+
+
+def _needs_pickle(data):
+    """
+    廉价预判对象是否必然无法用JSON表示（检查对象本身及字典的第一层值），
+    命中时直接走pickle，省去先尝试JSON、再抛出并捕获异常的开销；更深层的情况仍由异常回退处理。
+    含 NaN/Inf 的浮点数也走pickle，保证原样还原
+    """
+    if isinstance(data, dict):
+        if any(_is_binary(value) for value in data.values()):
+            return True
+    elif _is_binary(data):
+        return True
+    return _has_nonfinite(data)
+
+
+def _frame_view(frame):
+    """zmq.Frame 取其 memoryview（不拷贝），bytes 等缓冲区原样返回"""
+    return frame.buffer if isinstance(frame, zmq.Frame) else frame
+
 
 class TorchSerializer:
     """序列化工具类"""
@@ -10,97 +112,395 @@ class TorchSerializer:
     @staticmethod
     def to_bytes(data):
         """将 Python 对象序列化为字节"""
+        # 优先使用 JSON（更轻量）；只捕获“无法用JSON表示”的类型错误（含bytes/numpy等），复杂对象使用 pickle
+        if _needs_pickle(data):
+            return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        if ORJSON_AVAILABLE:
+            try:
+                return orjson.dumps(data)
+            except orjson.JSONEncodeError:
+                return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
         try:
-            # 优先使用 JSON（更轻量）
             return json.dumps(data).encode('utf-8')
-        except:
-            # 复杂对象使用 pickle
-            return pickle.dumps(data)
+        except (TypeError, ValueError):
+            return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    @staticmethod
+    def to_frames(data):
+        """
+        序列化为多帧消息 [主体, 带外缓冲...]：可用JSON表示时只有一帧；
+        否则使用pickle协议5，numpy数组/张量的数据作为带外缓冲（PEP 574）单独成帧，不拷贝进pickle字节流
+        """
+        if _needs_pickle(data):
+            pass
+        elif ORJSON_AVAILABLE:
+            try:
+                return [orjson.dumps(data)]
+            except orjson.JSONEncodeError:
+                pass
+        else:
+            try:
+                return [json.dumps(data).encode('utf-8')]
+            except (TypeError, ValueError):
+                pass
+        buffers = []
+        payload = pickle.dumps(data, protocol=5, buffer_callback=buffers.append)
+        return [payload] + [buffer.raw() for buffer in buffers]
+    
+    @staticmethod
+    def from_frames(frames):
+        """
+        将 to_frames 生成的多帧消息反序列化（带外缓冲按原顺序交给pickle，数组直接引用接收到的帧，无需拷贝）
+        frames 可以是 bytes，也可以是 recv_multipart(copy=False) 得到的 zmq.Frame（取其 memoryview，不拷贝；数组为只读）
+        """
+        views = [_frame_view(frame) for frame in frames]
+        return TorchSerializer.from_bytes(views[0], buffers=views[1:])
+    
+    @staticmethod
+    def to_compressed_frames(data):
+        """
+        序列化为多帧消息并按帧压缩：[标志帧, 帧...]，标志帧每字节对应一帧（0 原始，1 lz4）；
+        超过 LZ4_MIN_SIZE 且压缩后更小的帧才替换为压缩数据，lz4 未安装时全部原样发送
+        """
+        frames = TorchSerializer.to_frames(data)
+        flags = bytearray(len(frames))
+        if LZ4_AVAILABLE:
+            for i, frame in enumerate(frames):
+                if len(frame) > LZ4_MIN_SIZE:
+                    compressed = lz4.block.compress(frame, mode='fast')
+                    if len(compressed) < len(frame):
+                        frames[i] = compressed
+                        flags[i] = 1
+        return [bytes(flags)] + frames
     
     @staticmethod
-    def from_bytes(data):
-        """将字节反序列化为 Python 对象"""
+    def from_compressed_frames(frames):
+        """将 to_compressed_frames 生成的多帧消息解压并反序列化（未压缩的帧仍零拷贝引用）"""
+        views = [_frame_view(frame) for frame in frames]
+        flags = bytes(views[0])
+        views = views[1:]
+        for i, flag in enumerate(flags):
+            if flag:
+                if not LZ4_AVAILABLE:
+                    raise RuntimeError("收到lz4压缩的消息帧，但本机未安装lz4")
+                views[i] = lz4.block.decompress(views[i])
+        return TorchSerializer.from_frames(views)
+    
+    @staticmethod
+    def from_bytes(data, buffers=None):
+        """将字节（bytes/memoryview 等缓冲区对象）反序列化为 Python 对象（buffers：pickle协议5的带外缓冲）"""
+        # pickle协议2+以PROTO操作码0x80开头（合法JSON不可能以该字节开头）：
+        # B端转发的命令均为pickle，直接解码，省去JSON解析失败抛异常的开销
+        if data[:1] == b'\x80':
+            return pickle.loads(data, buffers=buffers)
         try:
-            # 优先尝试 JSON
-            return json.loads(data.decode('utf-8'))
-        except:
-            # 回退到 pickle
+            # 优先尝试 JSON（orjson和标准json都直接解析UTF-8 bytes，无需先decode成str）
+            if ORJSON_AVAILABLE:
+                return orjson.loads(data)
+            return json.loads(data if isinstance(data, (bytes, bytearray)) else bytes(data))  # 标准json不接受memoryview
+        except ValueError:
+            # 回退到 pickle（协议0/1）
             return pickle.loads(data)
 
 
+@functools.lru_cache(maxsize=None)
+def _endpoint_frame(endpoint):
+    """端点名帧（按端点名缓存编码结果，只编码一次）"""
+    return endpoint.encode('utf-8')
+
+
+def _configure_socket(socket):
+    """
+    客户端/服务器共用的套接字选项（须在 connect/bind 之前设置）
+    libzmq 对TCP连接总是开启 TCP_NODELAY，无需（也没有选项）再设置
+    """
+    socket.setsockopt(zmq.LINGER, 0)  # 关闭时丢弃未发出的消息，不阻塞退出
+    socket.setsockopt(zmq.SNDHWM, SOCKET_HWM)
+    socket.setsockopt(zmq.RCVHWM, SOCKET_HWM)
+    socket.setsockopt(zmq.TCP_KEEPALIVE, 1)  # 及时发现断开的对端
+
+
+def _configure_client_socket(socket, endpoint):
+    """客户端 DEALER 套接字：设置共用选项后连接到 endpoint"""
+    _configure_socket(socket)
+    socket.setsockopt(zmq.IMMEDIATE, 1)  # 连接建立前不排队请求：未连接时 NOBLOCK 发送立即失败
+    socket.connect(endpoint)
+
+
 class BaseInferenceClient:
-    """ZMQ 客户端基础类（用于旧版本）"""
+    """
+    ZMQ 客户端基础类（用于旧版本）
+    使用 DEALER 套接字：请求帧为 [b'', 请求ID, 端点名, 参数帧...]，多个请求可同时在途（流水线），
+    应答按请求ID匹配到对应的 Future；submit/wait/ping 使用的主套接字只能在一个线程中使用
+    call_endpoint 从套接字池取用独立的套接字，可被多个线程同时调用（无需加锁）
+    """
+    
+    # 心跳请求只有端点名帧（预先编码）：ping 不再每次构造字典 + 序列化
+    _PING_FRAME = _endpoint_frame("ping")
     
     def __init__(self, host="localhost", port=5555):
         self.host = host
         self.port = port
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.REQ)
-        self.socket.connect(f"tcp://{host}:{port}")
+        self.context = zmq.Context.instance()  # 进程级单例上下文（生命周期同进程，不在close中term）
+        self.endpoint = _client_endpoint(host, port)
+        self.socket = self._create_socket()
+        self.socket.setsockopt(zmq.RCVTIMEO, PING_TIMEOUT_MS)  # 接收超时抛出 zmq.Again，ping 无需另外 poll
+        self._counter = itertools.count()
+        self._pending = {}  # 请求ID -> Future
+        # 套接字池：每个 call_endpoint 独占一个套接字完成一次同步调用
+        self._pool = queue.Queue()
+        for _ in range(CLIENT_POOL_SIZE):
+            self._pool.put(self._create_socket())
+    
+    def _create_socket(self):
+        """创建并连接一个 DEALER 套接字"""
+        socket = self.context.socket(zmq.DEALER)
+        _configure_client_socket(socket, self.endpoint)
+        return socket
+    
+    @staticmethod
+    def _request_frames(endpoint, kwargs):
+        """端点名单独成帧，不再与参数合并成字典；无参数时不附带参数帧"""
+        frames = [_endpoint_frame(endpoint)]
+        if kwargs:
+            frames += TorchSerializer.to_compressed_frames(kwargs)
+        return frames
+    
+    def _send_request(self, frames, flags=0):
+        """发送一条请求，返回 (请求ID, 等待其应答的 Future)"""
+        req_id = b"%d" % next(self._counter)
+        future = Future()
+        # copy=False：张量数据作为带外缓冲单独成帧，libzmq直接引用其内存
+        self.socket.send_multipart([b"", req_id] + frames, flags=flags, copy=False)
+        self._pending[req_id] = future
+        return req_id, future
+    
+    def _recv_response(self):
+        """接收一条应答，交给对应请求的 Future（未知/已超时的请求ID直接丢弃）"""
+        frames = self.socket.recv_multipart(copy=False)  # 零拷贝：直接引用libzmq的帧缓冲区
+        future = self._pending.pop(frames[1].bytes, None)
+        if future is not None:
+            future.set_result(TorchSerializer.from_compressed_frames(frames[2:]))
     
     def ping(self):
-        """测试连接"""
+        """测试连接（PING_TIMEOUT_MS 内收到应答返回 True）"""
         try:
-            request = {"endpoint": "ping"}
-            self.socket.send(TorchSerializer.to_bytes(request), flags=zmq.NOBLOCK)
-            # 设置超时
-            if self.socket.poll(1000):  # 1秒超时
-                self.socket.recv()
-                return True
+            req_id, future = self._send_request([self._PING_FRAME], flags=zmq.NOBLOCK)
+        except zmq.Again:
+            return False  # IMMEDIATE：尚未连上服务器
+        try:
+            while not future.done():
+                self._recv_response()
+        except zmq.Again:
+            self._pending.pop(req_id, None)  # 超时请求不再等待，迟到的应答会被丢弃
             return False
-        except:
-            return True  # 简化处理，假设连接成功
+        return True
+    
+    def submit(self, endpoint, **kwargs):
+        """异步调用远程端点：立即返回 Future，多个请求可同时在途；应答在 wait 中收取"""
+        return self._send_request(self._request_frames(endpoint, kwargs))[1]
+    
+    def wait(self, future):
+        """收取应答直到 future 完成，返回其结果（期间到达的其他应答同样交给各自的 Future）"""
+        while not future.done():
+            try:
+                self._recv_response()
+            except zmq.Again:
+                continue  # 主套接字设置了 RCVTIMEO（供ping使用），这里继续等待
+        return future.result()
     
     def call_endpoint(self, endpoint, **kwargs):
+        """调用远程端点（线程安全：从池中取一个套接字，同步收发后放回）"""
+        frames = self._request_frames(endpoint, kwargs)
+        socket = self._pool.get()
+        try:
+            # 池中套接字同一时刻只有一个请求在途，请求ID固定即可
+            socket.send_multipart([b"", b"0"] + frames, copy=False)
+            response = socket.recv_multipart(copy=False)
+        except BaseException:
+            # 中途出错（含 KeyboardInterrupt）时应答可能仍在路上：换一个新套接字，避免下一个调用者收到旧应答
+            socket.close()
+            socket = self._create_socket()
+            raise
+        finally:
+            self._pool.put(socket)
+        return TorchSerializer.from_compressed_frames(response[2:])
+    
+    def close(self):
+        """关闭连接（只关闭socket，共享上下文随进程退出）"""
+        self.socket.close()
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+class AsyncInferenceClient:
+    """
+    asyncio 版客户端（协议与 BaseInferenceClient 相同）
+    多个协程可同时 await call_endpoint：一个请求等待网络时，事件循环可继续序列化并发出下一个请求；
+    应答由后台接收任务按请求ID交给对应的 asyncio.Future。只能在创建它的事件循环中使用
+    """
+    
+    def __init__(self, host="localhost", port=5555):
+        self.host = host
+        self.port = port
+        self.context = zmq.asyncio.Context.instance()  # 进程级单例上下文（生命周期同进程，不在close中term）
+        self.endpoint = _client_endpoint(host, port)
+        self.socket = self.context.socket(zmq.DEALER)
+        _configure_client_socket(self.socket, self.endpoint)
+        self._counter = itertools.count()
+        self._pending = {}  # 请求ID -> asyncio.Future
+        self._recv_task = None
+    
+    async def _recv_loop(self):
+        """后台接收任务：收取应答并交给对应请求的 Future（未知/已取消的请求ID直接丢弃）"""
+        while True:
+            frames = await self.socket.recv_multipart(copy=False)
+            future = self._pending.pop(frames[1].bytes, None)
+            if future is None or future.done():
+                continue
+            try:
+                future.set_result(TorchSerializer.from_compressed_frames(frames[2:]))
+            except Exception as e:  # 反序列化失败只影响本请求，接收任务继续运行
+                future.set_exception(e)
+    
+    async def call_endpoint(self, endpoint, **kwargs):
         """调用远程端点"""
-        request = {"endpoint": endpoint, **kwargs}
-        self.socket.send(TorchSerializer.to_bytes(request))
-        response = self.socket.recv()
-        return TorchSerializer.from_bytes(response)
+        if self._recv_task is None:
+            self._recv_task = asyncio.ensure_future(self._recv_loop())
+        req_id = b"%d" % next(self._counter)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        try:
+            frames = BaseInferenceClient._request_frames(endpoint, kwargs)
+            await self.socket.send_multipart([b"", req_id] + frames, copy=False)
+            return await future
+        finally:
+            self._pending.pop(req_id, None)  # 超时/取消时不再等待，迟到的应答会被丢弃
+    
+    async def ping(self, timeout=1.0):
+        """测试连接（默认1秒超时）"""
+        try:
+            await asyncio.wait_for(self.call_endpoint("ping"), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
     
     def close(self):
-        """关闭连接"""
+        """关闭连接（只关闭socket，共享上下文随进程退出）"""
+        if self._recv_task is not None:
+            self._recv_task.cancel()
         self.socket.close()
-        self.context.term()
 
 
 class BaseInferenceServer:
-    """ZMQ 服务器基础类（用于旧版本）"""
+    """
+    ZMQ 服务器基础类（用于旧版本）
+    使用 ROUTER 套接字：请求帧为 [客户端标识, b'', 请求ID, 端点名, 参数帧...]，应答原样带回标识和请求ID
+    端点按编码后的端点名（bytes）注册，直接用收到的端点名帧查表分发
+    """
+    
+    # 未知端点的错误应答预先序列化：不为每个无效请求格式化字符串、构造字典和序列化
+    _UNKNOWN_ENDPOINT_FRAMES = TorchSerializer.to_compressed_frames({"error": "未知端点"})
     
     def __init__(self, host="0.0.0.0", port=5556):
         self.host = host
         self.port = port
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.REP)
-        self.socket.bind(f"tcp://{host}:{port}")
-        self.endpoints = {}
+        self.context = zmq.Context.instance()  # 进程级单例上下文（生命周期同进程，不在close中term）
+        self.socket = self.context.socket(zmq.ROUTER)
+        _configure_socket(self.socket)
+        self.socket.bind(_tcp_endpoint(host, port))
+        # 开启 USE_IPC 时同时监听本机 ipc 端点，供同一台机器上的客户端使用
+        ipc_endpoint = _ipc_endpoint(port)
+        if ipc_endpoint:
+            _bind_ipc(self.socket, ipc_endpoint)
+        self.endpoints = {}  # 端点名(bytes) -> (处理函数, 是否批处理)：分发时只查一次表
     
-    def register_endpoint(self, name, handler):
-        """注册端点处理函数"""
-        self.endpoints[name] = handler
+    def register_endpoint(self, name, handler, batch=False):
+        """
+        注册端点处理函数
+        batch=True 时处理函数接收同一批中该端点所有请求的 data 列表，返回等长的响应列表
+        """
+        self.endpoints[_endpoint_frame(name)] = (handler, batch)
+    
+    def _recv_batch(self):
+        """阻塞接收一条请求，再非阻塞取走已排队的请求（最多 SERVER_BATCH_SIZE 条）"""
+        recv_multipart = self.socket.recv_multipart
+        # copy=False：零拷贝接收，请求数据直接引用libzmq的帧缓冲区
+        messages = [recv_multipart(copy=False)]
+        while len(messages) < SERVER_BATCH_SIZE:
+            try:
+                messages.append(recv_multipart(flags=zmq.NOBLOCK, copy=False))
+            except zmq.Again:
+                break
+        return messages
+    
+    @staticmethod
+    def _error_frames(e):
+        """单条请求出错（参数帧无法解析、处理函数抛异常）时的错误应答"""
+        print(f"⚠️ 请求处理失败: {type(e).__name__}: {e}")
+        return TorchSerializer.to_compressed_frames({"error": f"{type(e).__name__}: {e}"})
+    
+    def _handle_batch(self, messages):
+        """
+        处理一批请求，返回与之对应的 [(信封, 已序列化的响应帧), ...]
+        每条请求单独捕获异常并回复错误应答，一条坏请求不影响同批其他请求，也不会让服务器退出
+        """
+        results = []
+        groups = {}  # 批处理端点的处理函数 -> [(信封, data), ...]
+        # 循环内用到的属性/方法先绑定为局部变量，省去每条请求的属性查找
+        lookup = self.endpoints.get
+        from_frames = TorchSerializer.from_compressed_frames
+        to_frames = TorchSerializer.to_compressed_frames
+        for message in messages:
+            if len(message) < 4:
+                continue  # 不是 DEALER 客户端发来的 [标识, b'', 请求ID, 端点名, 参数...] 格式，丢弃
+            envelope = message[:3]
+            try:
+                entry = lookup(message[3].bytes)
+                if entry is None:
+                    results.append((envelope, self._UNKNOWN_ENDPOINT_FRAMES))
+                    continue
+                data = from_frames(message[4:]).get("data", {}) if len(message) > 4 else {}
+                if entry[1]:
+                    groups.setdefault(entry[0], []).append((envelope, data))
+                else:
+                    results.append((envelope, to_frames(entry[0](data))))
+            except Exception as e:
+                results.append((envelope, self._error_frames(e)))
+        
+        # 批处理端点：每个端点只调用一次处理函数；处理函数出错或返回数量不符时，该批请求都回复错误
+        for handler, items in groups.items():
+            try:
+                responses = list(handler([data for _, data in items]))
+                if len(responses) != len(items):
+                    raise ValueError(f"批处理函数返回 {len(responses)} 条响应，应为 {len(items)} 条")
+            except Exception as e:
+                error_frames = self._error_frames(e)
+                results.extend((envelope, error_frames) for envelope, _ in items)
+                continue
+            for (envelope, _), response in zip(items, responses):
+                try:
+                    results.append((envelope, to_frames(response)))
+                except Exception as e:
+                    results.append((envelope, self._error_frames(e)))
+        return results
     
     def run(self):
-        """运行服务器"""
+        """运行服务器（每轮取走所有已排队的请求成批处理，减少每条消息的唤醒开销）"""
+        # 主循环用到的方法先绑定为局部变量（每轮省去若干次属性查找）
+        recv_batch = self._recv_batch
+        handle_batch = self._handle_batch
+        send_multipart = self.socket.send_multipart
         try:
             while True:
                 # 接收请求
-                message = self.socket.recv()
-                request = TorchSerializer.from_bytes(message)
-                
-                # 处理请求
-                endpoint = request.get("endpoint")
-                if endpoint in self.endpoints:
-                    # 调用处理函数
-                    data = request.get("data", {})
-                    response = self.endpoints[endpoint](data)
-                else:
-                    response = {"error": f"未知端点: {endpoint}"}
+                messages = recv_batch()
                 
-                # 发送响应
-                self.socket.send(TorchSerializer.to_bytes(response))
+                # 处理请求，发送响应（ROUTER 按信封逐条路由）
+                for envelope, frames in handle_batch(messages):
+                    send_multipart(envelope + frames, copy=False)
         
         except KeyboardInterrupt:
             pass
         finally:
             self.socket.close()
-            self.context.term()